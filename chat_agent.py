@@ -5,11 +5,11 @@ import asyncio
 import json
 import sys
 import os
-import requests
 import threading
 import time
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Union
+from collections import deque
 from datetime import datetime
 from io import StringIO
 
@@ -18,12 +18,27 @@ sys.path.insert(0, project_root)
 
 try:
     from run_server import MCPServer
+    from utils.llm_stream import stream_chat_completion
 except ImportError as e:
     print(f"导入模块失败: {e}")
     print("请确保所有依赖模块存在")
     sys.exit(1)
 
 
+CHAT_HISTORY_TURNS = 5
+# 读写同一批 services/data 巡检文件的服务共用一把锁，多会话并发时串行执行
+TOOL_LOCK_GROUPS = {
+    "service_001_system_inspection": "hardware",
+    "service_002_memory_inspection": "hardware",
+    "service_003_disk_inspection": "hardware",
+    "service_004_hardware_summary": "hardware",
+    "service_005_full_inspection": "hardware",
+    "service_011_apply_purchases": "hardware",
+    "service_013_memory_apply_notice": "hardware",
+    "service_015_memory_resolved_notice": "hardware"
+}
+
+
 def safe_string(text):
     if not isinstance(text, str):
         text = str(text)
@@ -219,28 +234,17 @@ class LLMScheduler:
                     {"role": "user", "content": clean_prompt}
                 ],
                 "temperature": temperature,
-                "max_tokens": max_tokens,
-                "stream": False
+                "max_tokens": max_tokens
             }
 
             headers = {
-                "Content-Type": "application/json; charset=utf-8",
-                "Accept": "application/json"
+                "Content-Type": "application/json; charset=utf-8"
             }
 
             print("    🌐 向AI运维大脑发送智能分析请求...")
             logger.debug(f"🔗 建立与QWEN3模型的神经网络连接: {url}")
 
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
-
-            logger.debug(f"📡 AI大脑响应状态: {response.status_code}")
-            if response.status_code != 200:
-                logger.error(f"⚠️ AI大脑响应异常: {response.text}")
-
-            response.raise_for_status()
-
-            result = response.json()
-            response_content = result["choices"][0]["message"]["content"]
+            response_content = stream_chat_completion(url, payload, headers, timeout=30, label='intent')
             clean_response = safe_string(response_content)
             print("    ✨ AI运维大脑完成智能决策，获得最优执行方案")
             logger.debug(f"🎯 AI决策分析完成，智能推理结果长度: {len(clean_response)}")
@@ -250,19 +254,22 @@ class LLMScheduler:
             logger.error(f"🚨 AI神经网络通信故障: {e}")
             return None
 
-    def parse_user_intent(self, user_input):
+    def parse_user_intent(self, user_input, history=''):
         clean_input = safe_string(user_input)
         logger.debug(f"📥 开始解析运维指令: {clean_input}")
 
         print("    🤖 AI运维引擎启动 - 执行智能意图识别与任务编排...")
 
         tools_info = json.dumps(self.tools, ensure_ascii=False, indent=2)
+        history_section = ""
+        if history:
+            history_section = f"\n同一用户最近的对话（用于理解\"再查一次\"、\"那台服务器\"等指代，仅作参考）:\n{history}\n"
 
         analysis_prompt = f"""
 作为专业的智能运维助手，请分析用户需求并制定执行计划。
 
 用户需求: "{clean_input}"
-
+{history_section}
 可用的运维服务工具:
 {tools_info}
 
@@ -469,6 +476,8 @@ class TaskExecutor:
         logger.debug("🔧 MCP任务执行器启动初始化流程")
 
         self.mcp_server = MCPServer()
+        self.tool_locks = {}
+        self.tool_locks_guard = threading.Lock()
 
         print("✅ MCP运维服务集群连接成功，具备14个专业运维服务能力")
         logger.debug("🎯 MCP任务执行器初始化完成，运维服务调度中心已就绪")
@@ -493,7 +502,14 @@ class TaskExecutor:
             print(f"    📡 通过MCP协议向运维服务集群发送任务指令...")
             logger.debug(f"📋 MCP任务指令: {safe_string(request_data)}")
 
-            response_str = await self.mcp_server.handle_request(request_data)
+            # 用线程锁串行化写同一文件的服务；调用方可能在多个线程各自的事件循环中执行，
+            # 也可能在同一个循环里并发多个任务，因此在线程池中等待锁，持锁期间的 await 不会卡住循环
+            tool_lock = self.get_tool_lock(tool_name)
+            await asyncio.to_thread(tool_lock.acquire)
+            try:
+                response_str = await self.mcp_server.handle_request(request_data)
+            finally:
+                tool_lock.release()
             response = json.loads(response_str)
             logger.debug(f"📊 MCP服务响应: {safe_string(str(response))}")
 
@@ -510,7 +526,13 @@ class TaskExecutor:
             logger.error(f"🚨 MCP服务 {tool_name} 调度失败: {e}")
             return {"success": False, "error": str(e)}
 
-    async def execute_plan(self, execution_plan: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def get_tool_lock(self, tool_name: str) -> threading.Lock:
+        key = TOOL_LOCK_GROUPS.get(tool_name, tool_name)
+        with self.tool_locks_guard:
+            return self.tool_locks.setdefault(key, threading.Lock())
+
+    async def execute_plan(self, execution_plan: List[Dict[str, Any]],
+                           progress: Optional[Callable[[str, str], None]] = None) -> List[Dict[str, Any]]:
         results = []
         total_tasks = len(execution_plan)
 
@@ -544,6 +566,8 @@ class TaskExecutor:
                 print(f"    🏁 任务队列状态: 这是最后一个任务，完成后将生成执行报告")
 
             logger.debug(f"🔧 执行运维任务 {i}/{total_tasks}: {safe_tool_name}")
+            if progress:
+                progress('executing', f"执行运维任务 [{i}/{total_tasks}]: {safe_tool_name}")
             logger.debug(f"📋 任务详情 - 目标: {safe_reason}, 风险: {safe_risk}, 性能: {safe_performance}")
 
             result = await self.execute_tool(tool_name, params)
@@ -629,6 +653,23 @@ class TaskExecutor:
         return formatted
 
 
+class ChatSession:
+    """单个客户端的轻量对话上下文，LLM调度器、MCP执行器和工具表由 ChatAgent 在会话间共享"""
+
+    def __init__(self, session_id: str, max_turns: int = CHAT_HISTORY_TURNS):
+        self.session_id = session_id
+        self.history = deque(maxlen=max_turns)
+        self.created_at = time.time()
+        self.last_active = self.created_at
+
+    def add_turn(self, user_input: str, summary: str):
+        self.history.append({'user': user_input, 'assistant': summary})
+        self.last_active = time.time()
+
+    def format_history(self) -> str:
+        return "\n".join(f"- 用户: {turn['user']}\n  结果: {turn['assistant']}" for turn in self.history)
+
+
 class ChatAgent:
     def __init__(self):
         print("🤖 正在初始化AI智能运维助手...")
@@ -642,7 +683,22 @@ class ChatAgent:
         print("✅ AI智能运维助手初始化完成，已具备完整的AI驱动运维能力")
         logger.debug("🎯 ChatAgent AI运维助手初始化完成")
 
-    async def process_user_input(self, user_input: str) -> str:
+    @staticmethod
+    def build_outcome(response: str, results: List[Dict[str, Any]], error: Optional[str] = None) -> Dict[str, Any]:
+        """结构化处理结果：执行计划非空且每个任务都成功才视为成功"""
+        return {
+            "response": response,
+            "success": error is None and bool(results) and all(r['result'].get('success', False) for r in results),
+            "results": results,
+            "error": error
+        }
+
+    async def process_user_input(self, user_input: str, progress: Optional[Callable[[str, str], None]] = None,
+                                 session: Optional[ChatSession] = None,
+                                 detailed: bool = False) -> Union[str, Dict[str, Any]]:
+        """progress(stage, message) 在各阶段被调用，用于向调用方推送处理进度；
+        传入 session 时意图解析会参考该会话最近的对话，并把本轮摘要记入会话；
+        detailed=True 时返回 build_outcome 的结构化结果，而不只是格式化后的文本"""
         try:
             clean_input = safe_string(user_input)
             logger.debug(f"📥 开始处理用户运维指令: {clean_input}")
@@ -655,7 +711,9 @@ class ChatAgent:
             print("    📊 评估匹配置信度并生成技术执行计划")
             print("    🎯 进行风险评估和性能影响分析")
 
-            plan = self.scheduler.parse_user_intent(clean_input)
+            if progress:
+                progress('parsing', "AI语义分析中，正在匹配运维服务")
+            plan = self.scheduler.parse_user_intent(clean_input, session.format_history() if session else '')
 
             matched_service = plan.get('matched_service', 'unknown')
             confidence = plan.get('confidence', 0.0)
@@ -678,34 +736,41 @@ class ChatAgent:
             execution_plan = plan.get('execution_plan', [])
             if not execution_plan:
                 logger.error("🚨 执行计划为空，返回服务清单")
+                if session:
+                    session.add_turn(clean_input, "未能识别需求")
                 print("\n❌ QWEN3无法理解您的需求，为您提供可用服务清单:")
-                return "抱歉，QWEN3无法理解您的需求，请重新描述。您可以尝试以下请求：\n\n" \
-                       "🔧 **硬件巡检类服务**:\n" \
-                       "- 完整巡检 (执行全流程自动化巡检)\n" \
-                       "- 系统巡检 (查询数据库获取异常服务器)\n" \
-                       "- 内存巡检 (SSH连接详细检查内存状态)\n" \
-                       "- 硬盘巡检 (SSH连接详细检查硬盘状态)\n" \
-                       "- AI分析报告 (生成智能硬件分析报告)\n" \
-                       "- 内存升级建议 (生成内存升级建议)\n\n" \
-                       "📊 **监控分析类服务**:\n" \
-                       "- 日志分析 (智能分析日志文件)\n" \
-                       "- 日报 (生成每日监控分析报告)\n" \
-                       "- 周报 (生成每周趋势分析报告)\n" \
-                       "- 服务监控 (检查服务运行状态)\n" \
-                       "- 平台监控 (监控系统性能指标)\n\n" \
-                       "📱 **通知推送类服务**:\n" \
-                       "- 企业微信通知 (发送微信消息和告警)\n" \
-                       "- 内存申请通知 (检测并发送内存升级申请)\n" \
-                       "- 内存解决通知 (检测并通知已解决的内存问题)\n\n"
-
+                response = "抱歉，QWEN3无法理解您的需求，请重新描述。您可以尝试以下请求：\n\n" \
+                           "🔧 **硬件巡检类服务**:\n" \
+                           "- 完整巡检 (执行全流程自动化巡检)\n" \
+                           "- 系统巡检 (查询数据库获取异常服务器)\n" \
+                           "- 内存巡检 (SSH连接详细检查内存状态)\n" \
+                           "- 硬盘巡检 (SSH连接详细检查硬盘状态)\n" \
+                           "- AI分析报告 (生成智能硬件分析报告)\n" \
+                           "- 内存升级建议 (生成内存升级建议)\n\n" \
+                           "📊 **监控分析类服务**:\n" \
+                           "- 日志分析 (智能分析日志文件)\n" \
+                           "- 日报 (生成每日监控分析报告)\n" \
+                           "- 周报 (生成每周趋势分析报告)\n" \
+                           "- 服务监控 (检查服务运行状态)\n" \
+                           "- 平台监控 (监控系统性能指标)\n\n" \
+                           "📱 **通知推送类服务**:\n" \
+                           "- 企业微信通知 (发送微信消息和告警)\n" \
+                           "- 内存申请通知 (检测并发送内存升级申请)\n" \
+                           "- 内存解决通知 (检测并通知已解决的内存问题)\n\n"
+                return self.build_outcome(response, [], "执行计划为空") if detailed else response
+
+            if progress:
+                progress('planned', f"匹配服务: {safe_matched_service}，共 {len(execution_plan)} 个任务")
             print(f"\n⚙️ 【阶段3/4】通过MCP协议调用专业运维服务...")
             print("    🔗 建立与MCP服务器的安全连接")
             print("    📡 发送标准化的服务调用请求")
             print("    🏃‍♂️ 执行具体的运维操作任务")
             print("    📊 实时监控执行状态和性能指标")
 
-            results = await self.executor.execute_plan(execution_plan)
+            results = await self.executor.execute_plan(execution_plan, progress)
 
+            if progress:
+                progress('formatting', "生成执行报告")
             print(f"\n📊 【阶段4/4】生成AI智能分析报告...")
             print("    📝 整理所有执行结果")
             print("    🎨 格式化为专业技术报告")
@@ -713,14 +778,18 @@ class ChatAgent:
             print("    ✅ 任务执行流程完成")
 
             formatted_results = self.executor.format_results(results)
+            if session:
+                success_count = sum(1 for r in results if r['result'].get('success', False))
+                session.add_turn(clean_input, f"执行 {', '.join(r['tool'] for r in results)}，成功 {success_count}/{len(results)}")
             logger.debug("🎯 用户运维请求处理完成")
 
-            return formatted_results
+            return self.build_outcome(formatted_results, results) if detailed else formatted_results
 
         except Exception as e:
             print(f"\n💥 处理过程中遇到异常: {e}")
             logger.error(f"🚨 处理用户输入失败: {e}")
-            return f"❌ 处理请求时发生错误: {str(e)}\n\n💡 请检查网络连接或稍后重试。如问题持续存在，请联系技术支持。"
+            response = f"❌ 处理请求时发生错误: {str(e)}\n\n💡 请检查网络连接或稍后重试。如问题持续存在，请联系技术支持。"
+            return self.build_outcome(response, [], str(e)) if detailed else response
 
     async def chat(self):
         print("🚀 硬件巡检智能助手已启动 (QWEN3-32B大模型驱动版本)")
@@ -2,20 +2,24 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
+import heapq
+import itertools
+import json
 import time
 import sys
 import os
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-import schedule
-from threading import Thread
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
 
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, project_root)
 
 try:
     from utils.logger import setup_logger
+    from utils.cron import CronSpec
     from chat_agent import ChatAgent
+    from config.config import SCHEDULED_SERVICES, SCHEDULER_STATE_FILE
 except ImportError as e:
     print(f"导入模块失败: {e}")
     print("请确保所有依赖模块存在")
@@ -23,6 +27,293 @@ except ImportError as e:
 
 logger = setup_logger(__name__)
 
+# loop.call_at 基于单调时钟，而触发时间是墙上时钟；单次休眠上限用于吸收 NTP 校时等时钟跳变
+TIMER_MAX_SLEEP = 3600
+
+JOB_MAX_CONCURRENCY = 2
+JOB_QUEUE_SIZE = 20
+JOB_HISTORY_SIZE = 50
+JOB_DEFAULT_PRIORITY = 5
+# 运行时长达到调度间隔的该比例时告警
+JOB_RUNTIME_ALERT_RATIO = 0.8
+JOB_INTERVAL_SAMPLES = 16
+
+
+def min_fire_interval(specs: List[CronSpec], samples: int = JOB_INTERVAL_SAMPLES) -> Optional[float]:
+    """合并多个cron表达式后相邻两次触发的最小间隔（秒）"""
+    fire_times = []
+    for spec in specs:
+        moment = datetime.now()
+        for _ in range(samples):
+            moment = spec.next_after(moment)
+            fire_times.append(moment)
+    fire_times = sorted(set(fire_times))[:samples]
+    gaps = [(later - earlier).total_seconds() for earlier, later in zip(fire_times, fire_times[1:])]
+    return min(gaps) if gaps else None
+
+
+class TimerHeap:
+    """按下次触发时间组织的最小堆，只为堆顶注册一个 loop.call_at，不做轮询"""
+
+    def __init__(self, on_fire: Callable, on_change: Optional[Callable] = None):
+        self.on_fire = on_fire
+        self.on_change = on_change
+        self.entries = {}
+        self.heap = []
+        self.handle = None
+        self.loop = None
+        self.versions = itertools.count()
+
+    def add(self, job_id: str, spec: CronSpec, **info):
+        entry = dict(info, job_id=job_id, spec=spec)
+        self.entries[job_id] = entry
+        self._push(entry, spec.next_after(datetime.now()))
+        self._rearm()
+
+    def remove(self, job_id: str):
+        # 堆中的旧条目在出堆时按版本号惰性丢弃
+        self.entries.pop(job_id, None)
+        self._rearm()
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop or asyncio.get_running_loop()
+        self._rearm()
+
+    def stop(self):
+        if self.handle:
+            self.handle.cancel()
+            self.handle = None
+        self.loop = None
+
+    def next_fire_times(self) -> List[Dict]:
+        return sorted(self.entries.values(), key=lambda entry: entry['next_fire'])
+
+    def _push(self, entry: Dict, fire_time: datetime):
+        entry['next_fire'] = fire_time
+        entry['version'] = next(self.versions)
+        heapq.heappush(self.heap, (fire_time, entry['version'], entry['job_id']))
+
+    def _peek(self):
+        while self.heap:
+            fire_time, version, job_id = self.heap[0]
+            entry = self.entries.get(job_id)
+            if entry and entry['version'] == version:
+                return self.heap[0]
+            heapq.heappop(self.heap)
+        return None
+
+    def _rearm(self):
+        if self.handle:
+            self.handle.cancel()
+            self.handle = None
+        if self.loop is None:
+            return
+
+        head = self._peek()
+        if head is None:
+            return
+        delay = min(max(0.0, (head[0] - datetime.now()).total_seconds()), TIMER_MAX_SLEEP)
+        self.handle = self.loop.call_at(self.loop.time() + delay, self._on_timer)
+
+    def _on_timer(self):
+        self.handle = None
+        now = datetime.now()
+        fired = []
+
+        while True:
+            head = self._peek()
+            if head is None or head[0] > now:
+                break
+            heapq.heappop(self.heap)
+            entry = self.entries[head[2]]
+            # 从当前时间推算下一次，进程挂起错过的多次触发只补执行一次
+            self._push(entry, entry['spec'].next_after(now))
+            fired.append((entry, head[0]))
+
+        self._rearm()
+
+        for entry, fire_time in fired:
+            try:
+                self.on_fire(entry, fire_time)
+            except Exception as e:
+                logger.error(f"定时器回调 {entry['job_id']} 执行失败: {e}")
+        if fired and self.on_change:
+            self.on_change()
+
+
+class JobRunner:
+    """有界优先级队列 + 固定数量工作协程：同一服务单飞执行，全局限制并发"""
+
+    def __init__(self, execute: Callable, max_concurrency: int = JOB_MAX_CONCURRENCY,
+                 queue_size: int = JOB_QUEUE_SIZE, on_change: Optional[Callable] = None,
+                 on_finish: Optional[Callable] = None):
+        self.execute = execute
+        self.on_change = on_change
+        self.on_finish = on_finish
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.queue = None
+        self.workers = []
+        self.services = {}
+        self.running = {}
+        self.queued = set()
+        self.deferred = {}
+        self.durations = {}
+        self.events = deque(maxlen=JOB_HISTORY_SIZE)
+        self.sequence = itertools.count()
+
+    def register(self, service_id: str, name: str, priority: int = JOB_DEFAULT_PRIORITY,
+                 overlap: str = 'skip', interval: Optional[float] = None):
+        self.services[service_id] = {
+            "name": name,
+            "priority": priority,
+            "overlap": overlap,
+            "interval": interval
+        }
+        self.durations.setdefault(service_id, deque(maxlen=JOB_HISTORY_SIZE))
+
+    def start(self):
+        self.queue = asyncio.PriorityQueue(maxsize=self.queue_size)
+        self.workers = [asyncio.create_task(self._worker(index)) for index in range(self.max_concurrency)]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def submit(self, service_id: str, scheduled_time: str) -> str:
+        config = self.services.get(service_id, {"priority": JOB_DEFAULT_PRIORITY, "overlap": "skip"})
+        job = {
+            "service_id": service_id,
+            "scheduled_time": scheduled_time,
+            "submitted_at": time.time()
+        }
+
+        if service_id in self.queued or service_id in self.deferred:
+            return self._record(job, "skipped", "已有同一服务的任务在排队")
+
+        if service_id in self.running:
+            if config["overlap"] != "queue":
+                return self._record(job, "skipped", "上一次执行尚未结束")
+            self.deferred[service_id] = job
+            return self._record(job, "deferred", "等待上一次执行结束后运行")
+
+        return self._enqueue(job)
+
+    def _enqueue(self, job: Dict) -> str:
+        priority = self.services.get(job["service_id"], {}).get("priority", JOB_DEFAULT_PRIORITY)
+        try:
+            self.queue.put_nowait((priority, next(self.sequence), job))
+        except asyncio.QueueFull:
+            self._alert(f"任务队列已满({self.queue_size})，丢弃 {job['service_id']} ({job['scheduled_time']})")
+            return self._record(job, "rejected", "任务队列已满")
+        self.queued.add(job["service_id"])
+        return self._record(job, "queued", f"队列长度 {self.queue.qsize()}")
+
+    async def _worker(self, index: int):
+        while True:
+            priority, _, job = await self.queue.get()
+            service_id = job["service_id"]
+            self.queued.discard(service_id)
+            self.running[service_id] = dict(job, started_at=time.time(), worker=index)
+            watchdog = self._arm_watchdog(service_id)
+            start_time = time.time()
+            success = False
+            try:
+                success = bool(await self.execute(service_id, job["scheduled_time"]))
+            except Exception as e:
+                logger.error(f"任务 {service_id} 执行异常: {e}")
+            finally:
+                duration = time.time() - start_time
+                if watchdog:
+                    watchdog.cancel()
+                self.running.pop(service_id, None)
+                self.durations[service_id].append(duration)
+                self._check_runtime(service_id, duration)
+                self._record(job, "finished" if success else "failed",
+                             f"耗时 {duration:.1f}s，排队 {start_time - job['submitted_at']:.1f}s")
+                self.queue.task_done()
+
+                if self.on_finish:
+                    try:
+                        self.on_finish(job, success)
+                    except Exception as e:
+                        logger.error(f"任务完成回调 {service_id} 执行失败: {e}")
+
+                deferred = self.deferred.pop(service_id, None)
+                if deferred:
+                    self._enqueue(deferred)
+                if self.on_change:
+                    self.on_change()
+
+    def _arm_watchdog(self, service_id: str):
+        interval = self.services.get(service_id, {}).get("interval")
+        if not interval:
+            return None
+        return asyncio.get_running_loop().call_later(
+            interval * JOB_RUNTIME_ALERT_RATIO,
+            lambda: self._alert(f"{service_id} 已运行超过调度间隔的 {JOB_RUNTIME_ALERT_RATIO:.0%}"
+                                f"（间隔 {interval / 60:.0f} 分钟），可能与下一次执行重叠")
+        )
+
+    def _check_runtime(self, service_id: str, duration: float):
+        interval = self.services.get(service_id, {}).get("interval")
+        if interval and duration >= interval * JOB_RUNTIME_ALERT_RATIO:
+            self._alert(f"{service_id} 本次耗时 {duration:.0f}s，已接近调度间隔 {interval:.0f}s")
+
+    def _alert(self, message: str):
+        print(f"⚠️ 任务告警: {message}")
+        logger.warning(message)
+        self.events.append({
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "alert",
+            "message": message
+        })
+
+    def _record(self, job: Dict, status: str, message: str) -> str:
+        self.events.append({
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "service_id": job["service_id"],
+            "scheduled_time": job["scheduled_time"],
+            "status": status,
+            "message": message
+        })
+        if status in ("skipped", "deferred", "rejected"):
+            print(f"⏭️ {job['service_id']} ({job['scheduled_time']}): {message}")
+            logger.info(f"任务 {job['service_id']} {status}: {message}")
+        return status
+
+    def get_duration_stats(self, service_id: str) -> Dict:
+        durations = sorted(self.durations.get(service_id, []))
+        if not durations:
+            return {"runs": 0}
+        return {
+            "runs": len(durations),
+            "avg_seconds": round(sum(durations) / len(durations), 2),
+            "p95_seconds": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 2),
+            "max_seconds": round(durations[-1], 2),
+            "last_seconds": round(self.durations[service_id][-1], 2)
+        }
+
+    def get_status(self) -> Dict:
+        now = time.time()
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queue_size": self.queue.qsize() if self.queue else 0,
+            "running": [{
+                "service_id": service_id,
+                "scheduled_time": job["scheduled_time"],
+                "running_seconds": round(now - job["started_at"], 1)
+            } for service_id, job in self.running.items()],
+            "queued": sorted(self.queued),
+            "deferred": sorted(self.deferred),
+            "services": {service_id: dict(config, **self.get_duration_stats(service_id))
+                         for service_id, config in self.services.items()},
+            "recent_events": list(self.events)[-10:]
+        }
+
+
 class PreciseScheduler:
     def __init__(self):
         self.chat_agent = ChatAgent()
@@ -30,63 +321,35 @@ class PreciseScheduler:
         self.task_history = []
         self.next_tasks = []
 
-        self.scheduled_services = {
-            "service_005": {
-                "name": "完整巡检流程",
-                "requests": [
-                    "执行完整巡检流程",
-                    "进行全流程巡检",
-                    "一键巡检",
-                    "完整硬件巡检"
-                ],
-                "times": ["10:15", "15:15"],
-                "description": "每天10:15、15:15执行"
-            },
-            "service_007": {
-                "name": "日报生成",
-                "requests": [
-                    "生成日报",
-                    "生成每日监控报告",
-                    "昨日系统分析报告",
-                    "日常监控日报"
-                ],
-                "times": ["10:10", "15:10"],
-                "description": "每天10:10、15:10执行"
-            },
-            "service_008": {
-                "name": "周报生成",
-                "requests": [
-                    "生成周报",
-                    "生成每周监控报告",
-                    "上周系统分析报告",
-                    "周期性监控周报"
-                ],
-                "times": ["monday-08:00"],
-                "description": "每周一08:00执行"
-            },
-            "service_009": {
-                "name": "服务监控检查",
-                "requests": [
-                    "执行服务监控检查",
-                    "检查服务运行状态",
-                    "服务健康检查",
-                    "平台服务监控"
-                ],
-                "times": ["09:55", "14:55"],
-                "description": "每天09:55、14:55执行"
-            },
-            "service_010": {
-                "name": "平台性能监控",
-                "requests": [
-                    "执行平台性能监控",
-                    "监控系统性能",
-                    "平台资源监控",
-                    "性能指标检查"
-                ],
-                "times": ["09:58", "14:58"],
-                "description": "每天09:58、14:58执行"
+        self.stop_event = None
+        self.state_file = os.path.join(project_root, SCHEDULER_STATE_FILE)
+        self.timer = TimerHeap(self.on_timer_fire, self.on_schedule_changed)
+        self.job_runner = JobRunner(self.execute_scheduled_task, on_change=self.save_schedule_state,
+                                    on_finish=self.on_job_finished)
+        self.dependencies = {}
+        self.trigger_windows = {}
+
+        self.scheduled_services = {}
+        for service_id, config in SCHEDULED_SERVICES.items():
+            specs = [CronSpec(expression) for expression in config.get('cron', [])]
+            description = f"{'、'.join(spec.describe() for spec in specs)}执行"
+            if 'after' in config:
+                upstream = config['after']['service']
+                max_wait = config['after'].get('max_wait_minutes', 30)
+                self.dependencies[service_id] = {"upstream": upstream, "max_wait": max_wait * 60}
+                description = f"{upstream} 成功后立即执行（最多等待{max_wait}分钟）"
+            self.scheduled_services[service_id] = {
+                "name": config['name'],
+                "requests": config['requests'],
+                "specs": specs,
+                "description": description
             }
-        }
+
+        for service_id, config in SCHEDULED_SERVICES.items():
+            self.job_runner.register(service_id, config['name'],
+                                     priority=config.get('priority', JOB_DEFAULT_PRIORITY),
+                                     overlap=config.get('overlap', 'skip'),
+                                     interval=min_fire_interval(self.get_trigger_specs(service_id)))
 
         self.manual_services = {
             "service_001": {
@@ -128,34 +391,6 @@ class PreciseScheduler:
 
         return request
 
-    def calculate_next_execution_time(self, service_id: str, time_str: str) -> datetime:
-        now = datetime.now()
-
-        if time_str.startswith("monday-"):
-            time_part = time_str.split("-")[1]
-            hour, minute = map(int, time_part.split(":"))
-
-            days_ahead = 0 - now.weekday()
-            if days_ahead <= 0:
-                days_ahead += 7
-
-            next_monday = now + timedelta(days=days_ahead)
-            next_time = next_monday.replace(hour=hour, minute=minute, second=0, microsecond=0)
-
-            if now.weekday() == 0:
-                today_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                if today_time > now:
-                    next_time = today_time
-
-        else:
-            hour, minute = map(int, time_str.split(":"))
-            next_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-
-            if next_time <= now:
-                next_time += timedelta(days=1)
-
-        return next_time
-
     def get_time_until_execution(self, target_time: datetime) -> str:
         now = datetime.now()
         diff = target_time - now
@@ -193,13 +428,17 @@ class PreciseScheduler:
 
             start_time = time.time()
 
-            response = await self.chat_agent.process_user_input(user_request)
+            # 意图解析和MCP服务都是阻塞调用，放到独立线程的事件循环中执行，
+            # 调度循环保持空闲，定时器、看门狗和并发上限才能按预期生效
+            outcome = await asyncio.to_thread(
+                asyncio.run, self.chat_agent.process_user_input(user_request, detailed=True))
+            success = outcome["success"]
 
             execution_time = time.time() - start_time
 
             print(f"\n📊 执行结果:")
             print("-" * 80)
-            print(response)
+            print(outcome["response"])
             print("-" * 80)
             print(f"⏱️  执行耗时: {execution_time:.2f} 秒")
             print("=" * 100)
@@ -212,12 +451,20 @@ class PreciseScheduler:
                 "execution_time": execution_time,
                 "timestamp": current_time,
                 "scheduled_time": scheduled_time,
-                "success": True,
+                "success": success,
                 "type": "scheduled"
             }
+            if not success:
+                failed_tools = [r["tool"] for r in outcome["results"] if not r["result"].get("success", False)]
+                task_record["error"] = outcome["error"] or f"任务执行失败: {', '.join(failed_tools)}"
             self.task_history.append(task_record)
 
-            logger.info(f"定时任务 {service_id} 执行完成，耗时: {execution_time:.2f}秒")
+            if success:
+                logger.info(f"定时任务 {service_id} 执行完成，耗时: {execution_time:.2f}秒")
+            else:
+                print(f"❌ 定时任务 {service_id} 执行失败: {task_record['error']}")
+                logger.error(f"定时任务 {service_id} 执行失败: {task_record['error']}")
+            return success
 
         except Exception as e:
             error_msg = f"定时任务 {service_id} 执行失败: {str(e)}"
@@ -239,62 +486,133 @@ class PreciseScheduler:
 
             import traceback
             traceback.print_exc()
+            return False
 
     def setup_schedule(self):
         print("📅 设置精确定时任务...")
 
-        schedule.every().day.at("10:15").do(
-            lambda: asyncio.create_task(self.execute_scheduled_task("service_005", "10:15"))
-        )
-        schedule.every().day.at("15:15").do(
-            lambda: asyncio.create_task(self.execute_scheduled_task("service_005", "15:15"))
-        )
-
-        schedule.every().day.at("10:10").do(
-            lambda: asyncio.create_task(self.execute_scheduled_task("service_007", "10:10"))
-        )
-        schedule.every().day.at("15:10").do(
-            lambda: asyncio.create_task(self.execute_scheduled_task("service_007", "15:10"))
-        )
-
-        schedule.every().monday.at("08:00").do(
-            lambda: asyncio.create_task(self.execute_scheduled_task("service_008", "周一08:00"))
-        )
-
-        schedule.every().day.at("09:55").do(
-            lambda: asyncio.create_task(self.execute_scheduled_task("service_009", "09:55"))
-        )
-        schedule.every().day.at("14:55").do(
-            lambda: asyncio.create_task(self.execute_scheduled_task("service_009", "14:55"))
-        )
-
-        schedule.every().day.at("09:58").do(
-            lambda: asyncio.create_task(self.execute_scheduled_task("service_010", "09:58"))
-        )
-        schedule.every().day.at("14:58").do(
-            lambda: asyncio.create_task(self.execute_scheduled_task("service_010", "14:58"))
-        )
-
-        print("✅ 精确定时任务设置完成!")
+        for service_id, config in self.scheduled_services.items():
+            for spec in config["specs"]:
+                self.timer.add(f"{service_id}@{spec.expression}", spec,
+                               service_id=service_id, label=spec.describe())
+
+        print(f"✅ 精确定时任务设置完成! 共 {len(self.timer.entries)} 个触发点")
+
+    def get_trigger_specs(self, service_id: str) -> List[CronSpec]:
+        """事件触发的服务沿依赖链取上游的cron，用于估算间隔和下次执行时间"""
+        seen = set()
+        while service_id in self.dependencies and service_id not in seen:
+            seen.add(service_id)
+            service_id = self.dependencies[service_id]["upstream"]
+        return self.scheduled_services.get(service_id, {}).get("specs", [])
+
+    def on_timer_fire(self, entry: Dict, fire_time: datetime):
+        logger.info(f"定时器触发 {entry['job_id']}，计划时间 {fire_time.strftime('%Y-%m-%d %H:%M')}")
+        self.dispatch(entry['service_id'], entry['label'])
+
+    def dispatch(self, service_id: str, scheduled_time: str):
+        self.job_runner.submit(service_id, scheduled_time)
+
+        # 为下游打开等待窗口：上游成功即触发，超时则直接执行
+        for dependent, dependency in self.dependencies.items():
+            if dependency["upstream"] != service_id or dependent in self.trigger_windows:
+                continue
+            deadline = time.time() + dependency["max_wait"]
+            handle = asyncio.get_running_loop().call_later(dependency["max_wait"], self.on_trigger_timeout, dependent)
+            self.trigger_windows[dependent] = {"upstream": service_id, "deadline": deadline, "handle": handle}
+            logger.info(f"{dependent} 等待 {service_id} 成功后触发，最迟 {dependency['max_wait'] / 60:.0f} 分钟")
+
+    def on_job_finished(self, job: Dict, success: bool):
+        for dependent, window in list(self.trigger_windows.items()):
+            if window["upstream"] != job["service_id"]:
+                continue
+            window["handle"].cancel()
+            del self.trigger_windows[dependent]
+            if success:
+                print(f"🔗 {job['service_id']} 执行成功，立即触发下游 {dependent}")
+                self.dispatch(dependent, f"{job['service_id']}完成后")
+            else:
+                message = f"上游 {job['service_id']} 执行失败，跳过本轮 {dependent}"
+                print(f"⚠️ {message}")
+                logger.warning(message)
+
+    def on_trigger_timeout(self, dependent: str):
+        window = self.trigger_windows.pop(dependent, None)
+        if not window:
+            return
+        message = f"上游 {window['upstream']} 未在 {self.dependencies[dependent]['max_wait'] / 60:.0f} 分钟内成功，直接执行 {dependent}"
+        print(f"⚠️ {message}")
+        logger.warning(message)
+        self.dispatch(dependent, f"等待{window['upstream']}超时")
+
+    def on_schedule_changed(self):
+        self.save_schedule_state()
+        self.print_countdown_status()
+
+    def get_next_fire_times(self) -> List[Dict]:
+        now = datetime.now()
+        jobs = [{
+            "job_id": entry['job_id'],
+            "service_id": entry['service_id'],
+            "service_name": self.scheduled_services[entry['service_id']]['name'],
+            "cron": entry['spec'].expression,
+            "scheduled_time": entry['label'],
+            "next_execution": entry['next_fire'].strftime("%Y-%m-%d %H:%M:%S"),
+            "seconds_until": max(0, int((entry['next_fire'] - now).total_seconds()))
+        } for entry in self.timer.next_fire_times()]
+
+        for dependent, dependency in self.dependencies.items():
+            window = self.trigger_windows.get(dependent)
+            specs = self.get_trigger_specs(dependent)
+            if window:
+                next_time = datetime.fromtimestamp(window["deadline"])
+            elif specs:
+                next_time = min(spec.next_after(now) for spec in specs)
+            else:
+                continue
+            jobs.append({
+                "job_id": f"{dependent}@after:{dependency['upstream']}",
+                "service_id": dependent,
+                "service_name": self.scheduled_services[dependent]['name'],
+                "cron": None,
+                "trigger": f"after {dependency['upstream']}",
+                "waiting": bool(window),
+                "scheduled_time": f"{dependency['upstream']}完成后",
+                "next_execution": next_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "seconds_until": max(0, int((next_time - now).total_seconds()))
+            })
+
+        jobs.sort(key=lambda job: job['next_execution'])
+        return jobs
+
+    def save_schedule_state(self):
+        state = {
+            "pid": os.getpid(),
+            "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "jobs": self.get_next_fire_times(),
+            "runner": self.job_runner.get_status()
+        }
+        try:
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            logger.warning(f"保存调度状态失败: {e}")
 
     def update_next_tasks(self):
         self.next_tasks = []
 
-        for service_id, config in self.scheduled_services.items():
-            service_name = config["name"]
-
-            for time_str in config["times"]:
-                next_time = self.calculate_next_execution_time(service_id, time_str)
-
-                self.next_tasks.append({
-                    "service_id": service_id,
-                    "service_name": service_name,
-                    "scheduled_time": time_str,
-                    "next_execution": next_time,
-                    "countdown": self.get_time_until_execution(next_time)
-                })
-
-        self.next_tasks.sort(key=lambda x: x["next_execution"])
+        for job in self.get_next_fire_times():
+            next_time = datetime.strptime(job['next_execution'], "%Y-%m-%d %H:%M:%S")
+            self.next_tasks.append({
+                "service_id": job['service_id'],
+                "service_name": job['service_name'],
+                "scheduled_time": job['scheduled_time'],
+                "next_execution": next_time,
+                "countdown": self.get_time_until_execution(next_time)
+            })
 
     def print_countdown_status(self):
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -319,6 +637,18 @@ class PreciseScheduler:
 
         print("-" * 120)
 
+        runner_status = self.job_runner.get_status()
+        print(f"🧵 任务执行器: 并发上限 {runner_status['max_concurrency']}, "
+              f"运行中 {len(runner_status['running'])}, 排队 {runner_status['queue_size']}, "
+              f"等待重入 {len(runner_status['deferred'])}")
+        for job in runner_status['running']:
+            print(f"  ▶️ {job['service_id']} ({job['scheduled_time']}) 已运行 {job['running_seconds']}s")
+        for service_id, stats in runner_status['services'].items():
+            if stats['runs']:
+                print(f"  ⏱️ {service_id}: {stats['runs']} 次, 平均 {stats['avg_seconds']}s, "
+                      f"P95 {stats['p95_seconds']}s, 最长 {stats['max_seconds']}s")
+        print("-" * 120)
+
         print(f"📝 手动触发服务列表 (共{len(self.manual_services)}个):")
         print("-" * 80)
         for service_id, config in self.manual_services.items():
@@ -345,30 +675,6 @@ class PreciseScheduler:
         print("=" * 120)
         print()
 
-    async def countdown_loop(self):
-        while self.is_running:
-            try:
-                self.print_countdown_status()
-
-                await asyncio.sleep(600)
-
-            except Exception as e:
-                logger.error(f"倒计时循环发生错误: {e}")
-                print(f"❌ 倒计时循环错误: {e}")
-                await asyncio.sleep(60)
-
-    async def schedule_loop(self):
-        while self.is_running:
-            try:
-                schedule.run_pending()
-
-                await asyncio.sleep(1)
-
-            except Exception as e:
-                logger.error(f"定时任务循环发生错误: {e}")
-                print(f"❌ 定时任务循环错误: {e}")
-                await asyncio.sleep(5)
-
     def print_startup_info(self):
         print("🤖 精确智能运维定时调度器")
         print("=" * 60)
@@ -380,12 +686,13 @@ class PreciseScheduler:
         for service_id, config in self.manual_services.items():
             print(f"  {service_id}: {config['name']} - {config['description']}")
 
-        print(f"\n⏰ 倒计时报告: 每10分钟输出一次")
+        print(f"\n⏰ 倒计时报告: 启动时及每次定时触发后输出")
         print(f"💡 按 Ctrl+C 停止调度器")
         print("=" * 60)
 
     async def start_scheduler(self):
         self.is_running = True
+        self.stop_event = asyncio.Event()
 
         self.print_startup_info()
         self.setup_schedule()
@@ -393,12 +700,12 @@ class PreciseScheduler:
         logger.info("精确定时调度器启动")
 
         try:
+            self.job_runner.start()
+            self.timer.start()
+            self.save_schedule_state()
             self.print_countdown_status()
 
-            await asyncio.gather(
-                self.schedule_loop(),
-                self.countdown_loop()
-            )
+            await self.stop_event.wait()
 
         except KeyboardInterrupt:
             print("\n\n🛑 收到停止信号，正在关闭调度器...")
@@ -411,6 +718,13 @@ class PreciseScheduler:
 
     async def stop_scheduler(self):
         self.is_running = False
+        self.timer.stop()
+        for window in self.trigger_windows.values():
+            window["handle"].cancel()
+        self.trigger_windows.clear()
+        await self.job_runner.stop()
+        if self.stop_event:
+            self.stop_event.set()
         final_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         print("🛑 精确定时调度器已停止")
@@ -25,4 +25,47 @@ OUTPUT_FILES = {
     'hardware_summary': 'data/hardware_summary.txt'
 }
 
+# 定时服务：cron 为标准5段式表达式（分 时 日 月 周），由 chat_scheduler 的定时器堆调度
+# priority 越小越先执行；overlap 为同一服务上次仍在运行时的策略：skip 跳过本次，queue 排队等待上次结束
+# after 声明事件触发：上游服务成功后立即执行，上游触发后 max_wait_minutes 分钟内未成功则按超时直接执行
+SCHEDULED_SERVICES = {
+    'service_005': {
+        'name': '完整巡检流程',
+        'requests': ['执行完整巡检流程', '进行全流程巡检', '一键巡检', '完整硬件巡检'],
+        'after': {'service': 'service_010', 'max_wait_minutes': 30},
+        'priority': 4,
+        'overlap': 'skip'
+    },
+    'service_007': {
+        'name': '日报生成',
+        'requests': ['生成日报', '生成每日监控报告', '昨日系统分析报告', '日常监控日报'],
+        'cron': ['10 10 * * *', '10 15 * * *'],
+        'priority': 3,
+        'overlap': 'queue'
+    },
+    'service_008': {
+        'name': '周报生成',
+        'requests': ['生成周报', '生成每周监控报告', '上周系统分析报告', '周期性监控周报'],
+        'cron': ['0 8 * * mon'],
+        'priority': 5,
+        'overlap': 'queue'
+    },
+    'service_009': {
+        'name': '服务监控检查',
+        'requests': ['执行服务监控检查', '检查服务运行状态', '服务健康检查', '平台服务监控'],
+        'cron': ['55 9 * * *', '55 14 * * *'],
+        'priority': 1,
+        'overlap': 'skip'
+    },
+    'service_010': {
+        'name': '平台性能监控',
+        'requests': ['执行平台性能监控', '监控系统性能', '平台资源监控', '性能指标检查'],
+        'cron': ['58 9 * * *', '58 14 * * *'],
+        'priority': 2,
+        'overlap': 'skip'
+    }
+}
+
+SCHEDULER_STATE_FILE = 'data/scheduler_state.json'
+
 os.makedirs('data', exist_ok=True)
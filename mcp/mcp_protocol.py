@@ -100,11 +100,19 @@ class MCPProtocol:
                 "parameters": {
                     "type": "object",
                     "properties": {
-                        "file_path": {"type": "string", "description": "日志文件路径", "required": True},
+                        "file_path": {"type": "string", "description": "日志文件路径（支持通配符）", "required": True},
                         "line_limit": {"type": "integer", "description": "读取行数限制", "default": 1000},
                         "error_keywords": {"type": "array", "items": {"type": "string"}, "description": "自定义错误关键词"},
                         "context_lines": {"type": "integer", "description": "错误上下文行数", "default": 3},
-                        "ai_analysis": {"type": "boolean", "description": "是否启用AI分析", "default": True}
+                        "ai_analysis": {"type": "boolean", "description": "是否启用AI分析", "default": True},
+                        "full_scan": {"type": "boolean", "description": "是否全量分块扫描整个日志文件（忽略行数限制）", "default": False},
+                        "scan_workers": {"type": "integer", "description": "全量扫描时按字节区间并行的进程数", "default": 1},
+                        "use_mmap": {"type": "boolean", "description": "全量扫描时是否使用mmap读取", "default": False},
+                        "tail_mode": {"type": "boolean", "description": "是否增量分析（只分析上次分析后新追加的内容，自动处理日志轮转）", "default": False},
+                        "template_mining": {"type": "boolean", "description": "是否将日志聚类为模板后再提交AI分析（节省Token并覆盖全文件）", "default": False},
+                        "log_set": {"type": "boolean", "description": "是否将file_path作为日志集合分析（含轮转文件与gz/bz2/xz/zst压缩文件，file_path也可为通配符）", "default": False},
+                        "remote_hosts": {"type": "array", "items": {"type": "string"},
+                                         "description": "远程主机IP列表，通过SSH在目标主机上预过滤日志后仅回传命中行"}
                     }
                 }
             },
@@ -116,7 +124,11 @@ class MCPProtocol:
                 "parameters": {
                     "type": "object",
                     "properties": {
-                        "debug": {"type": "boolean", "description": "是否启用调试模式", "default": False}
+                        "debug": {"type": "boolean", "description": "是否启用调试模式", "default": False},
+                        "map_reduce": {"type": "boolean", "description": "是否启用Map-Reduce分块并发分析（异常数据量大时自动启用）", "default": False},
+                        "parallel_sections": {"type": "boolean", "description": "是否并发生成各报告分段", "default": False},
+                        "force_refresh": {"type": "boolean", "description": "是否忽略日报缓存强制重新生成", "default": False},
+                        "streaming": {"type": "boolean", "description": "是否使用服务端游标流式处理大数据量查询", "default": False}
                     }
                 }
             },
@@ -128,7 +140,9 @@ class MCPProtocol:
                 "parameters": {
                     "type": "object",
                     "properties": {
-                        "debug": {"type": "boolean", "description": "是否启用调试模式", "default": False}
+                        "debug": {"type": "boolean", "description": "是否启用调试模式", "default": False},
+                        "parallel_sections": {"type": "boolean", "description": "是否并发生成各报告分段", "default": False},
+                        "incremental": {"type": "boolean", "description": "是否基于已存储的日报聚合数据增量生成周报", "default": False}
                     }
                 }
             },
@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import contextvars
+import hashlib
 import json
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
 from datetime import datetime, timedelta, time as dt_time
 import requests
+import pymysql
 from decimal import Decimal
 
 import sys
@@ -15,10 +21,42 @@ sys.path.insert(0, project_root)
 
 from utils.logger import setup_logger
 from utils.database import get_connection
+from utils.llm_stream import stream_chat_completion
 from config.config import LLM_CONFIG
 
 logger = setup_logger(__name__)
 
+AI_TOKEN_LIMIT = 35000
+MAP_REDUCE_CHUNK_SIZE = 40
+MAP_REDUCE_CHUNK_TOKEN_LIMIT = 6000
+MAP_REDUCE_REDUCE_TOKEN_LIMIT = 12000
+MAP_REDUCE_MAX_WORKERS = 4
+SECTION_MAX_WORKERS = 6
+
+REPORT_CACHE_FILE = os.path.join(project_root, 'services', 'data', 'daily_report_cache.json')
+REPORT_CACHE_MAX_ENTRIES = 30
+STREAM_FETCH_BATCH_SIZE = 5000
+
+SERVER_STATUS_FIELDS = ("cpu", "memory", "disk", "network", "packet_loss", "user_load")
+POWER_STATUS_FIELDS = {
+    "battery_status": "battery_anomalies",
+    "avg_input_voltage_status": "input_voltage_anomalies",
+    "avg_output_voltage_status": "output_voltage_anomalies",
+    "avg_input_current_status": "input_current_anomalies",
+    "avg_output_current_status": "output_current_anomalies",
+    "avg_temperature_status": "temperature_anomalies",
+    "avg_humidity_status": "humidity_anomalies"
+}
+
+DAILY_SECTION_SPECS = {
+    "运维日报": "300字，包括整体运行状况概述、主要指标、关键事件等",
+    "异常分析": "200字，对发现的异常情况进行原因分析",
+    "风险预测": "200字，根据当前数据预测可能出现的风险",
+    "运维建议": "200字，针对发现的问题提出具体可行的运维建议",
+    "重点关注": "200字，需要重点关注和处理的问题",
+    "中度关注": "200字，需要持续监控但暂不需要立即处理的问题"
+}
+
 
 def convert_decimal(obj):
     if isinstance(obj, Decimal):
@@ -97,10 +135,7 @@ def generate_unique_id(prefix='oas'):
     return f"{prefix}{timestamp}"
 
 
-def fetch_server_metrics(conn, start_time, end_time):
-    print(f"    📊 启动数据库连接，查询服务器性能指标...")
-    with conn.cursor() as cursor:
-        query = """
+SERVER_METRICS_QUERY = """
                 SELECT ip,
                        cpu_usage,
                        cpu_status,
@@ -115,16 +150,8 @@ def fetch_server_metrics(conn, start_time, end_time):
                 FROM howso_server_performance_metrics
                 WHERE collect_time BETWEEN %s AND %s
                 """
-        cursor.execute(query, (start_time, end_time))
-        results = cursor.fetchall()
-        print(f"    ✅ 服务器性能数据采集完成，共获取 {len(results)} 条性能记录")
-        return [dict(zip([desc[0] for desc in cursor.description], convert_decimal(row))) for row in results]
-
 
-def fetch_service_status(conn, start_time, end_time):
-    print(f"    🔧 查询服务状态监控数据...")
-    with conn.cursor() as cursor:
-        query = """
+SERVICE_STATUS_QUERY = """
                 SELECT platform,
                        server_name,
                        server_ip,
@@ -136,16 +163,8 @@ def fetch_service_status(conn, start_time, end_time):
                 FROM plat_service_monitoring
                 WHERE insert_time BETWEEN %s AND %s
                 """
-        cursor.execute(query, (start_time, end_time))
-        results = cursor.fetchall()
-        print(f"    ✅ 服务状态数据采集完成，共获取 {len(results)} 条服务记录")
-        return [dict(zip([desc[0] for desc in cursor.description], convert_decimal(row))) for row in results]
-
 
-def fetch_nas_pools(conn, start_date, end_date):
-    print(f"    💾 查询存储池监控数据...")
-    with conn.cursor() as cursor:
-        query = """
+NAS_POOLS_QUERY = """
                 SELECT server_name,
                        pool_name,
                        used_space,
@@ -159,18 +178,8 @@ def fetch_nas_pools(conn, start_date, end_date):
                 FROM nas_pools_detail
                 WHERE inspection_date BETWEEN %s AND %s
                 """
-        cursor.execute(query, (start_date, end_date))
-        results = cursor.fetchall()
-        print(f"    ✅ 存储池数据采集完成，共获取 {len(results)} 条存储记录")
-        return [dict(zip([desc[0] for desc in cursor.description], convert_decimal(row))) for row in results]
 
-
-def fetch_power_monitoring(conn, start_time, end_time):
-    try:
-        print(f"    ⚡ 查询电力监控数据...")
-        with conn.cursor() as cursor:
-            twelve_hours_ago = datetime.now() - timedelta(hours=12)
-            query = """
+POWER_MONITORING_QUERY = """
                     SELECT battery_status,
                            ups_supply_time,
                            avg_input_voltage,
@@ -187,19 +196,155 @@ def fetch_power_monitoring(conn, start_time, end_time):
                            avg_humidity_status,
                            inspection_time
                     FROM power_monitoring_avg_data
-                    WHERE inspection_time >= %s
+                    WHERE inspection_time BETWEEN %s AND %s
                     ORDER BY inspection_time DESC
                     """
-            cursor.execute(query, (twelve_hours_ago,))
+
+
+def row_to_dict(cursor, row):
+    if isinstance(row, dict):
+        return convert_decimal(row)
+    return dict(zip([desc[0] for desc in cursor.description], convert_decimal(row)))
+
+
+def iter_query_rows(conn, query, args, batch_size=STREAM_FETCH_BATCH_SIZE):
+    with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
+        cursor.execute(query, args)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row_to_dict(cursor, row)
+
+
+def fetch_server_metrics(conn, start_time, end_time):
+    print(f"    📊 启动数据库连接，查询服务器性能指标...")
+    with conn.cursor() as cursor:
+        cursor.execute(SERVER_METRICS_QUERY, (start_time, end_time))
+        results = cursor.fetchall()
+        print(f"    ✅ 服务器性能数据采集完成，共获取 {len(results)} 条性能记录")
+        return [row_to_dict(cursor, row) for row in results]
+
+
+def fetch_service_status(conn, start_time, end_time):
+    print(f"    🔧 查询服务状态监控数据...")
+    with conn.cursor() as cursor:
+        cursor.execute(SERVICE_STATUS_QUERY, (start_time, end_time))
+        results = cursor.fetchall()
+        print(f"    ✅ 服务状态数据采集完成，共获取 {len(results)} 条服务记录")
+        return [row_to_dict(cursor, row) for row in results]
+
+
+def fetch_nas_pools(conn, start_date, end_date):
+    print(f"    💾 查询存储池监控数据...")
+    with conn.cursor() as cursor:
+        cursor.execute(NAS_POOLS_QUERY, (start_date, end_date))
+        results = cursor.fetchall()
+        print(f"    ✅ 存储池数据采集完成，共获取 {len(results)} 条存储记录")
+        return [row_to_dict(cursor, row) for row in results]
+
+
+def fetch_power_monitoring(conn, start_time, end_time):
+    try:
+        print(f"    ⚡ 查询电力监控数据...")
+        with conn.cursor() as cursor:
+            cursor.execute(POWER_MONITORING_QUERY, (start_time, end_time))
             results = cursor.fetchall()
             print(f"    ✅ 电力监控数据采集完成，共获取 {len(results)} 条电力记录")
-            return [dict(zip([desc[0] for desc in cursor.description], convert_decimal(row))) for row in results]
+            return [row_to_dict(cursor, row) for row in results]
     except Exception as e:
         print(f"    ⚠️ 电力监控数据采集遇到问题: {e}")
         logger.error(f"🚨 Error fetching power monitoring data: {e}")
         return []
 
 
+def fetch_source_fingerprint(conn, start_time, end_time):
+    print(f"    🔎 计算源数据指纹（各表记录数与最新写入时间）...")
+    queries = {
+        "howso_server_performance_metrics": (
+            """
+            SELECT COUNT(*) AS row_count, MAX(collect_time) AS max_time
+            FROM howso_server_performance_metrics
+            WHERE collect_time BETWEEN %s AND %s
+            """, (start_time, end_time)),
+        "plat_service_monitoring": (
+            """
+            SELECT COUNT(*) AS row_count, MAX(insert_time) AS max_time
+            FROM plat_service_monitoring
+            WHERE insert_time BETWEEN %s AND %s
+            """, (start_time, end_time)),
+        "nas_pools_detail": (
+            """
+            SELECT COUNT(*) AS row_count, MAX(CONCAT(inspection_date, ' ', inspection_time)) AS max_time
+            FROM nas_pools_detail
+            WHERE inspection_date BETWEEN %s AND %s
+            """, (start_time.date(), end_time.date())),
+        "power_monitoring_avg_data": (
+            """
+            SELECT COUNT(*) AS row_count, MAX(inspection_time) AS max_time
+            FROM power_monitoring_avg_data
+            WHERE inspection_time BETWEEN %s AND %s
+            """, (start_time, end_time))
+    }
+
+    fingerprint = {}
+    with conn.cursor() as cursor:
+        for table, (query, args) in queries.items():
+            cursor.execute(query, args)
+            row = cursor.fetchone()
+            if isinstance(row, dict):
+                row_count, max_time = row.get('row_count'), row.get('max_time')
+            else:
+                row_count, max_time = row if row else (0, None)
+            fingerprint[table] = {
+                "row_count": safe_int(row_count),
+                "max_time": str(max_time) if max_time is not None else ""
+            }
+    return fingerprint
+
+
+def build_report_cache_key(start_time, end_time, fingerprint, mode):
+    raw = json.dumps({
+        "start_time": safe_datetime_format(start_time),
+        "end_time": safe_datetime_format(end_time),
+        "fingerprint": fingerprint,
+        "mode": mode
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def load_report_cache(cache_file=REPORT_CACHE_FILE):
+    try:
+        if os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.warning(f"⚠️ 读取日报缓存失败，忽略缓存: {e}")
+    return {}
+
+
+def save_report_cache(cache_key, result, cache_file=REPORT_CACHE_FILE, max_entries=REPORT_CACHE_MAX_ENTRIES):
+    try:
+        cache = load_report_cache(cache_file)
+        cache[cache_key] = {
+            "created_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "result": result
+        }
+        if len(cache) > max_entries:
+            newest = sorted(cache.items(), key=lambda item: item[1].get("created_at", ""), reverse=True)
+            cache = dict(newest[:max_entries])
+
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_file, cache_file)
+        logger.info(f"💾 日报结果已写入缓存: {cache_key[:12]}")
+    except Exception as e:
+        logger.warning(f"⚠️ 写入日报缓存失败: {e}")
+
+
 def format_timedelta_as_time(td):
     total_seconds = int(td.total_seconds())
     hours, remainder = divmod(total_seconds, 3600)
@@ -207,24 +352,33 @@ def format_timedelta_as_time(td):
     return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
 
-def get_exceptions(server_metrics, service_status, nas_pools, power_monitoring):
-    print(f"    🔍 开始识别和分析异常数据...")
-    
-    exceptions = {
-        "服务器异常": [],
-        "服务异常": [],
-        "存储异常": [],
-        "电力异常": []
-    }
-
-    for metric in server_metrics:
-        if (metric.get('cpu_status') != '正常' or
-                metric.get('memory_status') != '正常' or
-                metric.get('disk_status') != '正常' or
-                metric.get('network_status') != '正常' or
-                metric.get('packet_loss_status') != '正常' or
-                metric.get('user_load_status') != '正常'):
-
+class DailyReportAccumulator:
+    def __init__(self):
+        self.exceptions = {
+            "服务器异常": [],
+            "服务异常": [],
+            "存储异常": [],
+            "电力异常": []
+        }
+        self.counters = Counter()
+        self.server_ips = set()
+        self.platforms = set()
+        self.rollup_servers = {}
+        self.rollup_services = {}
+        self.rollup_pools = {}
+        self.rollup_power = Counter()
+
+    def add_server_metric(self, metric):
+        self.counters["server_records"] += 1
+        ip = metric.get('ip')
+        if ip:
+            self.server_ips.add(ip)
+
+        abnormal_statuses = [status for status in SERVER_STATUS_FIELDS if metric.get(f"{status}_status") != '正常']
+        for status in abnormal_statuses:
+            self.counters[f"abnormal_{status}"] += 1
+
+        if abnormal_statuses:
             exception_item = {
                 "IP": metric.get('ip', ''),
                 "时间": safe_datetime_format(metric.get('collect_time'))
@@ -243,11 +397,38 @@ def get_exceptions(server_metrics, service_status, nas_pools, power_monitoring):
             if metric.get('user_load_status') != '正常':
                 exception_item["用户负载状态"] = metric.get('user_load_status')
 
-            exceptions["服务器异常"].append(exception_item)
+            self.exceptions["服务器异常"].append(exception_item)
+
+        if not ip:
+            return
+        row = self.rollup_servers.get(ip)
+        if row is None:
+            row = self.rollup_servers[ip] = {
+                "ip": ip, "record_count": 0,
+                "cpu_sum": 0.0, "cpu_samples": 0, "memory_sum": 0.0, "memory_samples": 0,
+                "disk_sum": 0.0, "disk_samples": 0,
+                "cpu_anomalies": 0, "memory_anomalies": 0, "disk_anomalies": 0,
+                "network_anomalies": 0, "packet_loss_anomalies": 0, "user_load_anomalies": 0
+            }
+        row["record_count"] += 1
+        for metric_name in ("cpu", "memory", "disk"):
+            if metric.get(f"{metric_name}_usage") is not None:
+                row[f"{metric_name}_sum"] += safe_float(metric.get(f"{metric_name}_usage"))
+                row[f"{metric_name}_samples"] += 1
+        for status in abnormal_statuses:
+            row[f"{status}_anomalies"] += 1
+
+    def add_service_status(self, service):
+        self.counters["service_records"] += 1
+        if service.get('platform'):
+            self.platforms.add(service.get('platform'))
+        if service.get('status') != '正常':
+            self.counters["abnormal_services"] += 1
+        if service.get('process_status') == '未运行':
+            self.counters["stopped_processes"] += 1
 
-    for service in service_status:
         if service.get('status') != '正常' or service.get('process_status') == '未运行':
-            exceptions["服务异常"].append({
+            self.exceptions["服务异常"].append({
                 "平台": service.get('platform', ''),
                 "服务器": f"{service.get('server_name', '')}({service.get('server_ip', '')})",
                 "服务名称": service.get('service_name', ''),
@@ -257,7 +438,26 @@ def get_exceptions(server_metrics, service_status, nas_pools, power_monitoring):
                 "检测时间": safe_datetime_format(service.get('insert_time'))
             })
 
-    for pool in nas_pools:
+        key = (service.get('platform'), service.get('server_ip'), service.get('service_name'))
+        row = self.rollup_services.get(key)
+        if row is None:
+            row = self.rollup_services[key] = {
+                "platform": key[0], "server_ip": key[1], "service_name": key[2],
+                "total_checks": 0, "anomaly_count": 0, "stop_count": 0
+            }
+        row["total_checks"] += 1
+        if service.get('status') != '正常':
+            row["anomaly_count"] += 1
+        if service.get('process_status') == '未运行':
+            row["stop_count"] += 1
+
+    def add_nas_pool(self, pool):
+        self.counters["pool_records"] += 1
+        if pool.get('status') != '正常':
+            self.counters["abnormal_pools"] += 1
+        if safe_float(pool.get('usage_percentage', 0)) > 80:
+            self.counters["high_usage_pools"] += 1
+
         if pool.get('status') != '正常':
             inspection_time_str = ""
             if isinstance(pool.get('inspection_time'), timedelta):
@@ -271,7 +471,7 @@ def get_exceptions(server_metrics, service_status, nas_pools, power_monitoring):
                 except:
                     inspection_time_str = str(pool.get('inspection_time', ''))
 
-            exceptions["存储异常"].append({
+            self.exceptions["存储异常"].append({
                 "服务器": pool.get('server_name', ''),
                 "存储池": pool.get('pool_name', ''),
                 "已用空间": f"{pool.get('used_space', '')} {pool.get('used_space_unit', '')}",
@@ -282,15 +482,37 @@ def get_exceptions(server_metrics, service_status, nas_pools, power_monitoring):
                 "检测时间": inspection_time_str
             })
 
-    for power in power_monitoring:
-        if (power.get('battery_status') != '正常' or
-                power.get('avg_input_voltage_status') != '正常' or
-                power.get('avg_output_voltage_status') != '正常' or
-                power.get('avg_input_current_status') != '正常' or
-                power.get('avg_output_current_status') != '正常' or
-                power.get('avg_temperature_status') != '正常' or
-                power.get('avg_humidity_status') != '正常'):
-
+        key = (pool.get('server_name'), pool.get('pool_name'))
+        row = self.rollup_pools.get(key)
+        if row is None:
+            row = self.rollup_pools[key] = {
+                "server_name": key[0], "pool_name": key[1],
+                "check_count": 0, "usage_sum": 0.0, "usage_samples": 0, "anomaly_count": 0
+            }
+        row["check_count"] += 1
+        if pool.get('usage_percentage') is not None:
+            row["usage_sum"] += safe_float(pool.get('usage_percentage'))
+            row["usage_samples"] += 1
+        if pool.get('status') != '正常':
+            row["anomaly_count"] += 1
+
+    def add_power_record(self, power):
+        self.counters["power_records"] += 1
+        self.rollup_power["record_count"] += 1
+        for status, rollup_key in POWER_STATUS_FIELDS.items():
+            if power.get(status) != '正常':
+                self.rollup_power[rollup_key] += 1
+
+        if power.get('battery_status') != '正常':
+            self.counters["abnormal_battery"] += 1
+        if power.get('avg_input_voltage_status') != '正常' or power.get('avg_output_voltage_status') != '正常':
+            self.counters["abnormal_voltage"] += 1
+        if power.get('avg_input_current_status') != '正常' or power.get('avg_output_current_status') != '正常':
+            self.counters["abnormal_current"] += 1
+        if power.get('avg_temperature_status') != '正常' or power.get('avg_humidity_status') != '正常':
+            self.counters["abnormal_env"] += 1
+
+        if any(power.get(status) != '正常' for status in POWER_STATUS_FIELDS):
             power_item = {
                 "检测时间": safe_datetime_format(power.get('inspection_time')),
                 "电池状态": power.get('battery_status', ''),
@@ -312,11 +534,76 @@ def get_exceptions(server_metrics, service_status, nas_pools, power_monitoring):
             if power.get('avg_humidity_status') != '正常':
                 power_item["湿度"] = f"{power.get('avg_humidity')}% ({power.get('avg_humidity_status')})"
 
-            exceptions["电力异常"].append(power_item)
+            self.exceptions["电力异常"].append(power_item)
+
+    def consume(self, server_metrics=(), service_status=(), nas_pools=(), power_monitoring=()):
+        for metric in server_metrics:
+            self.add_server_metric(metric)
+        for service in service_status:
+            self.add_service_status(service)
+        for pool in nas_pools:
+            self.add_nas_pool(pool)
+        for power in power_monitoring:
+            self.add_power_record(power)
+        return self
+
+    def has_data(self):
+        return any(self.counters[key] for key in ("server_records", "service_records", "pool_records", "power_records"))
+
+    def get_exceptions(self):
+        return {k: v for k, v in self.exceptions.items() if v}
+
+    def get_data_summary(self):
+        return {
+            "服务器状态": {
+                "总服务器数": len(self.server_ips),
+                "监控记录数": self.counters["server_records"],
+                "CPU异常": self.counters["abnormal_cpu"],
+                "内存异常": self.counters["abnormal_memory"],
+                "磁盘异常": self.counters["abnormal_disk"],
+                "网络异常": self.counters["abnormal_network"],
+                "丢包异常": self.counters["abnormal_packet_loss"],
+                "用户负载异常": self.counters["abnormal_user_load"]
+            },
+            "服务状态": {
+                "平台数量": len(self.platforms),
+                "服务总数": self.counters["service_records"],
+                "异常服务": self.counters["abnormal_services"],
+                "未运行进程": self.counters["stopped_processes"]
+            },
+            "存储状态": {
+                "存储池总数": self.counters["pool_records"],
+                "异常存储池": self.counters["abnormal_pools"],
+                "高使用率存储池(>80%)": self.counters["high_usage_pools"]
+            },
+            "电力状态": {
+                "监控记录数": self.counters["power_records"],
+                "电池异常": self.counters["abnormal_battery"],
+                "电压异常": self.counters["abnormal_voltage"],
+                "电流异常": self.counters["abnormal_current"],
+                "环境异常(温度/湿度)": self.counters["abnormal_env"]
+            }
+        }
 
-    filtered_exceptions = {k: v for k, v in exceptions.items() if v}
+    def get_weekly_rollup(self):
+        power = {"record_count": self.rollup_power["record_count"]}
+        for rollup_key in POWER_STATUS_FIELDS.values():
+            power[rollup_key] = self.rollup_power[rollup_key]
+        return {
+            "servers": list(self.rollup_servers.values()),
+            "services": list(self.rollup_services.values()),
+            "nas_pools": list(self.rollup_pools.values()),
+            "power": power
+        }
+
+
+def get_exceptions(server_metrics, service_status, nas_pools, power_monitoring):
+    print(f"    🔍 开始识别和分析异常数据...")
+
+    accumulator = DailyReportAccumulator().consume(server_metrics, service_status, nas_pools, power_monitoring)
+    filtered_exceptions = accumulator.get_exceptions()
     print(f"    ✅ 异常数据识别完成，发现 {len(filtered_exceptions)} 类异常情况")
-    
+
     return filtered_exceptions
 
 
@@ -346,9 +633,12 @@ def limit_exception_data(exception_data, max_items_per_category=50):
     return limited_data
 
 
-def format_exception_data_for_storage(exception_data):
+def format_exception_data_for_storage(exception_data, weekly_rollup=None):
     if not exception_data:
-        return json.dumps({"summary": "无异常数据", "details": {}}, ensure_ascii=False)
+        result = {"summary": "无异常数据", "details": {}}
+        if weekly_rollup is not None:
+            result["周报聚合"] = weekly_rollup
+        return json.dumps(result, ensure_ascii=False)
 
     summary = {}
     formatted_details = {}
@@ -371,72 +661,120 @@ def format_exception_data_for_storage(exception_data):
         "生成时间": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         "详细信息": formatted_details
     }
+    if weekly_rollup is not None:
+        result["周报聚合"] = weekly_rollup
 
     return json.dumps(result, ensure_ascii=False, indent=2)
 
 
 def prepare_data_summary(server_metrics, service_status, nas_pools, power_monitoring):
     print(f"    📈 开始聚合和分析日度监控数据...")
-    
-    server_ips = set([m.get('ip') for m in server_metrics if m.get('ip')])
-    abnormal_cpu = sum(1 for m in server_metrics if m.get('cpu_status') != '正常')
-    abnormal_memory = sum(1 for m in server_metrics if m.get('memory_status') != '正常')
-    abnormal_disk = sum(1 for m in server_metrics if m.get('disk_status') != '正常')
-    abnormal_network = sum(1 for m in server_metrics if m.get('network_status') != '正常')
-    abnormal_packet_loss = sum(1 for m in server_metrics if m.get('packet_loss_status') != '正常')
-    abnormal_user_load = sum(1 for m in server_metrics if m.get('user_load_status') != '正常')
-
-    services = len(service_status)
-    abnormal_services = sum(1 for s in service_status if s.get('status') != '正常')
-    stopped_processes = sum(1 for s in service_status if s.get('process_status') == '未运行')
-    platforms = set([s.get('platform') for s in service_status if s.get('platform')])
-
-    total_pools = len(nas_pools)
-    abnormal_pools = sum(1 for p in nas_pools if p.get('status') != '正常')
-    high_usage_pools = sum(1 for p in nas_pools if safe_float(p.get('usage_percentage', 0)) > 80)
-
-    power_records = len(power_monitoring)
-    abnormal_battery = sum(1 for p in power_monitoring if p.get('battery_status') != '正常')
-    abnormal_voltage = sum(1 for p in power_monitoring if
-                           p.get('avg_input_voltage_status') != '正常' or p.get('avg_output_voltage_status') != '正常')
-    abnormal_current = sum(1 for p in power_monitoring if
-                           p.get('avg_input_current_status') != '正常' or p.get('avg_output_current_status') != '正常')
-    abnormal_env = sum(
-        1 for p in power_monitoring if
-        p.get('avg_temperature_status') != '正常' or p.get('avg_humidity_status') != '正常')
+
+    accumulator = DailyReportAccumulator().consume(server_metrics, service_status, nas_pools, power_monitoring)
 
     print(f"    ✅ 日度数据聚合完成，生成统计分析结果")
 
-    return {
-        "服务器状态": {
-            "总服务器数": len(server_ips),
-            "监控记录数": len(server_metrics),
-            "CPU异常": abnormal_cpu,
-            "内存异常": abnormal_memory,
-            "磁盘异常": abnormal_disk,
-            "网络异常": abnormal_network,
-            "丢包异常": abnormal_packet_loss,
-            "用户负载异常": abnormal_user_load
-        },
-        "服务状态": {
-            "平台数量": len(platforms),
-            "服务总数": services,
-            "异常服务": abnormal_services,
-            "未运行进程": stopped_processes
-        },
-        "存储状态": {
-            "存储池总数": total_pools,
-            "异常存储池": abnormal_pools,
-            "高使用率存储池(>80%)": high_usage_pools
-        },
-        "电力状态": {
-            "监控记录数": power_records,
-            "电池异常": abnormal_battery,
-            "电压异常": abnormal_voltage,
-            "电流异常": abnormal_current,
-            "环境异常(温度/湿度)": abnormal_env
+    return accumulator.get_data_summary()
+
+
+def prepare_weekly_rollup(server_metrics, service_status, nas_pools, power_monitoring):
+    print(f"    🧮 生成周报复用的日度聚合数据...")
+
+    accumulator = DailyReportAccumulator().consume(server_metrics, service_status, nas_pools, power_monitoring)
+    return accumulator.get_weekly_rollup()
+
+
+def stream_daily_report_data(conn, start_time, end_time, batch_size=STREAM_FETCH_BATCH_SIZE):
+    print(f"    🌊 启用流式查询模式，服务端游标逐批读取（每批 {batch_size} 条）...")
+    accumulator = DailyReportAccumulator()
+
+    for metric in iter_query_rows(conn, SERVER_METRICS_QUERY, (start_time, end_time), batch_size):
+        accumulator.add_server_metric(metric)
+    print(f"    ✅ 服务器性能数据流式处理完成，共 {accumulator.counters['server_records']} 条性能记录")
+
+    for service in iter_query_rows(conn, SERVICE_STATUS_QUERY, (start_time, end_time), batch_size):
+        accumulator.add_service_status(service)
+    print(f"    ✅ 服务状态数据流式处理完成，共 {accumulator.counters['service_records']} 条服务记录")
+
+    for pool in iter_query_rows(conn, NAS_POOLS_QUERY, (start_time.date(), end_time.date()), batch_size):
+        accumulator.add_nas_pool(pool)
+    print(f"    ✅ 存储池数据流式处理完成，共 {accumulator.counters['pool_records']} 条存储记录")
+
+    try:
+        for power in iter_query_rows(conn, POWER_MONITORING_QUERY, (start_time, end_time), batch_size):
+            accumulator.add_power_record(power)
+        print(f"    ✅ 电力监控数据流式处理完成，共 {accumulator.counters['power_records']} 条电力记录")
+    except Exception as e:
+        print(f"    ⚠️ 电力监控数据采集遇到问题: {e}")
+        logger.error(f"🚨 Error streaming power monitoring data: {e}")
+
+    return accumulator
+
+
+def generate_synthetic_server_metrics(row_count, ip_count=500, abnormal_every=1000):
+    base_time = datetime.combine(get_daily_date_range()[2], dt_time.min)
+    for i in range(row_count):
+        abnormal = i % abnormal_every == 0
+        ip_index = i % ip_count
+        yield {
+            "ip": f"10.0.{ip_index // 256}.{ip_index % 256}",
+            "cpu_usage": float(95 if abnormal else i % 70),
+            "cpu_status": '异常' if abnormal else '正常',
+            "memory_usage": float(i % 80),
+            "memory_status": '正常',
+            "disk_usage": float(i % 60),
+            "disk_status": '正常',
+            "network_status": '正常',
+            "packet_loss_status": '正常',
+            "user_load_status": '正常',
+            "collect_time": base_time + timedelta(seconds=i % 86400)
         }
+
+
+def benchmark_streaming_pipeline(row_count=1000000):
+    import tracemalloc
+
+    print(f"    ⏱️ 使用 {row_count} 行合成性能数据对比列表模式与流式模式...")
+    results = {}
+
+    tracemalloc.start()
+    start = time.time()
+    accumulator = DailyReportAccumulator()
+    for metric in generate_synthetic_server_metrics(row_count):
+        accumulator.add_server_metric(metric)
+    accumulator.get_exceptions()
+    accumulator.get_data_summary()
+    results["streaming"] = {
+        "seconds": round(time.time() - start, 2),
+        "peak_mb": round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+    }
+    del accumulator
+
+    tracemalloc.reset_peak()
+    start = time.time()
+    server_metrics = list(generate_synthetic_server_metrics(row_count))
+    get_exceptions(server_metrics, [], [], [])
+    prepare_data_summary(server_metrics, [], [], [])
+    results["list"] = {
+        "seconds": round(time.time() - start, 2),
+        "peak_mb": round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
     }
+    del server_metrics
+    tracemalloc.stop()
+
+    for mode, stats in results.items():
+        print(f"    📊 {mode}: 耗时 {stats['seconds']}s, 内存峰值 {stats['peak_mb']} MB")
+    return results
+
+
+def clean_section_content(content):
+    clean_content = content.strip()
+    clean_content = re.sub(r'^\s*\d+\.\s*', '', clean_content, flags=re.MULTILINE)
+    clean_content = re.sub(r'[\*\-]{1,3}\s+', '', clean_content, flags=re.MULTILINE)
+    clean_content = re.sub(r'\n+', ' ', clean_content)
+    clean_content = re.sub(r'\s+', ' ', clean_content)
+    clean_content = clean_content.replace('---', '')
+    return clean_content.strip()
 
 
 def parse_ai_response(ai_response):
@@ -457,13 +795,7 @@ def parse_ai_response(ai_response):
     for title, content in matches:
         for section in sections.keys():
             if section in title:
-                clean_content = content.strip()
-                clean_content = re.sub(r'^\s*\d+\.\s*', '', clean_content, flags=re.MULTILINE)
-                clean_content = re.sub(r'[\*\-]{1,3}\s+', '', clean_content, flags=re.MULTILINE)
-                clean_content = re.sub(r'\n+', ' ', clean_content)
-                clean_content = re.sub(r'\s+', ' ', clean_content)
-                clean_content = clean_content.replace('---', '')
-                sections[section] = clean_content.strip()
+                sections[section] = clean_section_content(content)
                 break
 
     if not any(sections.values()):
@@ -552,12 +884,8 @@ def estimate_token_count(text):
     return int(estimated_tokens)
 
 
-def get_ai_analysis(data_summary, exception_data):
-    print(f"    🧠 启动QWEN3-32B AI引擎进行深度分析...")
-    
-    limited_exception_data = limit_exception_data(exception_data, max_items_per_category=50)
-
-    simplified_summary = {
+def build_simplified_summary(data_summary):
+    return {
         "服务器状态": {
             "总服务器数": data_summary["服务器状态"]["总服务器数"],
             "CPU异常": data_summary["服务器状态"]["CPU异常"],
@@ -582,6 +910,366 @@ def get_ai_analysis(data_summary, exception_data):
         }
     }
 
+
+def request_chat_completion(messages, max_tokens=1500, timeout=120, temperature=0.7, label='daily_report'):
+    url = f"{LLM_CONFIG['base_url']}{LLM_CONFIG['chat_endpoint']}"
+
+    payload = {
+        "model": LLM_CONFIG['model_name'],
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+
+    headers = {
+        "Content-Type": "application/json"
+    }
+
+    content = stream_chat_completion(url, payload, headers, timeout=timeout, label=label, verify=False)
+    if not content or content.strip() == "":
+        raise Exception("AI响应内容为空")
+    return content
+
+
+def generate_section(section, requirement, context, system_prompt):
+    prompt = f"""
+    {context}
+
+    请仅输出"{section}"部分的正文（{requirement}），不要输出标题、序号或其他部分的内容。
+    """
+
+    content = request_chat_completion([
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ], max_tokens=600, timeout=120, label=f'daily_report:{section}')
+
+    lines = content.strip().split('\n')
+    if lines and section in lines[0] and len(lines[0].strip('#*：: ')) <= len(section) + 12:
+        lines = lines[1:]
+    return clean_section_content('\n'.join(lines))
+
+
+def generate_sections_concurrently(context, section_specs, system_prompt, max_workers=SECTION_MAX_WORKERS):
+    print(f"    ⚡ 并发生成 {len(section_specs)} 个报告分段，并发数 {max_workers}...")
+
+    sections = {section: "" for section in section_specs}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            # 复制调用方上下文，分段流式输出仍能关联到发起的聊天任务
+            section: executor.submit(contextvars.copy_context().run,
+                                     generate_section, section, requirement, context, system_prompt)
+            for section, requirement in section_specs.items()
+        }
+        for section, future in futures.items():
+            try:
+                sections[section] = future.result()
+            except Exception as e:
+                errors[section] = str(e)
+                logger.error(f"🚨 报告分段 {section} 生成失败: {e}")
+
+    if errors:
+        print(f"    ⚠️ {len(errors)} 个报告分段生成失败: {', '.join(errors.keys())}")
+    if not any(sections.values()):
+        first_section = next(iter(section_specs))
+        sections[first_section] = f"AI分段分析服务异常: {next(iter(errors.values()), '响应内容为空')}"
+
+    print(f"    ✅ 报告分段生成完成")
+    return sections
+
+
+def benchmark_ai_analysis_modes(analysis_func, data_summary, exception_data, rounds=3):
+    print(f"    ⏱️ 开始对比单次调用与并发分段两种AI分析模式，每种模式执行 {rounds} 轮...")
+
+    results = {}
+    for mode, kwargs in (("single_call", {}), ("parallel_sections", {"parallel_sections": True})):
+        durations = []
+        empty_sections = 0
+        total_sections = 0
+        for _ in range(rounds):
+            start = time.time()
+            sections = analysis_func(data_summary, exception_data, **kwargs)
+            durations.append(time.time() - start)
+            empty_sections += sum(1 for content in sections.values() if not content)
+            total_sections += len(sections)
+
+        results[mode] = {
+            "rounds": rounds,
+            "avg_seconds": round(sum(durations) / len(durations), 2),
+            "min_seconds": round(min(durations), 2),
+            "max_seconds": round(max(durations), 2),
+            "parse_failure_rate": round(empty_sections / total_sections, 3) if total_sections else 0
+        }
+
+    for mode, stats in results.items():
+        print(f"    📊 {mode}: 平均 {stats['avg_seconds']}s (最快 {stats['min_seconds']}s / 最慢 {stats['max_seconds']}s), "
+              f"分段缺失率 {stats['parse_failure_rate']:.1%}")
+    logger.info(f"⏱️ AI分析模式对比结果: {results}")
+    return results
+
+
+def split_exception_chunks(exception_data, chunk_size=MAP_REDUCE_CHUNK_SIZE,
+                           token_limit=MAP_REDUCE_CHUNK_TOKEN_LIMIT):
+    chunks = []
+    for category, exceptions in exception_data.items():
+        total = len(exceptions)
+        current = []
+        current_tokens = 0
+        start = 0
+        for index, item in enumerate(exceptions):
+            item_tokens = estimate_token_count(json.dumps(item, ensure_ascii=False))
+            if current and (len(current) >= chunk_size or current_tokens + item_tokens > token_limit):
+                chunks.append({"category": category, "start": start + 1, "end": index,
+                               "total": total, "items": current})
+                current = []
+                current_tokens = 0
+                start = index
+            current.append(item)
+            current_tokens += item_tokens
+        if current:
+            chunks.append({"category": category, "start": start + 1, "end": total,
+                           "total": total, "items": current})
+    return chunks
+
+
+def summarize_exception_chunk_locally(chunk):
+    target_counter = Counter()
+    field_counter = Counter()
+    for item in chunk["items"]:
+        target = item.get("IP") or item.get("服务器") or item.get("检测时间") or "未知对象"
+        if item.get("服务名称"):
+            target = f"{target}/{item.get('服务名称')}"
+        if item.get("存储池"):
+            target = f"{target}/{item.get('存储池')}"
+        target_counter[target] += 1
+        for key in item.keys():
+            if key.endswith("状态") or key in ("输入电压", "输出电压", "输入电流", "输出电流", "温度", "湿度", "使用率"):
+                field_counter[key] += 1
+
+    targets = "、".join(f"{name}({count}次)" for name, count in target_counter.most_common())
+    fields = "、".join(f"{name}({count}次)" for name, count in field_counter.most_common())
+    return f"共{len(chunk['items'])}条异常；涉及对象: {targets}；异常指标: {fields}"
+
+
+def summarize_exception_chunk(chunk):
+    prompt = f"""
+    请作为数据中心运维专家，对以下"{chunk['category']}"明细（第{chunk['start']}-{chunk['end']}条，共{chunk['total']}条）进行归纳摘要：
+
+    1. 按对象（服务器/服务/存储池/电力设备）归类统计异常次数，不得遗漏任何对象
+    2. 指出主要异常类型、集中出现的时间段和最严重的情况
+    3. 摘要不超过200字，不要输出标题
+
+    异常明细：
+    {json.dumps(chunk['items'], ensure_ascii=False)}
+    """
+
+    try:
+        summary = request_chat_completion([
+            {"role": "system", "content": "你是一位资深的数据中心运维专家，负责对监控异常明细做无遗漏的归纳摘要。"},
+            {"role": "user", "content": prompt}
+        ], max_tokens=400, timeout=60, temperature=0.3, label='daily_report_summary')
+        source = "ai"
+    except Exception as e:
+        logger.warning(f"⚠️ {chunk['category']} 第{chunk['start']}-{chunk['end']}条摘要失败，改用本地统计: {e}")
+        summary = summarize_exception_chunk_locally(chunk)
+        source = "local"
+
+    return {
+        "category": chunk["category"],
+        "label": f"{chunk['category']} 第{chunk['start']}-{chunk['end']}条/共{chunk['total']}条",
+        "count": len(chunk["items"]),
+        "summary": summary.strip(),
+        "source": source
+    }
+
+
+def merge_partial_summaries(partials):
+    joined = "\n".join(f"【{p['label']}】{p['summary']}" for p in partials)
+    label = f"{partials[0]['label']} 等{len(partials)}段"
+    prompt = f"""
+    请将以下多段监控异常摘要合并为一段不超过300字的摘要，保留所有涉及对象和异常次数，不要输出标题：
+
+    {joined}
+    """
+
+    try:
+        summary = request_chat_completion([
+            {"role": "system", "content": "你是一位资深的数据中心运维专家，负责合并异常摘要且不遗漏任何对象。"},
+            {"role": "user", "content": prompt}
+        ], max_tokens=600, timeout=60, temperature=0.3, label='daily_report_summary')
+        source = "ai"
+    except Exception as e:
+        # 合并失败时不截断，返回 None 由调用方保留原分段，避免丢失对象和异常次数
+        logger.warning(f"⚠️ 合并摘要 {label} 失败，保留原分段: {e}")
+        return None
+
+    return {
+        "category": partials[0]["category"],
+        "label": label,
+        "count": sum(p["count"] for p in partials),
+        "summary": summary.strip(),
+        "source": source
+    }
+
+
+def group_partial_summaries(partials, group_limit):
+    """按类别分组待合并的摘要，同一组内只包含同一类别，保持原有顺序"""
+    by_category = {}
+    for partial in partials:
+        by_category.setdefault(partial["category"], []).append(partial)
+
+    groups = []
+    for items in by_category.values():
+        current = []
+        current_tokens = 0
+        for partial in items:
+            partial_tokens = estimate_token_count(partial["summary"])
+            if len(current) >= 2 and current_tokens + partial_tokens > group_limit:
+                groups.append(current)
+                current = []
+                current_tokens = 0
+            current.append(partial)
+            current_tokens += partial_tokens
+        if current:
+            groups.append(current)
+    return groups
+
+
+def reduce_partial_summaries(partials, token_limit=MAP_REDUCE_REDUCE_TOKEN_LIMIT,
+                             max_workers=MAP_REDUCE_MAX_WORKERS):
+    while len(partials) > 1:
+        total_tokens = sum(estimate_token_count(p["summary"]) for p in partials)
+        if total_tokens <= token_limit:
+            break
+
+        groups = group_partial_summaries(partials, max(token_limit // 2, 1))
+        merge_groups = [group for group in groups if len(group) > 1]
+        if not merge_groups:
+            print(f"    ⚠️ 异常摘要仍然过大（约{total_tokens} tokens），但各类别已无可合并分段，保留现有摘要")
+            break
+
+        print(f"    🔁 异常摘要仍然过大（约{total_tokens} tokens），合并 {len(merge_groups)} 组同类摘要...")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            merged = list(executor.map(merge_partial_summaries, merge_groups))
+
+        merged_by_group = {id(group): result for group, result in zip(merge_groups, merged)}
+        next_partials = []
+        for group in groups:
+            result = merged_by_group.get(id(group))
+            if result is None:
+                next_partials.extend(group)
+            else:
+                next_partials.append(result)
+        partials = next_partials
+
+        if all(result is None for result in merged):
+            print(f"    ⚠️ 本轮摘要合并全部失败，保留 {len(partials)} 段原始摘要")
+            break
+
+    return partials
+
+
+def get_ai_analysis_map_reduce(data_summary, exception_data, max_workers=MAP_REDUCE_MAX_WORKERS,
+                               parallel_sections=False):
+    print(f"    🧩 启用Map-Reduce分析模式，按类别分块并发摘要...")
+
+    simplified_summary = build_simplified_summary(data_summary)
+    category_totals = {category: len(exceptions) for category, exceptions in exception_data.items()}
+    chunks = split_exception_chunks(exception_data)
+    print(f"    📦 共 {sum(category_totals.values())} 条异常，拆分为 {len(chunks)} 个分块，并发数 {max_workers}")
+    logger.info(f"🧩 Map-Reduce分析: {len(chunks)} 个分块, 异常统计: {category_totals}")
+
+    partials = []
+    if chunks:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            partials = list(executor.map(summarize_exception_chunk, chunks))
+
+    local_count = sum(1 for p in partials if p["source"] == "local")
+    if local_count:
+        print(f"    ⚠️ {local_count} 个分块AI摘要失败，已使用本地统计摘要补全")
+
+    partials = reduce_partial_summaries(partials, max_workers=max_workers)
+    partial_text = "\n".join(f"【{p['label']}】{p['summary']}" for p in partials)
+
+    if parallel_sections:
+        context = f"""
+    请作为数据中心运维专家，根据以下昨天的数据中心监控数据进行分析。
+
+    数据概况：
+    {json.dumps(simplified_summary, ensure_ascii=False, indent=2)}
+
+    异常统计（全量）：
+    {json.dumps(category_totals, ensure_ascii=False)}
+
+    分块异常摘要（覆盖全部异常明细）：
+    {partial_text}
+    """
+        return generate_sections_concurrently(
+            context, DAILY_SECTION_SPECS, "你是一位资深的数据中心运维专家，负责分析昨天的监控数据并提供专业的运维建议。")
+
+    prompt = f"""
+    请作为数据中心运维专家，根据以下昨天的数据中心监控数据，分别提供以下分析（注意字数限制）：
+
+    1. 运维日报(300字)：包括整体运行状况概述、主要指标、关键事件等
+    2. 异常分析(200字)：对发现的异常情况进行原因分析
+    3. 风险预测(200字)：根据当前数据预测可能出现的风险
+    4. 运维建议(200字)：针对发现的问题提出具体可行的运维建议
+    5. 重点关注(200字)：需要重点关注和处理的问题
+    6. 中度关注(200字)：需要持续监控但暂不需要立即处理的问题
+
+    数据概况：
+    {json.dumps(simplified_summary, ensure_ascii=False, indent=2)}
+
+    异常统计（全量）：
+    {json.dumps(category_totals, ensure_ascii=False)}
+
+    分块异常摘要（覆盖全部异常明细）：
+    {partial_text}
+
+    请确保每个部分的内容专业、简洁且有针对性，不要超出字数限制。
+    请用小标题标示每个部分，确保可以清晰区分。
+    """
+
+    try:
+        print(f"    🌐 向AI运维大脑发送汇总分析请求...")
+        ai_response = request_chat_completion([
+            {
+                "role": "system",
+                "content": "你是一位资深的数据中心运维专家，负责分析昨天的监控数据并提供专业的运维建议。请确保回答中的六个部分用明确的标题隔开，便于解析。"
+            },
+            {"role": "user", "content": prompt}
+        ], max_tokens=1500, timeout=120)
+    except Exception as e:
+        print(f"    ❌ AI运维大脑汇总分析失败: {e}")
+        logger.error(f"🚨 Map-Reduce汇总分析失败: {e}")
+        return {
+            "运维日报": f"AI汇总分析服务异常: {str(e)}",
+            "异常分析": partial_text,
+            "风险预测": "",
+            "运维建议": "",
+            "重点关注": "",
+            "中度关注": ""
+        }
+
+    print(f"    ✅ AI运维大脑汇总分析完成，生成专业日报")
+    sections = parse_ai_response(ai_response)
+    if not any(sections.values()):
+        logger.warning("⚠️ AI响应解析后所有部分都为空，使用原始响应")
+        sections["运维日报"] = ai_response[:500]
+        sections["异常分析"] = partial_text
+    return sections
+
+
+def get_ai_analysis(data_summary, exception_data, map_reduce=False, parallel_sections=False):
+    print(f"    🧠 启动QWEN3-32B AI引擎进行深度分析...")
+
+    if map_reduce:
+        return get_ai_analysis_map_reduce(data_summary, exception_data, parallel_sections=parallel_sections)
+
+    limited_exception_data = limit_exception_data(exception_data, max_items_per_category=50)
+
+    simplified_summary = build_simplified_summary(data_summary)
+
     simplified_exceptions = {}
     for category, exceptions in limited_exception_data.items():
         if exceptions:
@@ -619,31 +1307,23 @@ def get_ai_analysis(data_summary, exception_data):
     print(f"    📊 AI输入数据预估token数量: {estimated_tokens}")
     logger.info(f"📊 估算的输入token数量: {estimated_tokens}")
 
-    if estimated_tokens > 35000:
-        print(f"    🔧 输入数据过大，启用智能压缩...")
-        logger.warning(f"⚠️ 输入数据仍然过大（估算{estimated_tokens} tokens），进一步简化")
-        
-        simplified_exceptions = {
-            category: f"共{len(exception_data.get(category, []))}条异常"
-            for category in limited_exception_data.keys()
-        }
-
-        prompt = f"""
-        请作为数据中心运维专家，根据以下昨天的数据中心监控数据概况，提供运维分析：
+    if estimated_tokens > AI_TOKEN_LIMIT:
+        print(f"    🔧 输入数据过大，切换为Map-Reduce分块分析...")
+        logger.warning(f"⚠️ 输入数据过大（估算{estimated_tokens} tokens），改用Map-Reduce分析")
+        return get_ai_analysis_map_reduce(data_summary, exception_data, parallel_sections=parallel_sections)
 
-        数据概况：{json.dumps(simplified_summary, ensure_ascii=False)}
-        异常统计：{json.dumps(simplified_exceptions, ensure_ascii=False)}
+    if parallel_sections:
+        context = f"""
+    请作为数据中心运维专家，根据以下昨天的数据中心监控数据进行分析。
 
-        请分别提供：
-        1. 运维日报(300字)：整体运行状况概述
-        2. 异常分析(200字)：异常情况原因分析
-        3. 风险预测(200字)：可能出现的风险
-        4. 运维建议(200字)：具体可行的建议
-        5. 重点关注(200字)：需要重点关注的问题
-        6. 中度关注(200字)：需要持续监控的问题
+    数据概况：
+    {json.dumps(simplified_summary, ensure_ascii=False, indent=2)}
 
-        请用小标题区分各部分。
-        """
+    主要异常信息（已限制数量）：
+    {json.dumps(simplified_exceptions, ensure_ascii=False, indent=2)}
+    """
+        return generate_sections_concurrently(
+            context, DAILY_SECTION_SPECS, "你是一位资深的数据中心运维专家，负责分析昨天的监控数据并提供专业的运维建议。")
 
     url = f"{LLM_CONFIG['base_url']}{LLM_CONFIG['chat_endpoint']}"
 
@@ -660,13 +1340,11 @@ def get_ai_analysis(data_summary, exception_data):
             }
         ],
         "temperature": 0.7,
-        "max_tokens": 1500,
-        "stream": False
+        "max_tokens": 1500
     }
 
     headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json"
+        "Content-Type": "application/json"
     }
 
     try:
@@ -674,76 +1352,33 @@ def get_ai_analysis(data_summary, exception_data):
         logger.info(f"🔍 正在连接AI服务: {url}")
         logger.info(f"🧠 使用模型: {LLM_CONFIG['model_name']}")
 
-        response = requests.post(
-            url,
-            json=payload,
-            headers=headers,
-            timeout=120,
-            verify=False
-        )
-
-        print(f"    📡 AI运维大脑响应状态: {response.status_code}")
-        logger.info(f"📡 响应状态码: {response.status_code}")
-
-        if response.status_code != 200:
-            print(f"    ❌ AI运维大脑请求失败: {response.status_code}")
-            logger.error(f"🚨 API请求失败，状态码: {response.status_code}")
-            logger.error(f"🚨 响应内容: {response.text}")
-            raise Exception(f"API请求失败，状态码: {response.status_code}, 响应: {response.text}")
-
-        try:
-            result = response.json()
-            print(f"    ✅ AI运维大脑分析完成，生成专业日报")
-            logger.info("🎯 成功接收到AI API响应")
-            logger.debug(f"🔍 响应结构: {result.keys() if isinstance(result, dict) else 'Not a dict'}")
-
-            if "choices" not in result:
-                logger.error(f"🚨 响应中缺少choices字段: {result}")
-                raise Exception(f"API响应格式异常: {result}")
-
-            if not result["choices"] or len(result["choices"]) == 0:
-                logger.error("🚨 响应中choices为空")
-                raise Exception("API响应中choices为空")
-
-            if "message" not in result["choices"][0]:
-                logger.error(f"🚨 响应中缺少message字段: {result['choices'][0]}")
-                raise Exception(f"API响应格式异常，缺少message字段")
-
-            if "content" not in result["choices"][0]["message"]:
-                logger.error(f"🚨 响应中缺少content字段: {result['choices'][0]['message']}")
-                raise Exception(f"API响应格式异常，缺少content字段")
-
-            ai_response = result["choices"][0]["message"]["content"]
-
-            if not ai_response or ai_response.strip() == "":
-                logger.error("🚨 AI响应内容为空")
-                raise Exception("AI响应内容为空")
-
-            print(f"    📝 AI分析结果长度: {len(ai_response)} 字符")
-            logger.info(f"📈 AI响应长度: {len(ai_response)} 字符")
-            logger.debug(f"📄 AI响应前200字符: {ai_response[:200]}")
-
-            sections = parse_ai_response(ai_response)
-
-            if not any(sections.values()):
-                print(f"    ⚠️ AI分析结果解析后所有部分都为空，使用原始响应")
-                logger.warning("⚠️ AI响应解析后所有部分都为空，使用原始响应")
-                return {
-                    "运维日报": ai_response[:500] if len(ai_response) > 500 else ai_response,
-                    "异常分析": "",
-                    "风险预测": "",
-                    "运维建议": "",
-                    "重点关注": "",
-                    "中度关注": ""
-                }
+        ai_response = stream_chat_completion(url, payload, headers, timeout=120, label='daily_report', verify=False)
+        print(f"    ✅ AI运维大脑分析完成，生成专业日报")
+        logger.info("🎯 成功接收到AI API响应")
+
+        if not ai_response or ai_response.strip() == "":
+            logger.error("🚨 AI响应内容为空")
+            raise Exception("AI响应内容为空")
+
+        print(f"    📝 AI分析结果长度: {len(ai_response)} 字符")
+        logger.info(f"📈 AI响应长度: {len(ai_response)} 字符")
+        logger.debug(f"📄 AI响应前200字符: {ai_response[:200]}")
+
+        sections = parse_ai_response(ai_response)
+
+        if not any(sections.values()):
+            print(f"    ⚠️ AI分析结果解析后所有部分都为空，使用原始响应")
+            logger.warning("⚠️ AI响应解析后所有部分都为空，使用原始响应")
+            return {
+                "运维日报": ai_response[:500] if len(ai_response) > 500 else ai_response,
+                "异常分析": "",
+                "风险预测": "",
+                "运维建议": "",
+                "重点关注": "",
+                "中度关注": ""
+            }
 
-            return sections
-
-        except json.JSONDecodeError as e:
-            print(f"    ❌ AI响应JSON格式错误: {e}")
-            logger.error(f"🚨 JSON解析失败: {e}")
-            logger.error(f"🚨 响应内容: {response.text}")
-            raise Exception(f"API响应JSON格式错误: {e}")
+        return sections
 
     except requests.exceptions.Timeout:
         print(f"    ⏰ AI运维大脑请求超时")
@@ -792,11 +1427,11 @@ def get_ai_analysis(data_summary, exception_data):
         }
 
 
-def save_analysis_summary(conn, analysis_data, report_date, exception_data):
+def save_analysis_summary(conn, analysis_data, report_date, exception_data, weekly_rollup=None):
     print(f"    💾 准备将日报分析结果存储到数据库...")
     unique_id = generate_unique_id()
 
-    formatted_exception_data = format_exception_data_for_storage(exception_data)
+    formatted_exception_data = format_exception_data_for_storage(exception_data, weekly_rollup)
 
     insert_query = """
                    INSERT INTO operation_analysis_summary
@@ -831,6 +1466,43 @@ def daily_monitoring_report(params=None):
         print("🚀 启动AI智能日报生成系统...")
         logger.info("📊 开始生成日报监控报告...")
 
+        params = params or {}
+        map_reduce = bool(params.get('map_reduce', False))
+        parallel_sections = bool(params.get('parallel_sections', False))
+        force_refresh = bool(params.get('force_refresh', False))
+        streaming = bool(params.get('streaming', False))
+
+        conn = get_connection()
+
+        start_time, end_time, report_date = get_daily_date_range()
+        print(f"📅 设定日报分析时间范围: {start_time.strftime('%Y-%m-%d')} ({report_date.strftime('%A')})")
+        logger.info(f"📅 报告日期范围: {start_time} 到 {end_time}")
+
+        cache_key = None
+        try:
+            fingerprint = fetch_source_fingerprint(conn, start_time, end_time)
+            cache_key = build_report_cache_key(start_time, end_time, fingerprint, {
+                "map_reduce": map_reduce,
+                "parallel_sections": parallel_sections
+            })
+        except Exception as e:
+            print(f"⚠️ 源数据指纹计算失败，跳过日报缓存: {e}")
+            logger.warning(f"⚠️ 源数据指纹计算失败，跳过缓存: {e}")
+
+        if cache_key and not force_refresh:
+            cached_entry = load_report_cache().get(cache_key)
+            if cached_entry:
+                conn.close()
+                result = dict(cached_entry["result"])
+                result["cached"] = True
+                result["cached_at"] = cached_entry.get("created_at")
+                result["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                print(f"⚡ 源数据未变化，直接返回缓存日报（生成于 {result['cached_at']}）")
+                logger.info(f"⚡ 命中日报缓存: {cache_key[:12]}")
+                return result
+        elif force_refresh:
+            print(f"🔄 已指定强制刷新，忽略日报缓存")
+
         print("🔗 测试AI运维大脑连接状态...")
         logger.info("🔍 测试AI服务连接...")
         connection_ok, connection_msg = test_ai_connection()
@@ -841,41 +1513,44 @@ def daily_monitoring_report(params=None):
             print(f"✅ AI运维大脑连接正常")
             logger.info("🎯 AI服务连接正常")
 
-        conn = get_connection()
-
-        start_time, end_time, report_date = get_daily_date_range()
-        print(f"📅 设定日报分析时间范围: {start_time.strftime('%Y-%m-%d')} ({report_date.strftime('%A')})")
-        logger.info(f"📅 报告日期范围: {start_time} 到 {end_time}")
-
         print(f"📊 开始采集多维度监控数据...")
-        server_metrics = fetch_server_metrics(conn, start_time, end_time)
-        logger.info(f"📈 获取到 {len(server_metrics)} 条服务器指标数据")
+        if streaming:
+            accumulator = stream_daily_report_data(conn, start_time, end_time)
+            logger.info(f"🌊 流式处理完成: {dict(accumulator.counters)}")
+        else:
+            server_metrics = fetch_server_metrics(conn, start_time, end_time)
+            logger.info(f"📈 获取到 {len(server_metrics)} 条服务器指标数据")
 
-        service_status = fetch_service_status(conn, start_time, end_time)
-        logger.info(f"🔧 获取到 {len(service_status)} 条服务状态数据")
+            service_status = fetch_service_status(conn, start_time, end_time)
+            logger.info(f"🔧 获取到 {len(service_status)} 条服务状态数据")
 
-        nas_pools = fetch_nas_pools(conn, start_time.date(), end_time.date())
-        logger.info(f"💾 获取到 {len(nas_pools)} 条NAS存储池数据")
+            nas_pools = fetch_nas_pools(conn, start_time.date(), end_time.date())
+            logger.info(f"💾 获取到 {len(nas_pools)} 条NAS存储池数据")
 
-        power_monitoring = fetch_power_monitoring(conn, start_time, end_time)
-        logger.info(f"⚡ 获取到 {len(power_monitoring)} 条电力监控数据")
+            power_monitoring = fetch_power_monitoring(conn, start_time, end_time)
+            logger.info(f"⚡ 获取到 {len(power_monitoring)} 条电力监控数据")
+
+            accumulator = DailyReportAccumulator().consume(server_metrics, service_status, nas_pools,
+                                                           power_monitoring)
 
-        if not server_metrics and not service_status and not nas_pools and not power_monitoring:
+        if not accumulator.has_data():
             print("⚠️ 未发现可分析的日报数据")
             logger.warning("⚠️ 没有可用于分析的数据")
             conn.close()
             return {"success": False, "message": "没有可用于分析的数据"}
 
         print(f"🔧 开始数据聚合和异常识别...")
-        exception_data = get_exceptions(server_metrics, service_status, nas_pools, power_monitoring)
-        data_summary = prepare_data_summary(server_metrics, service_status, nas_pools, power_monitoring)
+        exception_data = accumulator.get_exceptions()
+        data_summary = accumulator.get_data_summary()
+        weekly_rollup = accumulator.get_weekly_rollup()
 
         print(f"🧠 启动AI深度分析引擎...")
-        analysis_result = get_ai_analysis(data_summary, exception_data)
+        analysis_result = get_ai_analysis(data_summary, exception_data, map_reduce=map_reduce,
+                                          parallel_sections=parallel_sections)
         logger.info("🎯 AI分析完成")
 
         print(f"💾 保存分析结果到运维数据库...")
-        summary_id = save_analysis_summary(conn, analysis_result, report_date, exception_data)
+        summary_id = save_analysis_summary(conn, analysis_result, report_date, exception_data, weekly_rollup)
 
         conn.close()
 
@@ -894,9 +1569,13 @@ def daily_monitoring_report(params=None):
                 "power_exceptions": len(exception_data.get("电力异常", []))
             },
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "ai_connection_status": connection_msg
+            "ai_connection_status": connection_msg,
+            "cached": False
         }
 
+        if cache_key and all(analysis_result.values()):
+            save_report_cache(cache_key, result)
+
         print(f"✅ AI智能日报生成完成")
         print(f"📊 分析日期: {report_date.strftime('%Y-%m-%d')}")
         print(f"📋 报告ID: {summary_id}")
@@ -912,5 +1591,21 @@ def daily_monitoring_report(params=None):
 
 
 if __name__ == "__main__":
-    result = daily_monitoring_report()
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+        conn = get_connection()
+        start_time, end_time, report_date = get_daily_date_range()
+        server_metrics = fetch_server_metrics(conn, start_time, end_time)
+        service_status = fetch_service_status(conn, start_time, end_time)
+        nas_pools = fetch_nas_pools(conn, start_time.date(), end_time.date())
+        power_monitoring = fetch_power_monitoring(conn, start_time, end_time)
+        conn.close()
+        exception_data = get_exceptions(server_metrics, service_status, nas_pools, power_monitoring)
+        data_summary = prepare_data_summary(server_metrics, service_status, nas_pools, power_monitoring)
+        result = benchmark_ai_analysis_modes(get_ai_analysis, data_summary, exception_data, rounds)
+    elif len(sys.argv) > 1 and sys.argv[1] == "stream-benchmark":
+        row_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+        result = benchmark_streaming_pipeline(row_count)
+    else:
+        result = daily_monitoring_report()
     print(f"测试结果: {json.dumps(result, ensure_ascii=False, indent=2)}")
@@ -5,18 +5,953 @@ import sys
 import os
 import re
 import json
+import shlex
+import threading
+import bz2
+import codecs
+import copy
+import glob
+import gzip
+import hashlib
+import lzma
+import time
+import paramiko
 import requests
 from datetime import datetime
-from collections import Counter
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import lru_cache
 
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, project_root)
 
 from utils.logger import setup_logger
+from utils.llm_stream import stream_chat_completion
 from config.config import LLM_CONFIG
+from services.memory_inspection_service import SSH_CONFIGS
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 logger = setup_logger(__name__)
 
+SCAN_CHUNK_SIZE = 4 * 1024 * 1024
+SCAN_MAX_TRACKED_KEYS = 10000
+SCAN_ERROR_SAMPLE_SIZE = 10
+SCAN_TAIL_LINES = 50
+TAIL_STATE_FILE = os.path.join(project_root, 'services', 'data', 'log_tail_state.json')
+TAIL_HEAD_BYTES = 4096
+COMPRESSED_SUFFIXES = ('.gz', '.bz2', '.xz', '.lzma', '.zst', '.zip')
+TEMPLATE_DEPTH = 4
+TEMPLATE_SIM_THRESHOLD = 0.4
+TEMPLATE_MAX_CHILDREN = 100
+TEMPLATE_MAX_CLUSTERS = 2000
+TEMPLATE_EXAMPLE_PARAMS = 3
+TEMPLATE_PROMPT_LIMIT = 30
+TEMPLATE_WILDCARD = '<*>'
+ENCODING_SAMPLE_BYTES = 64 * 1024
+ENCODING_CANDIDATES = ('utf-8', 'gb18030')
+ENCODING_FALLBACK = 'gb18030'
+ENCODING_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+READ_CHUNK_SIZE = 64 * 1024
+REMOTE_MAX_MATCHES = 500
+REMOTE_MAX_WORKERS = 8
+REMOTE_COMMAND_TIMEOUT = 300
+REMOTE_MATCH_MARKER = '__LOG_PREFILTER_MATCHES__'
+REMOTE_STREAM_READERS = {'.gz': 'zcat', '.bz2': 'bzcat', '.xz': 'xzcat', '.zst': 'zstdcat'}
+REMOTE_STATUS_ERRORS = {
+    'missing': "远程日志文件不存在",
+    'unreadable': "远程日志文件不可读",
+    'no_reader': "远程主机缺少解压命令"
+}
+
+TIMESTAMP_PATTERNS = [
+    r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}',
+    r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}',
+    r'\w{3} \d{2} \d{2}:\d{2}:\d{2}',
+]
+IP_PATTERN = r'\b(?:\d{1,3}\.){3}\d{1,3}\b'
+LOG_LEVEL_PATTERN = r'\b(DEBUG|INFO|WARN|WARNING|ERROR|FATAL|CRITICAL)\b'
+LOG_LEVELS = ['DEBUG', 'INFO', 'WARN', 'WARNING', 'ERROR', 'FATAL', 'CRITICAL']
+COMMON_SERVICES = ['mysql', 'nginx', 'apache', 'ssh', 'docker', 'systemd', 'kernel']
+# 与 IP_PATTERN 等价，但以数字开头，正则引擎可跳过非数字位置
+IP_SCAN_PATTERN = r'\d(?<!\w\d)\d{0,2}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b'
+TEMPLATE_MASK_PATTERNS = TIMESTAMP_PATTERNS + [
+    r'\b(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?\b',
+    r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b',
+    r'\b0x[0-9a-fA-F]+\b',
+    r'(?<![A-Za-z0-9])[-+]?\d+(?:\.\d+)?(?![A-Za-z0-9])',
+]
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def build_trie_pattern(words):
+    # 字面量交替展开为前缀树正则，每个位置只需比较一次首字符分支，且贪婪可选组保证同一位置取最长词
+    root = {}
+    for word in words:
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 and len(branches[0]) == 1 else f"(?:{'|'.join(branches)})"
+        return pattern + '?' if '' in node else pattern
+
+    return build(root) or r'(?!x)x'
+
+
+class LogLineMatcher:
+    def __init__(self, error_keywords, services=COMMON_SERVICES):
+        self.error_keywords = list(error_keywords)
+        self.services = list(services)
+        levels = [level.lower() for level in LOG_LEVELS]
+
+        self.keyword_order = {}
+        for index, keyword in enumerate(self.error_keywords):
+            if keyword:
+                self.keyword_order.setdefault(keyword.lower(), []).append((index, keyword))
+
+        # 关键词、服务名与日志级别合并为一个前缀树正则单遍扫描；被较长词元覆盖的短词元由包含关系预计算补全，
+        # 跨越匹配边界的词元（某词元后缀恰为另一词元前缀）再单独回查
+        tokens = set(self.keyword_order) | set(self.services) | set(levels)
+        self.token_regex = re.compile(build_trie_pattern(tokens))
+        self.keyword_regex = re.compile(build_trie_pattern(self.keyword_order))
+        self.ip_regex = re.compile(IP_SCAN_PATTERN)
+        self.timestamp_regex = re.compile('|'.join(f'(?P<ts{i}>{pattern})'
+                                                   for i, pattern in enumerate(TIMESTAMP_PATTERNS)))
+        self.timestamp_regexes = [re.compile(pattern) for pattern in TIMESTAMP_PATTERNS]
+
+        self.implied = {}
+        for token in tokens:
+            self.implied[token] = (
+                [lowered for lowered in self.keyword_order if lowered in token],
+                [service for service in self.services if service in token],
+                [(offset, level.upper(), len(level)) for level in levels for offset in self._find_all(token, level)],
+                [k for k in range(1, len(token))
+                 if any(other.startswith(token[k:]) and len(other) > len(token) - k for other in tokens)]
+            )
+
+    @staticmethod
+    def _find_all(text, word):
+        offset = text.find(word)
+        while offset != -1:
+            yield offset
+            offset = text.find(word, offset + 1)
+
+    def _crossing_tokens(self, line_lower, match, offsets):
+        end = match.end()
+        for offset in offsets:
+            position = match.start() + offset
+            crossing = self.token_regex.match(line_lower, position)
+            if crossing and crossing.end() > end:
+                yield crossing.group(), position
+
+    def scan_tokens(self, line_lower):
+        keywords = set()
+        services = set()
+        levels = []
+
+        for match in self.token_regex.finditer(line_lower):
+            found = [(match.group(), match.start())]
+            crossing_offsets = self.implied[found[0][0]][3]
+            if crossing_offsets:
+                found.extend(self._crossing_tokens(line_lower, match, crossing_offsets))
+
+            for token, position in found:
+                implied_keywords, implied_services, implied_levels, _ = self.implied[token]
+                keywords.update(implied_keywords)
+                services.update(implied_services)
+                for offset, level, length in implied_levels:
+                    start = position + offset
+                    end = start + length
+                    if not (start > 0 and _is_word_char(line_lower[start - 1])) and \
+                            not (end < len(line_lower) and _is_word_char(line_lower[end])):
+                        levels.append((start, level))
+
+        found_keywords = [keyword for _, keyword in
+                          sorted(entry for lowered in keywords for entry in self.keyword_order[lowered])] \
+            if keywords else []
+        if len(levels) > 1:
+            levels = sorted(set(levels))
+        return (found_keywords, [level for _, level in levels],
+                [service for service in self.services if service in services] if services else [])
+
+    def match_keywords(self, line):
+        line_lower = line.lower()
+        if not self.keyword_regex.search(line_lower):
+            return []
+        return self.scan_tokens(line_lower)[0]
+
+    def classify(self, line):
+        found_keywords, levels, services = self.scan_tokens(line.lower())
+        ips = self.ip_regex.findall(line)
+
+        timestamp_format = None
+        timestamp_match = self.timestamp_regex.search(line)
+        if timestamp_match:
+            index = int(timestamp_match.lastgroup[2:])
+            # 合并正则取的是最左匹配；与按声明顺序逐个尝试的旧逻辑保持一致，
+            # 序号更小的格式若在该位置之后命中仍然优先（不可能在其之前命中，否则它就是最左匹配）
+            for earlier in range(index):
+                if self.timestamp_regexes[earlier].search(line, timestamp_match.start() + 1):
+                    index = earlier
+                    break
+            timestamp_format = TIMESTAMP_PATTERNS[index]
+
+        return found_keywords, levels, ips, services, timestamp_format
+
+
+@lru_cache(maxsize=32)
+def _cached_line_matcher(error_keywords, services):
+    return LogLineMatcher(error_keywords, services)
+
+
+def get_line_matcher(error_keywords, services=COMMON_SERVICES):
+    return _cached_line_matcher(tuple(error_keywords), tuple(services))
+
+
+def iter_range_lines(file_path, start, end, chunk_size=SCAN_CHUNK_SIZE, use_mmap=False):
+    # 每个区间负责"起始字节落在 [start, end) 内"的完整行，跨区间的行归前一个区间
+    with open(file_path, 'rb') as f:
+        if use_mmap:
+            import mmap
+            source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            source = f
+
+        try:
+            position = start
+            if start > 0:
+                source.seek(start - 1)
+                if source.read(1) != b'\n':
+                    source.readline()
+                position = source.tell()
+
+            carry = b''
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    if carry:
+                        yield carry
+                    break
+
+                lines = (carry + chunk).split(b'\n')
+                carry = lines.pop()
+                for line in lines:
+                    if position >= end:
+                        return
+                    yield line
+                    position += len(line) + 1
+                if position >= end:
+                    return
+        finally:
+            if use_mmap:
+                source.close()
+
+
+class LogTemplateCluster:
+    def __init__(self, cluster_id, tokens):
+        self.cluster_id = cluster_id
+        self.tokens = tokens
+        self.count = 0
+        self.error_count = 0
+        self.examples = []
+        self.leaf = None
+
+    def to_dict(self):
+        return {
+            'template': ' '.join(self.tokens),
+            'count': self.count,
+            'error_count': self.error_count,
+            'examples': self.examples
+        }
+
+
+class LogTemplateMiner:
+    # Drain 风格固定深度解析树：先按 token 数分组，再按前几个 token 分支，叶子内按相似度归并模板
+    def __init__(self, depth=TEMPLATE_DEPTH, sim_threshold=TEMPLATE_SIM_THRESHOLD,
+                 max_children=TEMPLATE_MAX_CHILDREN, max_clusters=TEMPLATE_MAX_CLUSTERS):
+        self.prefix_depth = max(1, depth - 2)
+        self.sim_threshold = sim_threshold
+        self.max_children = max_children
+        self.max_clusters = max_clusters
+        self.root = {}
+        self.clusters = {}
+        self.next_id = 1
+        self.mask_regex = re.compile('|'.join(f'(?:{pattern})' for pattern in TEMPLATE_MASK_PATTERNS))
+
+    def _mask(self, line):
+        masked_values = []
+
+        def replace(match):
+            masked_values.append(match.group())
+            return TEMPLATE_WILDCARD
+
+        return self.mask_regex.sub(replace, line).split(), masked_values
+
+    @staticmethod
+    def _path_token(token):
+        if token == TEMPLATE_WILDCARD or any(char.isdigit() for char in token):
+            return TEMPLATE_WILDCARD
+        return token
+
+    def _find_leaf(self, tokens, create=False):
+        node = self.root.setdefault(len(tokens), {}) if create else self.root.get(len(tokens))
+        if node is None:
+            return None
+
+        for token in tokens[:self.prefix_depth]:
+            key = self._path_token(token)
+            child = node.get(key)
+            if child is None:
+                if not create:
+                    child = node.get(TEMPLATE_WILDCARD)
+                    if child is None:
+                        return None
+                else:
+                    if len(node) >= self.max_children:
+                        key = TEMPLATE_WILDCARD
+                    child = node.setdefault(key, {})
+            node = child
+
+        if create:
+            return node.setdefault('', [])
+        return node.get('')
+
+    def _best_cluster(self, leaf, tokens):
+        best = None
+        best_score = (-1.0, -1)
+        for cluster_id in leaf:
+            cluster = self.clusters[cluster_id]
+            same = 0
+            wildcards = 0
+            for template_token, token in zip(cluster.tokens, tokens):
+                if template_token == TEMPLATE_WILDCARD:
+                    wildcards += 1
+                elif template_token == token:
+                    same += 1
+            similarity = same / len(tokens) if tokens else 1.0
+            if (similarity, wildcards) > best_score:
+                best_score = (similarity, wildcards)
+                best = cluster
+        if best is not None and (best_score[0] >= self.sim_threshold or not tokens):
+            return best
+        return None
+
+    def add_line(self, line, is_error=False, count=1, error_count=None, examples=None):
+        tokens, masked_values = self._mask(line)
+        leaf = self._find_leaf(tokens)
+        cluster = self._best_cluster(leaf, tokens) if leaf else None
+
+        if cluster is None:
+            cluster = LogTemplateCluster(self.next_id, tokens)
+            self.next_id += 1
+            cluster.leaf = self._find_leaf(tokens, create=True)
+            cluster.leaf.append(cluster.cluster_id)
+            self.clusters[cluster.cluster_id] = cluster
+            params = masked_values
+        else:
+            params = masked_values + [token for template_token, token in zip(cluster.tokens, tokens)
+                                      if template_token != token and token != TEMPLATE_WILDCARD]
+            cluster.tokens = [template_token if template_token == token else TEMPLATE_WILDCARD
+                              for template_token, token in zip(cluster.tokens, tokens)]
+
+        if error_count is None:
+            error_count = count if is_error else 0
+        if examples is None:
+            examples = [params] if params else []
+
+        cluster.count += count
+        cluster.error_count += error_count
+        for example in examples:
+            if len(cluster.examples) >= TEMPLATE_EXAMPLE_PARAMS:
+                break
+            cluster.examples.append(example[:TEMPLATE_EXAMPLE_PARAMS * 2])
+
+        if len(self.clusters) > self.max_clusters:
+            self._evict()
+        return cluster
+
+    def _evict(self):
+        # 模板数超限时淘汰出现次数最少的一批，保证内存有界
+        keep = self.max_clusters * 9 // 10
+        evicted = sorted(self.clusters.values(), key=lambda c: (c.error_count > 0, c.count))
+        for cluster in evicted[:len(self.clusters) - keep]:
+            cluster.leaf.remove(cluster.cluster_id)
+            del self.clusters[cluster.cluster_id]
+
+    def add_templates(self, templates):
+        for template in templates:
+            self.add_line(template['template'], count=template['count'], error_count=template['error_count'],
+                          examples=template['examples'])
+        return self
+
+    def export(self, limit=None):
+        templates = sorted((cluster.to_dict() for cluster in self.clusters.values()),
+                           key=lambda t: t['count'], reverse=True)
+        return templates[:limit] if limit else templates
+
+
+def format_templates_for_prompt(templates, limit=TEMPLATE_PROMPT_LIMIT):
+    ranked = sorted(templates, key=lambda t: (t['error_count'] > 0, t['count']), reverse=True)[:limit]
+    lines = []
+    for template in ranked:
+        flag = "⚠" if template['error_count'] else " "
+        examples = '; '.join(', '.join(map(str, example)) for example in template['examples'][:2])
+        lines.append(f"{flag} [{template['count']}次] {template['template']}" +
+                     (f"  | 参数示例: {examples}" if examples else ""))
+    return '\n'.join(lines)
+
+
+class LogScanStats:
+    def __init__(self, error_keywords, context_lines=3, sample_size=SCAN_ERROR_SAMPLE_SIZE,
+                 tail_size=SCAN_TAIL_LINES, mine_templates=False):
+        self.matcher = get_line_matcher(error_keywords)
+        self.template_miner = LogTemplateMiner() if mine_templates else None
+        self.context_lines = context_lines
+        self.sample_size = sample_size
+        self.line_count = 0
+        self.bytes_scanned = 0
+        self.total_errors = 0
+        self.keyword_counts = Counter()
+        self.log_levels = Counter()
+        self.ip_addresses = Counter()
+        self.common_services = Counter()
+        self.timestamp_formats = set()
+        self.first_errors = []
+        self.last_errors = deque(maxlen=sample_size)
+        self.recent_lines = deque(maxlen=max(context_lines, tail_size))
+        self.pending_context = []
+
+    def add_line(self, line):
+        self.line_count += 1
+        found_keywords, levels, ips, services, timestamp_format = self.matcher.classify(line)
+
+        for match in self.pending_context:
+            match['context'].append(line)
+        self.pending_context = [m for m in self.pending_context
+                                if len(m['context']) < m['_context_target']]
+
+        if found_keywords:
+            self.keyword_counts.update(found_keywords)
+            self.total_errors += 1
+            if self.sample_size:
+                self._record_error(line, found_keywords)
+
+        if timestamp_format:
+            self.timestamp_formats.add(timestamp_format)
+        self.ip_addresses.update(ips)
+        self.log_levels.update(levels)
+        self.common_services.update(services)
+
+        if self.template_miner is not None:
+            self.template_miner.add_line(line, bool(found_keywords))
+
+        self.recent_lines.append(line)
+        if len(self.ip_addresses) > SCAN_MAX_TRACKED_KEYS:
+            self.ip_addresses = Counter(dict(self.ip_addresses.most_common(SCAN_MAX_TRACKED_KEYS // 2)))
+
+    def _record_error(self, line, found_keywords):
+        before = list(self.recent_lines)[-self.context_lines:] if self.context_lines else []
+        match = {
+            'line_number': self.line_count,
+            'line_content': line,
+            'found_keywords': found_keywords,
+            'context': before + [line],
+            'context_start_line': self.line_count - len(before),
+            '_context_target': len(before) + 1 + self.context_lines
+        }
+        if len(self.first_errors) < self.sample_size:
+            self.first_errors.append(match)
+        else:
+            self.last_errors.append(match)
+        if self.context_lines:
+            self.pending_context.append(match)
+
+    def to_dict(self):
+        def strip(matches):
+            return [{k: v for k, v in m.items() if not k.startswith('_')} for m in matches]
+
+        return {
+            'line_count': self.line_count,
+            'bytes_scanned': self.bytes_scanned,
+            'total_errors': self.total_errors,
+            'keyword_counts': dict(self.keyword_counts),
+            'log_levels': dict(self.log_levels),
+            'ip_addresses': dict(self.ip_addresses.most_common(SCAN_MAX_TRACKED_KEYS)),
+            'common_services': dict(self.common_services),
+            'timestamp_formats': sorted(self.timestamp_formats),
+            'first_errors': strip(self.first_errors),
+            'last_errors': strip(self.last_errors),
+            'tail_lines': list(self.recent_lines),
+            'templates': self.template_miner.export() if self.template_miner is not None else []
+        }
+
+
+def scan_log_range(file_path, start, end, error_keywords, context_lines=3,
+                   chunk_size=SCAN_CHUNK_SIZE, use_mmap=False, encoding='utf-8', mine_templates=False):
+    stats = LogScanStats(error_keywords, context_lines, mine_templates=mine_templates)
+    decode = make_line_decoder(encoding)
+    for raw_line in iter_range_lines(file_path, start, end, chunk_size, use_mmap):
+        stats.bytes_scanned += len(raw_line) + 1
+        stats.add_line(decode(raw_line.rstrip(b'\r')))
+    return stats.to_dict()
+
+
+def merge_scan_results(partials, sample_size=SCAN_ERROR_SAMPLE_SIZE, tail_size=SCAN_TAIL_LINES):
+    merged = {
+        'line_count': 0,
+        'bytes_scanned': 0,
+        'total_errors': 0,
+        'keyword_counts': Counter(),
+        'log_levels': Counter(),
+        'ip_addresses': Counter(),
+        'common_services': Counter(),
+        'timestamp_formats': set(),
+        'first_errors': [],
+        'last_errors': deque(maxlen=sample_size),
+        'tail_lines': deque(maxlen=tail_size),
+        'templates': LogTemplateMiner()
+    }
+
+    for partial in partials:
+        offset = merged['line_count']
+        for matches in (partial['first_errors'], partial['last_errors']):
+            for match in matches:
+                match['line_number'] += offset
+                match['context_start_line'] += offset
+
+        errors = partial['first_errors'] + partial['last_errors']
+        room = sample_size - len(merged['first_errors'])
+        merged['first_errors'].extend(errors[:room])
+        merged['last_errors'].extend(errors[max(room, 0):])
+
+        merged['line_count'] += partial['line_count']
+        merged['bytes_scanned'] += partial['bytes_scanned']
+        merged['total_errors'] += partial['total_errors']
+        for key in ('keyword_counts', 'log_levels', 'ip_addresses', 'common_services'):
+            merged[key].update(partial[key])
+        merged['timestamp_formats'].update(partial['timestamp_formats'])
+        merged['tail_lines'].extend(partial['tail_lines'])
+        merged['templates'].add_templates(partial.get('templates', []))
+
+    return {
+        'line_count': merged['line_count'],
+        'bytes_scanned': merged['bytes_scanned'],
+        'total_errors': merged['total_errors'],
+        'keyword_counts': dict(merged['keyword_counts']),
+        'log_levels': dict(merged['log_levels']),
+        'ip_addresses': dict(merged['ip_addresses'].most_common(SCAN_MAX_TRACKED_KEYS)),
+        'common_services': dict(merged['common_services']),
+        'timestamp_formats': sorted(merged['timestamp_formats']),
+        'error_samples': merged['first_errors'] + list(merged['last_errors']),
+        'tail_lines': list(merged['tail_lines']),
+        'templates': merged['templates'].export()
+    }
+
+
+def is_glob_pattern(path):
+    return any(char in path for char in '*?[')
+
+
+def rotation_sort_key(file_path, base_path):
+    # 按修改时间从旧到新排序，同一时间下 app.log.2 早于 app.log.1，保证合并后的尾部样本是最新内容
+    suffix = os.path.basename(file_path)[len(os.path.basename(base_path)):]
+    index = re.match(r'[.\-_]?(\d+)', suffix)
+    return os.path.getmtime(file_path), -int(index.group(1)) if index else 0, file_path
+
+
+def expand_log_paths(path_pattern):
+    if is_glob_pattern(path_pattern):
+        paths = [path for path in glob.glob(path_pattern) if os.path.isfile(path)]
+        return sorted(paths, key=lambda path: rotation_sort_key(path, ''))
+
+    directory = os.path.dirname(os.path.abspath(path_pattern))
+    base_name = os.path.basename(path_pattern)
+    paths = [os.path.join(directory, name) for name in os.listdir(directory)
+             if name.startswith(base_name) and os.path.isfile(os.path.join(directory, name))]
+    return sorted(paths, key=lambda path: rotation_sort_key(path, path_pattern))
+
+
+def open_log_stream(file_path):
+    if file_path.endswith('.gz'):
+        return gzip.open(file_path, 'rb')
+    if file_path.endswith('.bz2'):
+        return bz2.open(file_path, 'rb')
+    if file_path.endswith(('.xz', '.lzma')):
+        return lzma.open(file_path, 'rb')
+    if file_path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("未安装 zstandard，无法解压 .zst 日志")
+        return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+    if file_path.endswith('.zip'):
+        raise RuntimeError("暂不支持 .zip 归档日志")
+    return open(file_path, 'rb')
+
+
+def scan_log_stream(file_path, error_keywords, context_lines=3, chunk_size=SCAN_CHUNK_SIZE,
+                    encoding=None, mine_templates=False):
+    start = time.time()
+    encoding = encoding or detect_file_encoding(file_path)
+    stats = LogScanStats(error_keywords, context_lines, mine_templates=mine_templates)
+    with open_log_stream(file_path) as stream:
+        for byte_count, line in iter_decoded_lines(stream, encoding, chunk_size):
+            stats.bytes_scanned += byte_count
+            stats.add_line(line)
+
+    result = stats.to_dict()
+    result['file_path'] = file_path
+    result['file_size'] = os.path.getsize(file_path)
+    result['compressed'] = file_path.endswith(COMPRESSED_SUFFIXES)
+    result['encoding_used'] = encoding
+    result['elapsed_seconds'] = round(time.time() - start, 3)
+    return result
+
+
+_encoding_cache = {}
+_encoding_cache_lock = threading.Lock()
+
+
+def detect_encoding_from_samples(samples):
+    for bom, encoding in ENCODING_BOMS:
+        if samples[0].startswith(bom):
+            return encoding
+
+    # 样本可能截断在多字节字符中间，用增量解码器（final=False）避免误判
+    for encoding in ENCODING_CANDIDATES:
+        try:
+            for sample in samples:
+                codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+
+    # 混合编码日志（如 UTF-8 应用日志中夹杂 GBK 输出）：按非 ASCII 行多数决，
+    # 判为 UTF-8 时由 make_line_decoder 对个别行回退到 GB18030
+    utf8_lines = other_lines = 0
+    for sample in samples:
+        for raw_line in sample.split(b'\n')[:-1]:
+            if raw_line.isascii():
+                continue
+            try:
+                raw_line.decode('utf-8')
+                utf8_lines += 1
+            except UnicodeDecodeError:
+                other_lines += 1
+    return 'utf-8' if utf8_lines > other_lines else ENCODING_FALLBACK
+
+
+def detect_file_encoding(file_path):
+    file_stat = os.stat(file_path)
+    cache_key = (os.path.abspath(file_path), file_stat.st_dev, file_stat.st_ino)
+    with _encoding_cache_lock:
+        if cache_key in _encoding_cache:
+            return _encoding_cache[cache_key]
+
+    with open_log_stream(file_path) as stream:
+        samples = [stream.read(ENCODING_SAMPLE_BYTES)]
+        if not file_path.endswith(COMPRESSED_SUFFIXES) and file_stat.st_size > ENCODING_SAMPLE_BYTES * 2:
+            stream.seek(file_stat.st_size - ENCODING_SAMPLE_BYTES)
+            tail = stream.read(ENCODING_SAMPLE_BYTES)
+            newline = tail.find(b'\n')
+            if newline != -1:
+                samples.append(tail[newline + 1:])
+
+    encoding = detect_encoding_from_samples(samples)
+    with _encoding_cache_lock:
+        _encoding_cache[cache_key] = encoding
+    return encoding
+
+
+def is_line_splittable(encoding):
+    # UTF-8/GB18030 等兼容 ASCII 的编码中换行符恒为单字节 0x0A，可以先按字节切行再解码
+    return len('a\n'.encode(encoding)) - len('a'.encode(encoding)) == 1
+
+
+def make_line_decoder(encoding):
+    if codecs.lookup(encoding).name == 'utf-8':
+        def decode(raw_line):
+            try:
+                return raw_line.decode('utf-8')
+            except UnicodeDecodeError:
+                return raw_line.decode(ENCODING_FALLBACK, errors='replace')
+        return decode
+
+    def decode(raw_line):
+        return raw_line.decode(encoding, errors='replace')
+    return decode
+
+
+def iter_decoded_lines(stream, encoding, chunk_size=SCAN_CHUNK_SIZE):
+    if is_line_splittable(encoding):
+        decode = make_line_decoder(encoding)
+        carry = b''
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            lines = (carry + chunk).split(b'\n')
+            carry = lines.pop()
+            for raw_line in lines:
+                yield len(raw_line) + 1, decode(raw_line.rstrip(b'\r'))
+        if carry:
+            yield len(carry), decode(carry.rstrip(b'\r'))
+        return
+
+    # UTF-16 等编码不能按字节切行，改为增量解码后按文本切行；字节数按块计入
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    carry = ''
+    pending_bytes = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        pending_bytes += len(chunk)
+        text = carry + decoder.decode(chunk, final=not chunk)
+        lines = text.split('\n')
+        carry = lines.pop()
+        for line in lines:
+            yield pending_bytes, line.rstrip('\r')
+            pending_bytes = 0
+        if not chunk:
+            break
+    if carry:
+        yield pending_bytes, carry.rstrip('\r')
+
+
+def load_tail_state(state_file=TAIL_STATE_FILE):
+    try:
+        if os.path.exists(state_file):
+            with open(state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.warning(f"⚠️ 读取日志增量状态失败，将重新全量分析: {e}")
+    return {}
+
+
+def save_tail_state(state, state_file=TAIL_STATE_FILE):
+    try:
+        os.makedirs(os.path.dirname(state_file), exist_ok=True)
+        tmp_file = f"{state_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_file, state_file)
+    except Exception as e:
+        logger.warning(f"⚠️ 写入日志增量状态失败: {e}")
+
+
+def read_head_fingerprint(file_path, head_size=TAIL_HEAD_BYTES):
+    with open(file_path, 'rb') as f:
+        head = f.read(head_size)
+    return hashlib.sha1(head).hexdigest(), len(head)
+
+
+def find_complete_end(file_path, start, size):
+    # 只处理到最后一个换行符为止，未写完的半行留到下次
+    with open(file_path, 'rb') as f:
+        position = size
+        while position > start:
+            block_start = max(start, position - 64 * 1024)
+            f.seek(block_start)
+            block = f.read(position - block_start)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                return block_start + newline + 1
+            position = block_start
+    return start
+
+
+def find_rotated_predecessor(file_path, file_state):
+    # logrotate 改名时按 inode 找回旧文件；copytruncate 时按文件头指纹找回副本
+    directory = os.path.dirname(os.path.abspath(file_path))
+    base_name = os.path.basename(file_path)
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return None, None
+
+    candidates = [os.path.join(directory, name) for name in names
+                  if name != base_name and name.startswith(base_name) and not name.endswith(COMPRESSED_SUFFIXES)]
+    for candidate in candidates:
+        try:
+            candidate_stat = os.stat(candidate)
+        except OSError:
+            continue
+        if candidate_stat.st_size < file_state['offset']:
+            continue
+        if candidate_stat.st_ino == file_state['inode'] and candidate_stat.st_dev == file_state['device']:
+            return candidate, "rename"
+        head_hash, head_size = read_head_fingerprint(candidate, file_state['head_size'])
+        if file_state['head_size'] and head_size == file_state['head_size'] and head_hash == file_state['head_hash']:
+            return candidate, "copytruncate"
+    return None, None
+
+
+def stats_as_partial(stats):
+    partial = dict(stats)
+    partial['first_errors'] = stats.get('error_samples', [])
+    partial['last_errors'] = []
+    return partial
+
+
+def build_remote_prefilter_command(file_path, error_keywords, context_lines=3, max_matches=REMOTE_MAX_MATCHES):
+    # 服务端单遍 awk 统计行数/关键词/级别，再用 grep -F 只回传命中行及上下文，整个文件不经过网络；
+    # 开头先输出 status 行，文件不存在、不可读或缺少解压命令时直接退出，避免被当作空文件
+    quoted_path = shlex.quote(file_path)
+    reader = 'cat'
+    for suffix, command in REMOTE_STREAM_READERS.items():
+        if file_path.endswith(suffix):
+            reader = command
+            break
+
+    keywords = sorted({keyword.lower() for keyword in error_keywords if keyword})
+    patterns = ' '.join(f"-e {shlex.quote(keyword)}" for keyword in keywords)
+    awk_script = (
+        'BEGIN{n=split(ENVIRON["LOG_PREFILTER_KEYWORDS"],K,"\\n")}'
+        '{l=tolower($0);hit=0;for(i=1;i<=n;i++)if(index(l,K[i])){C[i]++;hit=1}if(hit)E++;'
+        'u=toupper($0);if(match(u,/(^|[^A-Z0-9_])(DEBUG|INFO|WARNING|WARN|ERROR|FATAL|CRITICAL)([^A-Z0-9_]|$)/))'
+        '{v=substr(u,RSTART,RLENGTH);gsub(/[^A-Z]/,"",v);L[v]++}}'
+        'END{printf "lines\\t%d\\n",NR;printf "errors\\t%d\\n",E;'
+        'for(i=1;i<=n;i++)printf "kw\\t%s\\t%d\\n",K[i],C[i];for(v in L)printf "level\\t%s\\t%d\\n",v,L[v]}'
+    )
+    reader_check = ''
+    if reader != 'cat':
+        reader_check = (f"command -v {reader} >/dev/null 2>&1 || "
+                        f"{{ printf 'status\\tno_reader\\t%s\\n' {reader}; exit 2; }}; ")
+    return (
+        f"if [ ! -e {quoted_path} ]; then printf 'status\\tmissing\\n'; exit 2; fi; "
+        f"if [ ! -r {quoted_path} ]; then printf 'status\\tunreadable\\n'; exit 2; fi; "
+        f"{reader_check}printf 'status\\tok\\n'; "
+        f"LOG_PREFILTER_KEYWORDS={shlex.quote(chr(10).join(keywords))}; export LOG_PREFILTER_KEYWORDS; "
+        f"printf 'size\\t%s\\n' \"$(stat -c %s {quoted_path} 2>/dev/null || echo 0)\"; "
+        f"LC_ALL=C {reader} {quoted_path} | LC_ALL=C awk {shlex.quote(awk_script)}; "
+        f"echo {REMOTE_MATCH_MARKER}; "
+        f"LC_ALL=C {reader} {quoted_path} 2>/dev/null | LC_ALL=C grep -n -i -F -C {int(context_lines)} -m {int(max_matches)} {patterns}"
+    )
+
+
+def parse_remote_prefilter_output(output_lines, error_keywords, context_lines=3):
+    summary = {"status": None, "status_detail": None, "size": 0, "lines": 0, "errors": 0, "keywords": {}, "levels": {}}
+    groups = [[]]
+    in_matches = False
+
+    for line in output_lines:
+        if not in_matches:
+            if line == REMOTE_MATCH_MARKER:
+                in_matches = True
+                continue
+            fields = line.split('\t')
+            if fields[0] == 'status' and len(fields) >= 2:
+                summary['status'] = fields[1]
+                summary['status_detail'] = fields[2] if len(fields) > 2 else None
+            elif fields[0] in ('size', 'lines', 'errors') and len(fields) == 2 and fields[1].isdigit():
+                summary[fields[0]] = int(fields[1])
+            elif fields[0] == 'kw' and len(fields) == 3:
+                summary['keywords'][fields[1]] = int(fields[2])
+            elif fields[0] == 'level' and len(fields) == 3:
+                summary['levels'][fields[1]] = int(fields[2])
+            continue
+
+        if line == '--':
+            groups.append([])
+            continue
+        grep_line = re.match(r'^(\d+)([:-])(.*)$', line)
+        if grep_line:
+            groups[-1].append((int(grep_line.group(1)), grep_line.group(2) == ':', grep_line.group(3)))
+
+    matcher = get_line_matcher(error_keywords)
+    matches = []
+    for group in groups:
+        for line_number, is_match, content in group:
+            if not is_match:
+                continue
+            context = [(number, text) for number, _, text in group if abs(number - line_number) <= context_lines]
+            matches.append({
+                'line_number': line_number,
+                'line_content': content,
+                'found_keywords': matcher.match_keywords(content),
+                'context': [text for _, text in context],
+                'context_start_line': context[0][0] if context else line_number
+            })
+    return summary, matches
+
+
+def analyze_remote_log(host, file_path, error_keywords, context_lines=3, max_matches=REMOTE_MAX_MATCHES,
+                       mine_templates=False, timeout=REMOTE_COMMAND_TIMEOUT):
+    config = SSH_CONFIGS.get(host)
+    if not config:
+        raise RuntimeError("缺少root权限 无法巡检该IP")
+
+    start = time.time()
+    ssh = paramiko.SSHClient()
+    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    ssh.connect(host, username=config['username'], password=config['password'], timeout=15)
+    try:
+        channel = ssh.get_transport().open_session()
+        channel.settimeout(timeout)
+        channel.exec_command(build_remote_prefilter_command(file_path, error_keywords, context_lines, max_matches))
+        bytes_transferred = 0
+        output_lines = []
+        with channel.makefile('rb') as stream:
+            for raw_line in stream:
+                bytes_transferred += len(raw_line)
+                output_lines.append(raw_line.rstrip(b'\r\n').decode('utf-8', errors='ignore'))
+        with channel.makefile_stderr('rb') as stream:
+            stderr = stream.read().decode('utf-8', errors='ignore').strip()
+        exit_status = channel.recv_exit_status()
+    finally:
+        ssh.close()
+
+    summary, matches = parse_remote_prefilter_output(output_lines, error_keywords, context_lines)
+    if summary['status'] != 'ok':
+        error = REMOTE_STATUS_ERRORS.get(summary['status'], "远程预过滤命令未正常执行")
+        detail = summary['status_detail'] or stderr
+        raise RuntimeError(f"{error}: {detail or file_path}")
+    # grep 未命中时退出码为 1，属于正常情况；更大的退出码或 stderr 输出说明读取/解压出错
+    if exit_status > 1 or stderr:
+        raise RuntimeError(f"远程日志读取失败（退出码 {exit_status}）: {stderr[:200]}")
+    stats = LogScanStats(error_keywords, 0, sample_size=0, mine_templates=mine_templates)
+    for match in matches:
+        stats.add_line(match['line_content'])
+    sampled = stats.to_dict()
+
+    keyword_counts = {keyword: summary['keywords'].get(keyword.lower(), 0) for keyword in error_keywords}
+    for match in matches:
+        match['host'] = host
+
+    return {
+        'host': host,
+        'file_path': file_path,
+        'file_size': summary['size'],
+        'bytes_transferred': bytes_transferred,
+        'elapsed_seconds': round(time.time() - start, 3),
+        'line_count': summary['lines'],
+        'bytes_scanned': summary['size'],
+        'total_errors': summary['errors'],
+        'keyword_counts': {keyword: count for keyword, count in keyword_counts.items() if count},
+        'log_levels': summary['levels'],
+        'ip_addresses': sampled['ip_addresses'],
+        'common_services': sampled['common_services'],
+        'timestamp_formats': sampled['timestamp_formats'],
+        'error_samples': matches[:SCAN_ERROR_SAMPLE_SIZE] + matches[SCAN_ERROR_SAMPLE_SIZE:][-SCAN_ERROR_SAMPLE_SIZE:],
+        'tail_lines': [match['line_content'] for match in matches[-SCAN_TAIL_LINES:]],
+        'templates': sampled['templates'],
+        'matches_returned': len(matches)
+    }
+
 
 class LogAnalyzer:
     def __init__(self, ai_config=None):
@@ -38,7 +973,7 @@ class LogAnalyzer:
             'fatal', 'FATAL', 'Fatal'
         ]
 
-    def read_file_content(self, file_path, line_limit=1000, encoding='utf-8'):
+    def read_file_content(self, file_path, line_limit=1000, encoding=None):
         try:
             print(f"    📁 验证日志文件路径: {file_path}")
             
@@ -51,17 +986,19 @@ class LogAnalyzer:
 
             file_size = os.path.getsize(file_path)
             file_stat = os.stat(file_path)
+            encoding = encoding or detect_file_encoding(file_path)
             
             print(f"    📊 文件大小: {file_size} 字节")
             print(f"    📅 修改时间: {datetime.fromtimestamp(file_stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')}")
+            print(f"    🔤 文件编码: {encoding}")
             print(f"    📖 开始读取日志内容，限制行数: {line_limit}")
 
             content_lines = []
-            with open(file_path, 'r', encoding=encoding, errors='ignore') as f:
-                for i, line in enumerate(f):
-                    if i >= line_limit:
+            with open(file_path, 'rb') as f:
+                for _, line in iter_decoded_lines(f, encoding, READ_CHUNK_SIZE):
+                    if len(content_lines) >= line_limit:
                         break
-                    content_lines.append(line.rstrip('\n\r'))
+                    content_lines.append(line)
 
             print(f"    ✅ 日志文件读取完成，实际读取 {len(content_lines)} 行")
 
@@ -70,36 +1007,12 @@ class LogAnalyzer:
                 "file_path": file_path,
                 "file_size": file_size,
                 "file_modified": datetime.fromtimestamp(file_stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                "encoding_used": encoding,
                 "lines_read": len(content_lines),
                 "lines_limited": len(content_lines) >= line_limit,
                 "content": content_lines
             }
 
-        except UnicodeDecodeError:
-            print(f"    🔄 UTF-8编码失败，尝试GBK编码...")
-            try:
-                with open(file_path, 'r', encoding='gbk', errors='ignore') as f:
-                    content_lines = []
-                    for i, line in enumerate(f):
-                        if i >= line_limit:
-                            break
-                        content_lines.append(line.rstrip('\n\r'))
-
-                print(f"    ✅ GBK编码读取成功，获取 {len(content_lines)} 行")
-
-                return {
-                    "success": True,
-                    "file_path": file_path,
-                    "encoding_used": "gbk",
-                    "lines_read": len(content_lines),
-                    "content": content_lines
-                }
-            except Exception as e:
-                print(f"    ❌ 多种编码尝试失败: {e}")
-                return {
-                    "success": False,
-                    "error": f"文件编码读取失败: {str(e)}"
-                }
         except Exception as e:
             print(f"    ❌ 文件读取失败: {e}")
             return {
@@ -110,22 +1023,18 @@ class LogAnalyzer:
     def find_error_patterns(self, content_lines, error_keywords=None, context_lines=3):
         print(f"    🔍 开始错误模式识别和关键词匹配...")
         
-        if error_keywords is None:
+        if not error_keywords:
             error_keywords = self.default_error_keywords
 
+        matcher = get_line_matcher(error_keywords)
         error_matches = []
         keyword_counts = Counter()
 
         for i, line in enumerate(content_lines):
-            line_lower = line.lower()
-
-            found_keywords = []
-            for keyword in error_keywords:
-                if keyword.lower() in line_lower:
-                    found_keywords.append(keyword)
-                    keyword_counts[keyword] += 1
+            found_keywords = matcher.match_keywords(line)
 
             if found_keywords:
+                keyword_counts.update(found_keywords)
                 start_idx = max(0, i - context_lines)
                 end_idx = min(len(content_lines), i + context_lines + 1)
                 context = content_lines[start_idx:end_idx]
@@ -157,35 +1066,17 @@ class LogAnalyzer:
             'file_extensions': Counter()
         }
 
-        timestamp_patterns = [
-            r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}',
-            r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}',
-            r'\w{3} \d{2} \d{2}:\d{2}:\d{2}',
-        ]
-
-        ip_pattern = r'\b(?:\d{1,3}\.){3}\d{1,3}\b'
-        log_level_pattern = r'\b(DEBUG|INFO|WARN|WARNING|ERROR|FATAL|CRITICAL)\b'
-
         sample_size = min(100, len(content_lines))
         print(f"    🔬 分析样本大小: {sample_size} 行")
         
+        matcher = get_line_matcher([])
         for line in content_lines[:sample_size]:
-            for pattern in timestamp_patterns:
-                if re.search(pattern, line):
-                    patterns['timestamp_formats'].append(pattern)
-                    break
-
-            ips = re.findall(ip_pattern, line)
+            _, levels, ips, services, timestamp_format = matcher.classify(line)
+            if timestamp_format:
+                patterns['timestamp_formats'].append(timestamp_format)
             patterns['ip_addresses'].extend(ips)
-
-            levels = re.findall(log_level_pattern, line, re.IGNORECASE)
-            for level in levels:
-                patterns['log_levels'][level.upper()] += 1
-
-            services = ['mysql', 'nginx', 'apache', 'ssh', 'docker', 'systemd', 'kernel']
-            for service in services:
-                if service in line.lower():
-                    patterns['common_services'][service] += 1
+            patterns['log_levels'].update(levels)
+            patterns['common_services'].update(services)
 
         patterns['timestamp_formats'] = list(set(patterns['timestamp_formats']))
         patterns['ip_addresses'] = list(set(patterns['ip_addresses']))
@@ -200,6 +1091,405 @@ class LogAnalyzer:
 
         return patterns
 
+    def scan_file(self, file_path, error_keywords=None, context_lines=3, chunk_size=SCAN_CHUNK_SIZE,
+                  use_mmap=False, workers=1, encoding=None, mine_templates=False):
+        try:
+            print(f"    📁 验证日志文件路径: {file_path}")
+
+            if not os.path.exists(file_path):
+                print(f"    ❌ 日志文件不存在")
+                return {
+                    "success": False,
+                    "error": f"文件不存在: {file_path}"
+                }
+
+            if not error_keywords:
+                error_keywords = self.default_error_keywords
+
+            file_stat = os.stat(file_path)
+            file_size = file_stat.st_size
+            encoding = encoding or detect_file_encoding(file_path)
+            splittable = is_line_splittable(encoding)
+            workers = max(1, min(int(workers or 1), max(1, file_size // chunk_size))) if splittable else 1
+            use_mmap = bool(use_mmap) and file_size > 0 and splittable
+
+            print(f"    📊 文件大小: {file_size} 字节")
+            print(f"    🔤 文件编码: {encoding}{'' if splittable else ' (非单字节换行编码, 使用单进程流式扫描)'}")
+            print(f"    🌊 全量分块扫描: 块大小 {chunk_size // 1024} KB, 进程数 {workers}, mmap {'启用' if use_mmap else '禁用'}")
+
+            step = -(-file_size // workers) if file_size else 0
+            ranges = [(i * step, min(file_size, (i + 1) * step)) for i in range(workers)]
+
+            start = time.time()
+            if not splittable:
+                partials = [scan_log_stream(file_path, error_keywords, context_lines, chunk_size,
+                                            encoding, mine_templates)]
+            elif workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(scan_log_range, file_path, range_start, range_end, error_keywords,
+                                               context_lines, chunk_size, use_mmap, encoding, mine_templates)
+                               for range_start, range_end in ranges]
+                    partials = [future.result() for future in futures]
+            else:
+                partials = [scan_log_range(file_path, 0, file_size, error_keywords, context_lines,
+                                           chunk_size, use_mmap, encoding, mine_templates)]
+            elapsed = time.time() - start
+
+            stats = merge_scan_results(partials)
+            throughput = stats['bytes_scanned'] / 1024 / 1024 / elapsed if elapsed > 0 else 0.0
+
+            print(f"    ✅ 全量扫描完成: {stats['line_count']} 行, 耗时 {elapsed:.2f}s, 吞吐 {throughput:.1f} MB/s")
+
+            return {
+                "success": True,
+                "file_path": file_path,
+                "file_size": file_size,
+                "file_modified": datetime.fromtimestamp(file_stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                "lines_read": stats['line_count'],
+                "lines_limited": False,
+                "scan_mode": "full",
+                "encoding_used": encoding,
+                "workers": workers,
+                "use_mmap": use_mmap,
+                "elapsed_seconds": round(elapsed, 3),
+                "throughput_mb_s": round(throughput, 2),
+                "stats": stats
+            }
+
+        except Exception as e:
+            print(f"    ❌ 全量扫描失败: {e}")
+            return {
+                "success": False,
+                "error": f"文件扫描失败: {str(e)}"
+            }
+
+    def scan_log_set(self, path_pattern, error_keywords=None, context_lines=3, workers=1,
+                     chunk_size=SCAN_CHUNK_SIZE, encoding=None, mine_templates=False):
+        try:
+            print(f"    📁 展开日志文件集合: {path_pattern}")
+
+            if not is_glob_pattern(path_pattern) and not os.path.exists(path_pattern):
+                print(f"    ❌ 日志文件不存在")
+                return {
+                    "success": False,
+                    "error": f"文件不存在: {path_pattern}"
+                }
+
+            file_paths = expand_log_paths(path_pattern)
+            if not file_paths:
+                print(f"    ❌ 未匹配到任何日志文件")
+                return {
+                    "success": False,
+                    "error": f"未匹配到日志文件: {path_pattern}"
+                }
+
+            if not error_keywords:
+                error_keywords = self.default_error_keywords
+
+            workers = max(1, min(int(workers or 1), len(file_paths)))
+            compressed_count = sum(1 for path in file_paths if path.endswith(COMPRESSED_SUFFIXES))
+            print(f"    📚 共 {len(file_paths)} 个文件（压缩 {compressed_count} 个），并发进程数 {workers}")
+
+            start = time.time()
+            per_file = {}
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = {executor.submit(scan_log_stream, path, error_keywords, context_lines, chunk_size,
+                                               encoding, mine_templates): path for path in file_paths}
+                    for future in as_completed(futures):
+                        path = futures[future]
+                        try:
+                            per_file[path] = future.result()
+                        except Exception as e:
+                            print(f"    ⚠️ 文件分析失败 {path}: {e}")
+                            per_file[path] = {"error": str(e)}
+            else:
+                for path in file_paths:
+                    try:
+                        per_file[path] = scan_log_stream(path, error_keywords, context_lines, chunk_size,
+                                                         encoding, mine_templates)
+                    except Exception as e:
+                        print(f"    ⚠️ 文件分析失败 {path}: {e}")
+                        per_file[path] = {"error": str(e)}
+            elapsed = time.time() - start
+
+            partials = [per_file[path] for path in file_paths if 'error' not in per_file[path]]
+            file_summaries = []
+            for path in file_paths:
+                result = per_file[path]
+                if 'error' in result:
+                    file_summaries.append({"file_path": path, "success": False, "error": result['error']})
+                    continue
+                file_summaries.append({
+                    "file_path": path,
+                    "success": True,
+                    "compressed": result['compressed'],
+                    "encoding_used": result['encoding_used'],
+                    "file_size": result['file_size'],
+                    "bytes_scanned": result['bytes_scanned'],
+                    "line_count": result['line_count'],
+                    "total_errors": result['total_errors'],
+                    "keyword_counts": result['keyword_counts'],
+                    "log_levels": result['log_levels'],
+                    "elapsed_seconds": result['elapsed_seconds']
+                })
+
+            stats = merge_scan_results(partials)
+            throughput = stats['bytes_scanned'] / 1024 / 1024 / elapsed if elapsed > 0 else 0.0
+            print(f"    ✅ 日志集合分析完成: {len(partials)}/{len(file_paths)} 个文件, {stats['line_count']} 行, "
+                  f"解压后 {stats['bytes_scanned'] / 1024 / 1024:.1f} MB, 吞吐 {throughput:.1f} MB/s")
+
+            newest = os.stat(file_paths[-1])
+            return {
+                "success": bool(partials),
+                "error": None if partials else "所有日志文件分析失败",
+                "file_path": path_pattern,
+                "file_size": sum(summary.get('file_size', 0) for summary in file_summaries),
+                "file_modified": datetime.fromtimestamp(newest.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                "lines_read": stats['line_count'],
+                "lines_limited": False,
+                "scan_mode": "log_set",
+                "files": file_summaries,
+                "workers": workers,
+                "elapsed_seconds": round(elapsed, 3),
+                "throughput_mb_s": round(throughput, 2),
+                "stats": stats
+            }
+
+        except Exception as e:
+            print(f"    ❌ 日志集合分析失败: {e}")
+            return {
+                "success": False,
+                "error": f"日志集合分析失败: {str(e)}"
+            }
+
+    def analyze_remote_hosts(self, hosts, file_path, error_keywords=None, context_lines=3,
+                             max_matches=REMOTE_MAX_MATCHES, mine_templates=False, max_workers=REMOTE_MAX_WORKERS):
+        try:
+            if isinstance(hosts, str):
+                hosts = [host.strip() for host in hosts.split(',') if host.strip()]
+            if not hosts:
+                return {
+                    "success": False,
+                    "error": "未指定远程主机"
+                }
+
+            if not error_keywords:
+                error_keywords = self.default_error_keywords
+
+            print(f"    🌐 远程日志分析: {len(hosts)} 台主机, 文件 {file_path}")
+            print(f"    🔎 服务端预过滤: 仅回传命中行（每台最多 {max_matches} 条）及上下文")
+
+            start = time.time()
+            per_host = {}
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(hosts))) as executor:
+                futures = {executor.submit(analyze_remote_log, host, file_path, error_keywords, context_lines,
+                                           max_matches, mine_templates): host for host in hosts}
+                for future in as_completed(futures):
+                    host = futures[future]
+                    try:
+                        per_host[host] = future.result()
+                        print(f"    ✅ {host}: {per_host[host]['line_count']} 行, "
+                              f"错误 {per_host[host]['total_errors']} 个, "
+                              f"传输 {per_host[host]['bytes_transferred'] / 1024:.1f} KB")
+                    except Exception as e:
+                        print(f"    ❌ {host}: 远程分析失败 {e}")
+                        logger.error(f"🚨 远程日志分析失败 {host}: {e}")
+                        per_host[host] = {"error": str(e)}
+            elapsed = time.time() - start
+
+            partials = [stats_as_partial(per_host[host]) for host in hosts if 'error' not in per_host[host]]
+            host_summaries = []
+            for host in hosts:
+                result = per_host[host]
+                if 'error' in result:
+                    host_summaries.append({"host": host, "success": False, "error": result['error']})
+                    continue
+                host_summaries.append({
+                    "host": host,
+                    "success": True,
+                    "file_size": result['file_size'],
+                    "bytes_transferred": result['bytes_transferred'],
+                    "line_count": result['line_count'],
+                    "total_errors": result['total_errors'],
+                    "matches_returned": result['matches_returned'],
+                    "keyword_counts": result['keyword_counts'],
+                    "log_levels": result['log_levels'],
+                    "elapsed_seconds": result['elapsed_seconds']
+                })
+
+            stats = merge_scan_results(partials)
+            bytes_transferred = sum(summary.get('bytes_transferred', 0) for summary in host_summaries)
+            print(f"    ✅ 远程分析完成: {len(partials)}/{len(hosts)} 台成功, 远端日志 "
+                  f"{stats['bytes_scanned'] / 1024 / 1024:.1f} MB, 实际传输 {bytes_transferred / 1024:.1f} KB")
+
+            return {
+                "success": bool(partials),
+                "error": None if partials else "所有远程主机分析失败",
+                "file_path": file_path,
+                "file_size": stats['bytes_scanned'],
+                "file_modified": "Unknown",
+                "lines_read": stats['line_count'],
+                "lines_limited": False,
+                "scan_mode": "remote",
+                "hosts": host_summaries,
+                "bytes_transferred": bytes_transferred,
+                "elapsed_seconds": round(elapsed, 3),
+                "stats": stats
+            }
+
+        except Exception as e:
+            print(f"    ❌ 远程日志分析失败: {e}")
+            return {
+                "success": False,
+                "error": f"远程日志分析失败: {str(e)}"
+            }
+
+    def tail_analyze(self, file_path, error_keywords=None, context_lines=3, state_file=TAIL_STATE_FILE,
+                     reset=False, encoding=None, mine_templates=False):
+        try:
+            print(f"    📁 验证日志文件路径: {file_path}")
+
+            if not os.path.exists(file_path):
+                print(f"    ❌ 日志文件不存在")
+                return {
+                    "success": False,
+                    "error": f"文件不存在: {file_path}"
+                }
+
+            if not error_keywords:
+                error_keywords = self.default_error_keywords
+
+            encoding = encoding or detect_file_encoding(file_path)
+            if not is_line_splittable(encoding):
+                print(f"    ❌ 增量模式不支持该编码: {encoding}")
+                return {
+                    "success": False,
+                    "error": f"增量模式不支持 {encoding} 编码的日志，请使用全量扫描"
+                }
+
+            state = load_tail_state(state_file)
+            state_key = os.path.abspath(file_path)
+            file_state = None if reset else state.get(state_key)
+            if file_state and file_state.get('error_keywords') != list(error_keywords):
+                print(f"    🔄 错误关键词已变化，重置增量状态")
+                file_state = None
+
+            file_stat = os.stat(file_path)
+            start_offset = 0
+            rotation = None
+            segments = []
+
+            if file_state:
+                same_file = file_stat.st_ino == file_state['inode'] and file_stat.st_dev == file_state['device']
+                truncated = False
+                if same_file:
+                    if file_stat.st_size < file_state['offset']:
+                        truncated = True
+                    elif file_state['head_size']:
+                        head_hash, _ = read_head_fingerprint(file_path, file_state['head_size'])
+                        truncated = head_hash != file_state['head_hash']
+
+                if same_file and not truncated:
+                    start_offset = file_state['offset']
+                else:
+                    predecessor, rotation = find_rotated_predecessor(file_path, file_state)
+                    if predecessor:
+                        print(f"    🔁 检测到日志轮转({rotation})，先补读旧文件剩余部分: {predecessor}")
+                        segments.append((predecessor, file_state['offset'], os.path.getsize(predecessor)))
+                    else:
+                        rotation = "copytruncate" if same_file else "rename"
+                        print(f"    🔁 检测到日志轮转({rotation})，未找到旧文件，从新文件开头分析")
+
+            end_offset = find_complete_end(file_path, start_offset, file_stat.st_size)
+            segments.append((file_path, start_offset, end_offset))
+            print(f"    📖 增量读取: 偏移 {start_offset} → {end_offset}（新增 {end_offset - start_offset} 字节）")
+
+            start = time.time()
+            partials = [scan_log_range(path, range_start, range_end, error_keywords, context_lines,
+                                       encoding=encoding, mine_templates=mine_templates)
+                        for path, range_start, range_end in segments if range_end > range_start]
+            delta = merge_scan_results(partials)
+            elapsed = time.time() - start
+
+            if file_state:
+                aggregate = merge_scan_results([stats_as_partial(file_state['aggregate']),
+                                                stats_as_partial(copy.deepcopy(delta))])
+            else:
+                aggregate = copy.deepcopy(delta)
+
+            head_hash, head_size = read_head_fingerprint(file_path, min(TAIL_HEAD_BYTES, end_offset))
+            state[state_key] = {
+                "inode": file_stat.st_ino,
+                "device": file_stat.st_dev,
+                "offset": end_offset,
+                "head_hash": head_hash,
+                "head_size": head_size,
+                "error_keywords": list(error_keywords),
+                "runs": (file_state or {}).get('runs', 0) + 1,
+                "updated_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                "aggregate": aggregate
+            }
+            save_tail_state(state, state_file)
+
+            throughput = delta['bytes_scanned'] / 1024 / 1024 / elapsed if elapsed > 0 else 0.0
+            print(f"    ✅ 增量分析完成: 新增 {delta['line_count']} 行, 新增错误 {delta['total_errors']} 个, "
+                  f"累计 {aggregate['line_count']} 行")
+
+            return {
+                "success": True,
+                "file_path": file_path,
+                "file_size": file_stat.st_size,
+                "file_modified": datetime.fromtimestamp(file_stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                "lines_read": delta['line_count'],
+                "lines_limited": False,
+                "scan_mode": "tail",
+                "encoding_used": encoding,
+                "rotation": rotation,
+                "previous_offset": start_offset,
+                "offset": end_offset,
+                "bytes_read": delta['bytes_scanned'],
+                "runs": state[state_key]['runs'],
+                "elapsed_seconds": round(elapsed, 3),
+                "throughput_mb_s": round(throughput, 2),
+                "delta": delta,
+                "stats": aggregate
+            }
+
+        except Exception as e:
+            print(f"    ❌ 增量分析失败: {e}")
+            return {
+                "success": False,
+                "error": f"增量分析失败: {str(e)}"
+            }
+
+    def mine_templates(self, content_lines, error_keywords=None):
+        print(f"    🧩 开始日志模板聚类...")
+
+        matcher = get_line_matcher(error_keywords or self.default_error_keywords)
+        miner = LogTemplateMiner()
+        for line in content_lines:
+            miner.add_line(line, bool(matcher.match_keywords(line)))
+        templates = miner.export()
+
+        print(f"    ✅ 日志模板聚类完成，{len(content_lines)} 行归并为 {len(templates)} 个模板")
+        return templates
+
+    def _stats_to_analysis(self, stats):
+        error_analysis = {
+            'error_matches': stats['error_samples'],
+            'keyword_counts': stats['keyword_counts'],
+            'total_errors': stats['total_errors']
+        }
+        log_patterns = {
+            'timestamp_formats': stats['timestamp_formats'],
+            'log_levels': stats['log_levels'],
+            'ip_addresses': list(stats['ip_addresses'].keys()),
+            'ip_frequencies': dict(Counter(stats['ip_addresses']).most_common(20)),
+            'common_services': stats['common_services']
+        }
+        return error_analysis, log_patterns
+
     def call_ai_analysis(self, prompt, temperature=0.7, max_tokens=1500, timeout=60):
         try:
             print(f"    🧠 启动AI智能分析引擎...")
@@ -215,19 +1505,9 @@ class LogAnalyzer:
             headers = {'Content-Type': 'application/json'}
             
             print(f"    🌐 向AI运维大脑发送日志分析请求...")
-            response = requests.post(url, json=payload, headers=headers, timeout=timeout)
-
-            if response.status_code == 200:
-                response_data = response.json()
-                if 'choices' in response_data and len(response_data['choices']) > 0:
-                    print(f"    ✅ AI分析完成，生成专业诊断报告")
-                    return response_data['choices'][0]['message']['content']
-                else:
-                    print(f"    ❌ AI响应格式异常: {response_data}")
-                    return f"AI分析响应格式错误: {response_data}"
-            else:
-                print(f"    ❌ AI分析请求失败: HTTP {response.status_code}")
-                return f"AI分析请求失败: HTTP {response.status_code}, {response.text}"
+            content = stream_chat_completion(url, payload, headers, timeout=timeout, label='log_analysis')
+            print(f"    ✅ AI分析完成，生成专业诊断报告")
+            return content
         except requests.exceptions.Timeout:
             print(f"    ⏰ AI分析超时")
             return "AI分析超时，请检查网络连接和AI服务状态"
@@ -239,26 +1519,104 @@ class LogAnalyzer:
             return f"AI分析失败: {str(e)}"
 
     def analyze_log(self, file_path, line_limit=1000, error_keywords=None,
-                    context_lines=3, ai_analysis=True, ai_temperature=0.7, ai_max_tokens=1500):
+                    context_lines=3, ai_analysis=True, ai_temperature=0.7, ai_max_tokens=1500,
+                    full_scan=False, scan_workers=1, use_mmap=False, chunk_size=SCAN_CHUNK_SIZE,
+                    tail_mode=False, template_mining=False, log_set=False, remote_hosts=None):
         try:
             print(f"    🚀 启动智能日志分析系统...")
-            
-            file_result = self.read_file_content(file_path, line_limit)
-            if not file_result['success']:
-                return file_result
 
-            content_lines = file_result['content']
-            print(f"    🔍 开始多维度日志分析...")
-            
-            error_analysis = self.find_error_patterns(content_lines, error_keywords, context_lines)
-            log_patterns = self.analyze_log_patterns(content_lines)
+            use_log_set = not remote_hosts and (
+                log_set or is_glob_pattern(file_path) or file_path.endswith(COMPRESSED_SUFFIXES))
+            if remote_hosts:
+                file_result = self.analyze_remote_hosts(remote_hosts, file_path, error_keywords, context_lines,
+                                                        mine_templates=template_mining)
+                if not file_result['success']:
+                    return file_result
+
+                stats = file_result.pop('stats')
+                lines_analyzed = stats['line_count']
+                content_lines = stats['tail_lines']
+                templates = stats['templates']
+                error_analysis, log_patterns = self._stats_to_analysis(stats)
+            elif use_log_set:
+                file_result = self.scan_log_set(file_path, error_keywords, context_lines, scan_workers,
+                                                chunk_size, mine_templates=template_mining)
+                if not file_result['success']:
+                    return file_result
+
+                stats = file_result.pop('stats')
+                lines_analyzed = stats['line_count']
+                content_lines = stats['tail_lines']
+                templates = stats['templates']
+                error_analysis, log_patterns = self._stats_to_analysis(stats)
+            elif full_scan:
+                file_result = self.scan_file(file_path, error_keywords, context_lines, chunk_size,
+                                             use_mmap, scan_workers, mine_templates=template_mining)
+                if not file_result['success']:
+                    return file_result
+
+                stats = file_result.pop('stats')
+                lines_analyzed = stats['line_count']
+                content_lines = stats['tail_lines']
+                templates = stats['templates']
+                error_analysis, log_patterns = self._stats_to_analysis(stats)
+            elif tail_mode:
+                file_result = self.tail_analyze(file_path, error_keywords, context_lines,
+                                                mine_templates=template_mining)
+                if not file_result['success']:
+                    return file_result
+
+                stats = file_result.pop('stats')
+                delta = file_result.pop('delta')
+                lines_analyzed = delta['line_count']
+                content_lines = delta['tail_lines'] or stats['tail_lines']
+                templates = stats['templates']
+                error_analysis, log_patterns = self._stats_to_analysis(stats)
+                error_analysis['new_errors'] = delta['total_errors']
+                error_analysis['new_error_matches'] = delta['error_samples']
+            else:
+                file_result = self.read_file_content(file_path, line_limit)
+                if not file_result['success']:
+                    return file_result
+
+                content_lines = file_result['content']
+                lines_analyzed = len(content_lines)
+                print(f"    🔍 开始多维度日志分析...")
+
+                error_analysis = self.find_error_patterns(content_lines, error_keywords, context_lines)
+                log_patterns = self.analyze_log_patterns(content_lines)
+                templates = self.mine_templates(content_lines, error_keywords) if template_mining else []
 
             ai_result = None
             if ai_analysis:
                 print(f"    🧠 准备AI深度分析数据...")
                 
-                sample_errors = error_analysis['error_matches'][:10]
-                sample_content = content_lines[:50]
+                scan_note = ""
+                if tail_mode:
+                    sample_errors = (error_analysis['new_error_matches'] or error_analysis['error_matches'])[-10:]
+                    sample_content = content_lines[-50:]
+                    scan_note = (f"\n增量分析: 本次新增 {lines_analyzed} 行，新增错误 {error_analysis['new_errors']} 个"
+                                 f"（错误统计与日志模式为累计值）")
+                elif remote_hosts:
+                    sample_errors = error_analysis['error_matches'][-10:]
+                    sample_content = content_lines[-50:]
+                    scan_note = (f"\n远程分析: {len(file_result['hosts'])} 台主机，服务端预过滤后仅回传命中行"
+                                 f"（日志内容样例为命中行）")
+                elif full_scan or use_log_set:
+                    sample_errors = error_analysis['error_matches'][-10:]
+                    sample_content = content_lines[-50:]
+                    if use_log_set:
+                        scan_note = f"\n日志集合: 共 {len(file_result['files'])} 个文件（含轮转及压缩文件，按从旧到新合并）"
+                else:
+                    sample_errors = error_analysis['error_matches'][:10]
+                    sample_content = content_lines[:50]
+
+                content_title = "日志内容样例"
+                content_body = chr(10).join(sample_content)
+                if template_mining and templates:
+                    sample_errors = sample_errors[:3]
+                    content_title = f"日志模板（错误模板优先，按出现次数排序，共 {len(templates)} 个模板）"
+                    content_body = format_templates_for_prompt(templates)
 
                 prompt = f"""
 请分析以下日志文件内容：
@@ -267,7 +1625,7 @@ class LogAnalyzer:
 文件路径: {file_path}
 文件大小: {file_result.get('file_size', 0)} 字节
 修改时间: {file_result.get('file_modified', 'Unknown')}
-读取行数: {len(content_lines)} 行
+读取行数: {lines_analyzed} 行{scan_note}
 
 === 错误统计 ===
 总错误数: {error_analysis['total_errors']}
@@ -282,8 +1640,8 @@ IP地址: {log_patterns['ip_addresses'][:10]}
 === 错误样例 ===
 {json.dumps(sample_errors, ensure_ascii=False, indent=2)}
 
-=== 日志内容样例 ===
-{chr(10).join(sample_content)}
+=== {content_title} ===
+{content_body}
 
 请按以下格式分析：
 
@@ -317,15 +1675,18 @@ IP地址: {log_patterns['ip_addresses'][:10]}
                 "file_info": file_result,
                 "error_analysis": error_analysis,
                 "log_patterns": log_patterns,
+                "log_templates": templates[:TEMPLATE_PROMPT_LIMIT * 2],
                 "ai_analysis": ai_result,
                 "analysis_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 "summary": {
                     "file_path": file_path,
-                    "lines_analyzed": len(content_lines),
+                    "lines_analyzed": lines_analyzed,
                     "errors_found": error_analysis['total_errors'],
+                    "new_errors": error_analysis.get('new_errors', error_analysis['total_errors']),
                     "main_error_types": list(error_analysis['keyword_counts'].keys()),
                     "log_levels_found": list(log_patterns['log_levels'].keys()),
-                    "services_mentioned": list(log_patterns['common_services'].keys())
+                    "services_mentioned": list(log_patterns['common_services'].keys()),
+                    "template_count": len(templates)
                 }
             }
 
@@ -358,12 +1719,23 @@ def log_file_analysis(params=None):
         ai_analysis = params.get('ai_analysis', True)
         ai_temperature = params.get('ai_temperature', 0.7)
         ai_max_tokens = params.get('ai_max_tokens', 1500)
+        full_scan = bool(params.get('full_scan', False))
+        scan_workers = params.get('scan_workers', 1)
+        use_mmap = bool(params.get('use_mmap', False))
+        tail_mode = bool(params.get('tail_mode', False))
+        template_mining = bool(params.get('template_mining', False))
+        log_set = bool(params.get('log_set', False))
+        remote_hosts = params.get('remote_hosts')
 
         print(f"📁 目标日志文件: {file_path}")
         print(f"📊 分析参数配置:")
         print(f"    📖 读取行数限制: {line_limit}")
         print(f"    🔍 上下文行数: {context_lines}")
         print(f"    🧠 AI分析: {'启用' if ai_analysis else '禁用'}")
+        if full_scan:
+            print(f"    🌊 全量分块扫描: 启用（进程数 {scan_workers}）")
+        if tail_mode:
+            print(f"    📌 增量分析: 仅分析上次偏移之后的新增内容")
         
         if error_keywords:
             print(f"    🎯 自定义关键词: {len(error_keywords)} 个")
@@ -376,15 +1748,24 @@ def log_file_analysis(params=None):
             context_lines=context_lines,
             ai_analysis=ai_analysis,
             ai_temperature=ai_temperature,
-            ai_max_tokens=ai_max_tokens
+            ai_max_tokens=ai_max_tokens,
+            full_scan=full_scan,
+            scan_workers=scan_workers,
+            use_mmap=use_mmap,
+            tail_mode=tail_mode,
+            template_mining=template_mining,
+            log_set=log_set,
+            remote_hosts=remote_hosts
         )
 
         if result and result.get('success'):
             print(f"✅ 智能日志分析服务完成: {file_path}")
             print(f"📊 分析结果:")
-            print(f"    📝 读取行数: {result['analysis_result']['summary']['lines_analyzed']}")
-            print(f"    🚨 发现错误: {result['analysis_result']['summary']['errors_found']} 个")
-            print(f"    🔧 涉及服务: {len(result['analysis_result']['summary']['services_mentioned'])} 个")
+            print(f"    📝 读取行数: {result['summary']['lines_analyzed']}")
+            print(f"    🚨 发现错误: {result['summary']['errors_found']} 个")
+            print(f"    🔧 涉及服务: {len(result['summary']['services_mentioned'])} 个")
+            if full_scan:
+                print(f"    ⚡ 扫描吞吐: {result['file_info']['throughput_mb_s']} MB/s")
             
             logger.info(f"📊 日志文件分析完成: {file_path}")
             return {
@@ -414,11 +1795,83 @@ def log_file_analysis(params=None):
         }
 
 
+def generate_synthetic_log_lines(line_count, error_ratio=0.05):
+    messages = [
+        "request completed in 12ms",
+        "cache hit for key user:{i}",
+        "Connection failed: connection refused by upstream",
+        "Traceback (most recent call last): MemoryError: out of memory",
+        "disk full, no space left on device /data",
+        "WARNING slow query detected on mysql replica",
+        "Permission denied while opening /etc/shadow",
+        "FATAL kernel panic - not syncing",
+    ]
+    levels = ['INFO', 'DEBUG', 'INFO', 'INFO', 'WARN']
+    services = ['nginx', 'docker', 'systemd', 'app', 'worker']
+    error_every = max(1, int(1 / error_ratio)) if error_ratio else 0
+    for i in range(line_count):
+        if error_every and i % error_every == 0:
+            message = messages[2 + (i // error_every) % (len(messages) - 2)]
+            level = 'ERROR'
+        else:
+            message = messages[i % 2].format(i=i)
+            level = levels[i % len(levels)]
+        yield (f"2026-10-19 08:{(i // 60) % 60:02d}:{i % 60:02d} {level} {services[i % len(services)]}"
+               f"[{1000 + i % 50}] 10.0.{i % 16}.{i % 250} {message}")
+
+
+def benchmark_error_matching(line_count=200000, error_keywords=None, rounds=3):
+    error_keywords = error_keywords or LogAnalyzer().default_error_keywords
+    lines = list(generate_synthetic_log_lines(line_count))
+    size_mb = sum(len(line) + 1 for line in lines) / 1024 / 1024
+    print(f"    ⏱️ 使用 {line_count} 行合成日志（{size_mb:.1f} MB）对比逐关键词匹配与单遍匹配...")
+
+    def legacy_classify(line):
+        line_lower = line.lower()
+        found_keywords = [keyword for keyword in error_keywords if keyword.lower() in line_lower]
+        timestamp_format = None
+        for pattern in TIMESTAMP_PATTERNS:
+            if re.search(pattern, line):
+                timestamp_format = pattern
+                break
+        ips = re.findall(IP_PATTERN, line)
+        levels = [level.upper() for level in re.findall(LOG_LEVEL_PATTERN, line, re.IGNORECASE)]
+        services = [service for service in COMMON_SERVICES if service in line_lower]
+        return found_keywords, levels, ips, services, timestamp_format
+
+    matcher = LogLineMatcher(error_keywords)
+    mismatches = sum(1 for line in lines[:20000] if legacy_classify(line) != matcher.classify(line))
+
+    results = {"lines": line_count, "size_mb": round(size_mb, 2), "mismatches": mismatches}
+    for mode, classify in (("legacy", legacy_classify), ("single_pass", matcher.classify)):
+        timings = []
+        for _ in range(rounds):
+            start = time.time()
+            for line in lines:
+                classify(line)
+            timings.append(time.time() - start)
+        best = min(timings)
+        results[mode] = {
+            "best_seconds": round(best, 3),
+            "lines_per_second": int(line_count / best) if best else 0,
+            "throughput_mb_s": round(size_mb / best, 2) if best else 0.0
+        }
+        print(f"    📊 {mode}: {best:.3f}s, {results[mode]['throughput_mb_s']} MB/s")
+
+    results["speedup"] = round(results["legacy"]["best_seconds"] / results["single_pass"]["best_seconds"], 2) \
+        if results["single_pass"]["best_seconds"] else None
+    return results
+
+
 if __name__ == "__main__":
-    test_params = {
-        'file_path': '/var/log/syslog',
-        'line_limit': 500,
-        'ai_analysis': True
-    }
-    result = log_file_analysis(test_params)
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        line_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+        result = benchmark_error_matching(line_count)
+    else:
+        test_params = {
+            'file_path': '/var/log/syslog',
+            'line_limit': 500,
+            'ai_analysis': True
+        }
+        result = log_file_analysis(test_params)
     print(f"测试结果: {result}")
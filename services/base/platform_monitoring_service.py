@@ -252,6 +252,62 @@ def aggregate_performance_data(cpu_data, memory_data, disk_data):
     return result
 
 
+METRICS_ROLLUP_TABLE = 'howso_server_performance_metrics_hourly'
+ROLLUP_METRICS = ('cpu', 'memory', 'disk')
+_rollup_table_ready = False
+
+
+def ensure_rollup_table(cursor):
+    """每个进程只执行一次 CREATE TABLE IF NOT EXISTS，之后的保存不再查询表结构"""
+    global _rollup_table_ready
+    if _rollup_table_ready:
+        return
+    metric_columns = "".join(
+        f"`{metric}_count` int NOT NULL DEFAULT 0 COMMENT '{metric}有效样本数', "
+        f"`{metric}_sum` decimal(12, 2) DEFAULT NULL, "
+        f"`{metric}_min` decimal(5, 2) DEFAULT NULL, "
+        f"`{metric}_max` decimal(5, 2) DEFAULT NULL, "
+        for metric in ROLLUP_METRICS)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS `{METRICS_ROLLUP_TABLE}` (
+            `ip` varchar(50) NOT NULL COMMENT '服务器IP',
+            `bucket_time` datetime NOT NULL COMMENT '小时桶起点',
+            `sample_count` int NOT NULL DEFAULT 0 COMMENT '样本数',
+            {metric_columns}
+            PRIMARY KEY (`ip`, `bucket_time`),
+            KEY `idx_bucket_time` (`bucket_time`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='服务器性能监控指标小时聚合表'
+        """)
+    _rollup_table_ready = True
+    logger.info(f"📊 {METRICS_ROLLUP_TABLE} 表已就绪")
+
+
+def upsert_hourly_rollup(cursor, records):
+    """把已保存的原始记录累加到小时聚合表，长时间跨度的图表查询直接读聚合表"""
+    ensure_rollup_table(cursor)
+    metric_columns = ", ".join(f"{metric}_count, {metric}_sum, {metric}_min, {metric}_max" for metric in ROLLUP_METRICS)
+    updates = ", ".join(
+        f"{metric}_count = {metric}_count + VALUES({metric}_count), "
+        f"{metric}_sum = COALESCE({metric}_sum, 0) + COALESCE(VALUES({metric}_sum), 0), "
+        f"{metric}_min = LEAST(COALESCE({metric}_min, VALUES({metric}_min)), COALESCE(VALUES({metric}_min), {metric}_min)), "
+        f"{metric}_max = GREATEST(COALESCE({metric}_max, VALUES({metric}_max)), COALESCE(VALUES({metric}_max), {metric}_max))"
+        for metric in ROLLUP_METRICS)
+    upsert_sql = f"""
+        INSERT INTO {METRICS_ROLLUP_TABLE} (ip, bucket_time, sample_count, {metric_columns})
+        VALUES (%s, %s, 1, {", ".join(["%s"] * 4 * len(ROLLUP_METRICS))})
+        ON DUPLICATE KEY UPDATE sample_count = sample_count + 1, {updates}
+        """
+
+    rows = []
+    for record in records:
+        ip, collect_time, cpu_usage, memory_usage, disk_usage = record[1], record[2], record[3], record[5], record[7]
+        row = [ip, collect_time.replace(minute=0, second=0, microsecond=0)]
+        for value in (cpu_usage, memory_usage, disk_usage):
+            row.extend([1, value, value, value] if value is not None else [0, None, None, None])
+        rows.append(row)
+    cursor.executemany(upsert_sql, rows)
+
+
 def save_performance_data_to_db(aggregated_data):
     try:
         print(f"    💾 准备将监控数据写入数据库...")
@@ -334,6 +390,15 @@ def save_performance_data_to_db(aggregated_data):
         print(f"    ✅ 监控数据存储完成，成功保存 {len(records)} 条性能记录")
         logger.info(f"📊 成功保存 {len(records)} 条性能监控记录到数据库")
 
+        # 原始数据已提交；聚合表只是查询加速，失败时仅记录日志，不影响本次保存结果
+        try:
+            upsert_hourly_rollup(cursor, records)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"    ⚠️ 小时聚合表更新失败，原始数据已保存: {e}")
+            logger.warning(f"⚠️ 更新 {METRICS_ROLLUP_TABLE} 失败: {e}")
+
         conn.close()
         return True, batch_id
 
@@ -4,7 +4,6 @@
 import json
 import re
 from datetime import datetime, timedelta, time as dt_time
-import requests
 from decimal import Decimal
 
 import sys
@@ -15,10 +14,21 @@ sys.path.insert(0, project_root)
 
 from utils.logger import setup_logger
 from utils.database import get_connection
+from utils.llm_stream import stream_chat_completion
 from config.config import LLM_CONFIG
+from services.base.daily_report_service import generate_sections_concurrently, benchmark_ai_analysis_modes
 
 logger = setup_logger(__name__)
 
+WEEKLY_SECTION_SPECS = {
+    "运维日报": "400字，包括过去7天的整体运行状况概述、主要指标趋势、关键事件等",
+    "异常分析": "300字，对发现的异常情况进行原因分析和趋势判断",
+    "风险预测": "300字，根据一周数据预测下周可能出现的风险",
+    "运维建议": "300字，针对发现的问题提出具体可行的运维建议",
+    "重点关注": "200字，下周需要重点关注和处理的问题",
+    "中度关注": "200字，需要持续监控但暂不需要立即处理的问题"
+}
+
 
 def convert_decimal(obj):
     if isinstance(obj, Decimal):
@@ -64,6 +74,13 @@ def generate_unique_id(prefix='oas'):
     return f"{prefix}{timestamp}"
 
 
+def rows_as_dicts(cursor, results):
+    """兼容 DictCursor（默认连接）和元组游标两种返回格式"""
+    columns = [desc[0] for desc in cursor.description]
+    return [convert_decimal(row) if isinstance(row, dict) else dict(zip(columns, convert_decimal(row)))
+            for row in results]
+
+
 def fetch_weekly_server_metrics(conn, start_time, end_time):
     print(f"    📊 启动数据库连接，查询服务器性能指标...")
     with conn.cursor() as cursor:
@@ -86,7 +103,7 @@ def fetch_weekly_server_metrics(conn, start_time, end_time):
         cursor.execute(query, (start_time, end_time))
         results = cursor.fetchall()
         print(f"    ✅ 服务器性能数据采集完成，共获取 {len(results)} 台服务器的周统计数据")
-        return [dict(zip([desc[0] for desc in cursor.description], convert_decimal(row))) for row in results]
+        return rows_as_dicts(cursor, results)
 
 
 def fetch_weekly_service_status(conn, start_time, end_time):
@@ -106,7 +123,7 @@ def fetch_weekly_service_status(conn, start_time, end_time):
         cursor.execute(query, (start_time, end_time))
         results = cursor.fetchall()
         print(f"    ✅ 服务状态数据采集完成，共获取 {len(results)} 个服务的周统计数据")
-        return [dict(zip([desc[0] for desc in cursor.description], convert_decimal(row))) for row in results]
+        return rows_as_dicts(cursor, results)
 
 
 def fetch_weekly_nas_pools(conn, start_date, end_date):
@@ -125,7 +142,7 @@ def fetch_weekly_nas_pools(conn, start_date, end_date):
         cursor.execute(query, (start_date, end_date))
         results = cursor.fetchall()
         print(f"    ✅ 存储池数据采集完成，共获取 {len(results)} 个存储池的周统计数据")
-        return [dict(zip([desc[0] for desc in cursor.description], convert_decimal(row))) for row in results]
+        return rows_as_dicts(cursor, results)
 
 
 def fetch_weekly_power_monitoring(conn, start_time, end_time):
@@ -147,13 +164,235 @@ def fetch_weekly_power_monitoring(conn, start_time, end_time):
             cursor.execute(query, (start_time, end_time))
             results = cursor.fetchall()
             print(f"    ✅ 电力监控数据采集完成，共获取 {len(results)} 条电力周统计数据")
-            return [dict(zip([desc[0] for desc in cursor.description], convert_decimal(row))) for row in results]
+            return rows_as_dicts(cursor, results)
     except Exception as e:
         print(f"    ⚠️ 电力监控数据采集遇到问题: {e}")
         logger.error(f"🚨 Error fetching weekly power monitoring data: {e}")
         return []
 
 
+def fetch_daily_rollups(conn, start_date, end_date):
+    print(f"    📚 查询已存储的日报聚合数据...")
+    with conn.cursor() as cursor:
+        query = """
+                SELECT report_date, exception_data, created_at
+                FROM operation_analysis_summary
+                WHERE report_type = 'daily'
+                  AND report_date BETWEEN %s AND %s
+                ORDER BY created_at DESC
+                """
+        cursor.execute(query, (start_date, end_date))
+        results = cursor.fetchall()
+
+    rollups = {}
+    for row in results:
+        if not isinstance(row, dict):
+            row = dict(zip([desc[0] for desc in cursor.description], row))
+        report_date = row.get('report_date')
+        if isinstance(report_date, datetime):
+            report_date = report_date.date()
+        elif isinstance(report_date, str):
+            report_date = datetime.strptime(report_date[:10], '%Y-%m-%d').date()
+        if report_date in rollups:
+            continue
+        try:
+            stored = json.loads(row.get('exception_data') or '{}')
+        except (TypeError, ValueError):
+            continue
+        if isinstance(stored, dict) and stored.get("周报聚合"):
+            rollups[report_date] = stored["周报聚合"]
+
+    print(f"    ✅ 日报聚合数据查询完成，可复用 {len(rollups)} 天")
+    return rollups
+
+
+def build_rollup_from_weekly_rows(server_metrics, service_status, nas_pools, power_monitoring):
+    servers = []
+    for m in server_metrics:
+        record_count = safe_int(m.get('record_count', 0))
+        row = {"ip": m.get('ip'), "record_count": record_count}
+        for metric in ("cpu", "memory", "disk"):
+            row[f"{metric}_sum"] = safe_float(m.get(f"avg_{metric}", 0)) * record_count
+            row[f"{metric}_samples"] = record_count
+        for status in ("cpu", "memory", "disk", "network", "packet_loss", "user_load"):
+            row[f"{status}_anomalies"] = safe_int(m.get(f"{status}_anomalies", 0))
+        servers.append(row)
+
+    pools = []
+    for p in nas_pools:
+        check_count = safe_int(p.get('check_count', 0))
+        pools.append({
+            "server_name": p.get('server_name'),
+            "pool_name": p.get('pool_name'),
+            "check_count": check_count,
+            "usage_sum": safe_float(p.get('avg_usage', 0)) * check_count,
+            "usage_samples": check_count,
+            "anomaly_count": safe_int(p.get('anomaly_count', 0))
+        })
+
+    power_data = power_monitoring[0] if power_monitoring else {}
+    return {
+        "servers": servers,
+        "services": [{
+            "platform": s.get('platform'),
+            "server_ip": s.get('server_ip'),
+            "service_name": s.get('service_name'),
+            "total_checks": safe_int(s.get('total_checks', 0)),
+            "anomaly_count": safe_int(s.get('anomaly_count', 0)),
+            "stop_count": safe_int(s.get('stop_count', 0))
+        } for s in service_status],
+        "nas_pools": pools,
+        "power": {key: safe_int(value) for key, value in power_data.items()}
+    }
+
+
+def merge_daily_rollups(rollups):
+    servers = {}
+    services = {}
+    pools = {}
+    power = {}
+
+    for rollup in rollups:
+        for row in rollup.get("servers", []):
+            merged = servers.setdefault(row.get("ip"), {"ip": row.get("ip")})
+            for key, value in row.items():
+                if key != "ip":
+                    merged[key] = merged.get(key, 0) + safe_float(value)
+        for row in rollup.get("services", []):
+            key = (row.get("platform"), row.get("server_ip"), row.get("service_name"))
+            merged = services.setdefault(key, {"platform": key[0], "server_ip": key[1], "service_name": key[2],
+                                               "total_checks": 0, "anomaly_count": 0, "stop_count": 0})
+            for field in ("total_checks", "anomaly_count", "stop_count"):
+                merged[field] += safe_int(row.get(field, 0))
+        for row in rollup.get("nas_pools", []):
+            key = (row.get("server_name"), row.get("pool_name"))
+            merged = pools.setdefault(key, {"server_name": key[0], "pool_name": key[1]})
+            for field in ("check_count", "usage_sum", "usage_samples", "anomaly_count"):
+                merged[field] = merged.get(field, 0) + safe_float(row.get(field, 0))
+        for key, value in rollup.get("power", {}).items():
+            power[key] = power.get(key, 0) + safe_int(value)
+
+    server_metrics = []
+    for row in servers.values():
+        item = {"ip": row["ip"], "record_count": safe_int(row.get("record_count", 0))}
+        for metric in ("cpu", "memory", "disk"):
+            samples = row.get(f"{metric}_samples", 0)
+            item[f"avg_{metric}"] = round(row.get(f"{metric}_sum", 0) / samples, 2) if samples else 0
+        for status in ("cpu", "memory", "disk", "network", "packet_loss", "user_load"):
+            item[f"{status}_anomalies"] = safe_int(row.get(f"{status}_anomalies", 0))
+        server_metrics.append(item)
+
+    nas_pools = [{
+        "server_name": row["server_name"],
+        "pool_name": row["pool_name"],
+        "check_count": safe_int(row.get("check_count", 0)),
+        "avg_usage": round(row.get("usage_sum", 0) / row["usage_samples"], 2) if row.get("usage_samples") else 0,
+        "anomaly_count": safe_int(row.get("anomaly_count", 0))
+    } for row in pools.values()]
+
+    power_monitoring = [power] if power.get("record_count") else []
+
+    return server_metrics, list(services.values()), nas_pools, power_monitoring
+
+
+def group_consecutive_dates(dates):
+    ranges = []
+    for day in sorted(dates):
+        if ranges and ranges[-1][1] + timedelta(days=1) == day:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [(first, last) for first, last in ranges]
+
+
+def fetch_weekly_data_incremental(conn, start_date, end_date):
+    print(f"    🧩 增量模式：优先复用每日日报已存储的聚合数据...")
+    rollups = fetch_daily_rollups(conn, start_date, end_date)
+
+    all_dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    missing_dates = [day for day in all_dates if day not in rollups]
+    daily_rollups = list(rollups.values())
+
+    if missing_dates:
+        print(f"    🔄 {len(missing_dates)} 天缺少日报聚合数据，回退到原始数据查询...")
+        logger.info(f"📅 缺少日报聚合数据的日期: {[day.strftime('%Y-%m-%d') for day in missing_dates]}")
+        for range_start, range_end in group_consecutive_dates(missing_dates):
+            range_start_time = datetime.combine(range_start, dt_time.min)
+            range_end_time = datetime.combine(range_end, dt_time.max)
+            daily_rollups.append(build_rollup_from_weekly_rows(
+                fetch_weekly_server_metrics(conn, range_start_time, range_end_time),
+                fetch_weekly_service_status(conn, range_start_time, range_end_time),
+                fetch_weekly_nas_pools(conn, range_start, range_end),
+                fetch_weekly_power_monitoring(conn, range_start_time, range_end_time)
+            ))
+
+    print(f"    ✅ 增量数据合并完成，复用 {len(rollups)} 天日报数据，原始查询 {len(missing_dates)} 天")
+    return merge_daily_rollups(daily_rollups)
+
+
+def check_incremental_fallback():
+    """用 DictCursor 格式的模拟数据校验增量模式：一天复用日报聚合，其余天回退到原始查询，
+    合并结果中只能出现真实的服务器/服务/存储池，计数为两部分之和"""
+
+    class FakeCursor:
+        def __init__(self):
+            self.description = []
+            self.rows = []
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return False
+
+        def execute(self, query, params=None):
+            if "operation_analysis_summary" in query:
+                stored = build_rollup_from_weekly_rows(
+                    [{"ip": "10.0.0.1", "avg_cpu": 40, "avg_memory": 50, "avg_disk": 60, "record_count": 10,
+                      "cpu_anomalies": 1}],
+                    [{"platform": "p", "server_ip": "10.0.0.1", "service_name": "nginx", "total_checks": 10,
+                      "anomaly_count": 1, "stop_count": 0}],
+                    [{"server_name": "nas", "pool_name": "pool1", "check_count": 1, "avg_usage": 70,
+                      "anomaly_count": 0}],
+                    [{"record_count": 5, "battery_anomalies": 1}])
+                self.rows = [{"report_date": params[0], "created_at": datetime.now(),
+                              "exception_data": json.dumps({"周报聚合": stored}, ensure_ascii=False)}]
+            elif "howso_server_performance_metrics" in query:
+                self.rows = [{"ip": "10.0.0.1", "avg_cpu": Decimal("20.00"), "avg_memory": Decimal("30.00"),
+                              "avg_disk": Decimal("60.00"), "record_count": 30, "cpu_anomalies": Decimal("2"),
+                              "memory_anomalies": 0, "disk_anomalies": 0, "network_anomalies": 0,
+                              "packet_loss_anomalies": 0, "user_load_anomalies": 0}]
+            elif "plat_service_monitoring" in query:
+                self.rows = [{"platform": "p", "server_ip": "10.0.0.1", "service_name": "nginx",
+                              "total_checks": 30, "anomaly_count": Decimal("2"), "stop_count": Decimal("1")}]
+            elif "nas_pools_detail" in query:
+                self.rows = [{"server_name": "nas", "pool_name": "pool1", "check_count": 3,
+                              "avg_usage": Decimal("80.00"), "anomaly_count": Decimal("1")}]
+            else:
+                self.rows = [{"record_count": 15, "battery_anomalies": Decimal("2")}]
+            self.description = [(column,) for column in self.rows[0]]
+
+        def fetchall(self):
+            return self.rows
+
+    class FakeConnection:
+        def cursor(self):
+            return FakeCursor()
+
+    _, _, start_date, end_date = get_weekly_date_range()
+    server_metrics, service_status, nas_pools, power_monitoring = fetch_weekly_data_incremental(
+        FakeConnection(), start_date, end_date)
+
+    assert [m["ip"] for m in server_metrics] == ["10.0.0.1"], server_metrics
+    assert server_metrics[0]["record_count"] == 40 and server_metrics[0]["cpu_anomalies"] == 3, server_metrics
+    assert server_metrics[0]["avg_cpu"] == 25.0, server_metrics
+    assert [(s["service_name"], s["total_checks"], s["stop_count"]) for s in service_status] == [("nginx", 40, 1)]
+    assert [(p["pool_name"], p["check_count"], p["avg_usage"]) for p in nas_pools] == [("pool1", 4, 77.5)]
+    assert power_monitoring[0]["record_count"] == 20 and power_monitoring[0]["battery_anomalies"] == 3
+    print(f"    ✅ 增量模式回退路径校验通过: {json.dumps(server_metrics, ensure_ascii=False)}")
+    return {"success": True, "server_metrics": server_metrics}
+
+
 def prepare_weekly_data_summary(server_metrics, service_status, nas_pools, power_monitoring):
     print(f"    📈 开始聚合和分析周度监控数据...")
     
@@ -302,9 +541,22 @@ def parse_ai_response(ai_response):
     return sections
 
 
-def get_ai_weekly_analysis(data_summary, exception_data):
+def get_ai_weekly_analysis(data_summary, exception_data, parallel_sections=False):
     print(f"    🧠 启动QWEN3-32B AI引擎进行周度深度分析...")
-    
+
+    if parallel_sections:
+        context = f"""
+    请作为数据中心运维专家，根据以下过去7天的数据中心监控数据进行分析。
+
+    数据概况：
+    {json.dumps(data_summary, ensure_ascii=False, indent=2)}
+
+    异常数据：
+    {json.dumps(exception_data, ensure_ascii=False, indent=2)}
+    """
+        return generate_sections_concurrently(
+            context, WEEKLY_SECTION_SPECS, "你是一位资深的数据中心运维专家，负责分析过去7天的监控数据并提供专业的运维建议。")
+
     prompt = f"""
     请作为数据中心运维专家，根据以下过去7天的数据中心监控数据，分别提供以下分析（注意字数限制）：
 
@@ -341,13 +593,9 @@ def get_ai_weekly_analysis(data_summary, exception_data):
     try:
         print(f"    🌐 向AI运维大脑发送周报分析请求...")
         logger.info("🔮 发送周报AI分析请求...")
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-
-        result = response.json()
+        ai_response = stream_chat_completion(url, payload, headers, timeout=180, label='weekly_report')
         print(f"    ✅ AI运维大脑分析完成，生成专业周报")
         logger.info("🎯 成功接收周报AI分析响应")
-        ai_response = result["choices"][0]["message"]["content"]
 
         sections = parse_ai_response(ai_response)
         return sections
@@ -407,16 +655,17 @@ def weekly_monitoring_report(params=None):
         logger.info(f"📅 周报日期范围: {start_time} 到 {end_time}")
 
         print(f"📊 开始采集多维度监控数据...")
-        server_metrics = fetch_weekly_server_metrics(conn, start_time, end_time)
+        if (params or {}).get('incremental', False):
+            server_metrics, service_status, nas_pools, power_monitoring = fetch_weekly_data_incremental(
+                conn, start_date, end_date)
+        else:
+            server_metrics = fetch_weekly_server_metrics(conn, start_time, end_time)
+            service_status = fetch_weekly_service_status(conn, start_time, end_time)
+            nas_pools = fetch_weekly_nas_pools(conn, start_time.date(), end_time.date())
+            power_monitoring = fetch_weekly_power_monitoring(conn, start_time, end_time)
         logger.info(f"📈 获取到 {len(server_metrics)} 台服务器的周报数据")
-
-        service_status = fetch_weekly_service_status(conn, start_time, end_time)
         logger.info(f"🔧 获取到 {len(service_status)} 项服务的周报数据")
-
-        nas_pools = fetch_weekly_nas_pools(conn, start_time.date(), end_time.date())
         logger.info(f"💾 获取到 {len(nas_pools)} 个存储池的周报数据")
-
-        power_monitoring = fetch_weekly_power_monitoring(conn, start_time, end_time)
         logger.info(f"⚡ 获取到 {len(power_monitoring)} 条电力监控周报数据")
 
         if not server_metrics and not service_status and not nas_pools and not power_monitoring:
@@ -430,7 +679,8 @@ def weekly_monitoring_report(params=None):
         exception_data = get_weekly_exceptions(server_metrics, service_status, nas_pools, power_monitoring)
 
         print(f"🧠 启动AI深度分析引擎...")
-        analysis_result = get_ai_weekly_analysis(data_summary, exception_data)
+        parallel_sections = bool((params or {}).get('parallel_sections', False))
+        analysis_result = get_ai_weekly_analysis(data_summary, exception_data, parallel_sections=parallel_sections)
         logger.info("🎯 周报AI分析完成")
 
         print(f"💾 保存分析结果到运维数据库...")
@@ -466,5 +716,20 @@ def weekly_monitoring_report(params=None):
 
 
 if __name__ == "__main__":
-    result = weekly_monitoring_report()
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+        conn = get_connection()
+        start_time, end_time, start_date, end_date = get_weekly_date_range()
+        server_metrics = fetch_weekly_server_metrics(conn, start_time, end_time)
+        service_status = fetch_weekly_service_status(conn, start_time, end_time)
+        nas_pools = fetch_weekly_nas_pools(conn, start_time.date(), end_time.date())
+        power_monitoring = fetch_weekly_power_monitoring(conn, start_time, end_time)
+        conn.close()
+        data_summary = prepare_weekly_data_summary(server_metrics, service_status, nas_pools, power_monitoring)
+        exception_data = get_weekly_exceptions(server_metrics, service_status, nas_pools, power_monitoring)
+        result = benchmark_ai_analysis_modes(get_ai_weekly_analysis, data_summary, exception_data, rounds)
+    elif len(sys.argv) > 1 and sys.argv[1] == "check-incremental":
+        result = check_incremental_fallback()
+    else:
+        result = weekly_monitoring_report()
     print(f"测试结果: {result}")
@@ -12,6 +12,7 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.logger import setup_logger
+from utils.llm_stream import stream_chat_completion
 
 logger = setup_logger(__name__)
 
@@ -112,16 +113,11 @@ class HardwareSummary:
                     {"role": "user", "content": prompt}
                 ],
                 "temperature": temperature,
-                "max_tokens": max_tokens,
-                "stream": False
+                "max_tokens": max_tokens
             }
 
             headers = {"Content-Type": "application/json"}
-            response = requests.post(url, json=payload, headers=headers, timeout=180)
-            response.raise_for_status()
-
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+            return stream_chat_completion(url, payload, headers, timeout=180, label='hardware_summary')
         except requests.exceptions.Timeout:
             error_msg = "AI分析超时，请检查网络连接或降低数据量"
             print(error_msg)
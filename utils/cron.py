@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+CRON_ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *'
+}
+
+MONTH_NAMES = {name: index for index, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1)}
+WEEKDAY_NAMES = {name: index for index, name in enumerate(['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}
+WEEKDAY_LABELS = ['周日', '周一', '周二', '周三', '周四', '周五', '周六']
+
+# (最小值, 最大值, 名称映射)，顺序为 分 时 日 月 周
+CRON_FIELDS = [
+    (0, 59, None),
+    (0, 23, None),
+    (1, 31, None),
+    (1, 12, MONTH_NAMES),
+    (0, 7, WEEKDAY_NAMES)
+]
+
+# 日/月/周约束永远无法同时满足时（如 2月30日）的搜索上限
+CRON_SEARCH_DAYS = 366 * 5
+
+
+def _parse_value(token: str, names: Optional[Dict[str, int]]) -> int:
+    token = token.strip().lower()
+    if names and token in names:
+        return names[token]
+    return int(token)
+
+
+def parse_cron_field(field: str, minimum: int, maximum: int, names: Optional[Dict[str, int]] = None) -> List[int]:
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+            if step <= 0:
+                raise ValueError(f"无效的步长: {field}")
+
+        if part == '*':
+            start, end = minimum, maximum
+        elif '-' in part:
+            start_text, end_text = part.split('-', 1)
+            start, end = _parse_value(start_text, names), _parse_value(end_text, names)
+        else:
+            start = _parse_value(part, names)
+            end = maximum if step > 1 else start
+
+        if start < minimum or end > maximum or start > end:
+            raise ValueError(f"字段超出范围 [{minimum}-{maximum}]: {field}")
+        values.update(range(start, end + 1, step))
+
+    return sorted(values)
+
+
+class CronSpec:
+    """标准5段式cron表达式：分 时 日 月 周（0和7均表示周日）"""
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = CRON_ALIASES.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"cron表达式需要5个字段: {expression}")
+
+        parsed = [parse_cron_field(field, minimum, maximum, names)
+                  for field, (minimum, maximum, names) in zip(fields, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = sorted({day % 7 for day in weekdays})
+        self.day_restricted = fields[2] != '*'
+        self.weekday_restricted = fields[4] != '*'
+
+    def matches_day(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        day_match = day.day in self.days
+        weekday_match = (day.weekday() + 1) % 7 in self.weekdays
+        # 与 crontab 一致：日和周同时被限定时满足其一即可
+        if self.day_restricted and self.weekday_restricted:
+            return day_match or weekday_match
+        if self.day_restricted:
+            return day_match
+        if self.weekday_restricted:
+            return weekday_match
+        return True
+
+    def next_after(self, moment: datetime) -> datetime:
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = candidate.replace(hour=0, minute=0)
+
+        for _ in range(CRON_SEARCH_DAYS):
+            if self.matches_day(day):
+                for hour in self.hours:
+                    if day.date() == candidate.date() and hour < candidate.hour:
+                        continue
+                    for minute in self.minutes:
+                        fire_time = day.replace(hour=hour, minute=minute)
+                        if fire_time >= candidate:
+                            return fire_time
+            day += timedelta(days=1)
+
+        raise ValueError(f"cron表达式在 {CRON_SEARCH_DAYS} 天内没有触发时间: {self.expression}")
+
+    def describe(self) -> str:
+        if len(self.minutes) == 1 and len(self.hours) == 1:
+            clock = f"{self.hours[0]:02d}:{self.minutes[0]:02d}"
+            if self.weekday_restricted and not self.day_restricted and len(self.months) == 12:
+                return f"每{'、'.join(WEEKDAY_LABELS[day] for day in self.weekdays)}{clock}"
+            if not self.day_restricted and not self.weekday_restricted and len(self.months) == 12:
+                return f"每天{clock}"
+        return self.expression
+
+    def __repr__(self):
+        return f"CronSpec({self.expression!r})"
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import List, Sequence, Tuple
+
+Point = Tuple[float, float]
+
+
+def lttb(points: Sequence[Point], threshold: int) -> List[Point]:
+    """Largest-Triangle-Three-Buckets 降采样，保留首尾点和视觉上最显著的拐点"""
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (count - 2) / (threshold - 2)
+    previous = 0
+
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # 下一个桶的均值作为三角形的第三个顶点
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        if next_start >= next_end:
+            avg_x, avg_y = points[-1]
+        else:
+            span = next_end - next_start
+            avg_x = sum(point[0] for point in points[next_start:next_end]) / span
+            avg_y = sum(point[1] for point in points[next_start:next_end]) / span
+
+        anchor_x, anchor_y = points[previous]
+        best_area = -1.0
+        best_index = start
+        for index in range(start, end):
+            x, y = points[index]
+            area = abs((anchor_x - avg_x) * (y - anchor_y) - (anchor_x - x) * (avg_y - anchor_y))
+            if area > best_area:
+                best_area = area
+                best_index = index
+
+        sampled.append(points[best_index])
+        previous = best_index
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax_downsample(rows: Sequence[Tuple[float, float, float]], threshold: int) -> List[Point]:
+    """按时间等分为 threshold/2 个桶，每桶输出最小值和最大值两个点，保留尖峰
+    rows 为 (时间, 最小值, 最大值)，原始点可传 (t, v, v)"""
+    if len(rows) * 2 <= threshold:
+        points = []
+        for t, low, high in rows:
+            points.append((t, low))
+            if high != low:
+                points.append((t, high))
+        return points
+
+    bucket_count = max(1, threshold // 2)
+    bucket_size = len(rows) / bucket_count
+    points = []
+    for bucket in range(bucket_count):
+        chunk = rows[int(bucket * bucket_size):int((bucket + 1) * bucket_size)]
+        if not chunk:
+            continue
+        low_row = min(chunk, key=lambda row: row[1])
+        high_row = max(chunk, key=lambda row: row[2])
+        low_point = (low_row[0], low_row[1])
+        high_point = (high_row[0], high_row[2])
+        points.extend(sorted([low_point, high_point]) if low_point != high_point else [low_point])
+    return points
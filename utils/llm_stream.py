@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import contextvars
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+STREAM_CONNECT_TIMEOUT = 10
+# 流式响应下 read 超时是两个数据块之间的最长间隔，而不是整次生成的总时长
+STREAM_IDLE_TIMEOUT = 60
+# 增量文本按该间隔合并后再推送，避免逐token刷屏
+STREAM_FLUSH_INTERVAL = 0.1
+STREAM_STATS_SIZE = 200
+
+_token_sinks: List[Callable[[str, Dict[str, Any]], None]] = []
+_sinks_lock = threading.Lock()
+_stream_context = contextvars.ContextVar('llm_stream_context', default={})
+_recent_stats = deque(maxlen=STREAM_STATS_SIZE)
+
+
+def add_token_sink(sink: Callable[[str, Dict[str, Any]], None]):
+    """注册流式事件接收端 sink(event, data)，event 为 llm_stream_start / llm_token / llm_stream_end"""
+    with _sinks_lock:
+        _token_sinks.append(sink)
+
+
+def remove_token_sink(sink: Callable[[str, Dict[str, Any]], None]):
+    with _sinks_lock:
+        if sink in _token_sinks:
+            _token_sinks.remove(sink)
+
+
+@contextmanager
+def stream_context(**values):
+    """为当前线程/协程内发起的流式调用附加上下文字段（如 job_id），随事件一起推送"""
+    token = _stream_context.set(dict(_stream_context.get(), **values))
+    try:
+        yield
+    finally:
+        _stream_context.reset(token)
+
+
+def _emit(event: str, data: Dict[str, Any]):
+    with _sinks_lock:
+        sinks = list(_token_sinks)
+    for sink in sinks:
+        try:
+            sink(event, data)
+        except Exception as e:
+            logger.debug(f"流式事件推送失败: {e}")
+
+
+def _extract_delta(line: bytes) -> str:
+    """解析一行 SSE 数据块（已去掉 data: 前缀），返回其中的增量文本"""
+    chunk = json.loads(line)
+    choices = chunk.get('choices') or []
+    if not choices:
+        return ''
+    return (choices[0].get('delta') or {}).get('content') or ''
+
+
+def stream_chat_completion(url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None,
+                           timeout: float = STREAM_IDLE_TIMEOUT, label: str = 'llm', verify: bool = True) -> str:
+    """以 stream=True 调用 OpenAI 兼容的 chat/completions 接口，
+    增量文本实时转发给已注册的接收端，返回拼接后的完整文本，并记录首字延迟（TTFT）"""
+    stream_id = uuid.uuid4().hex[:12]
+    context = dict(_stream_context.get(), stream_id=stream_id, label=label)
+    request_headers = dict(headers or {}, Accept='text/event-stream')
+    parts = []
+    pending = []
+    started = time.monotonic()
+    first_token_at = None
+    last_flush = started
+    error = None
+
+    _emit('llm_stream_start', dict(context, model=payload.get('model')))
+    try:
+        with requests.post(url, json=dict(payload, stream=True), headers=request_headers, stream=True,
+                           timeout=(STREAM_CONNECT_TIMEOUT, timeout), verify=verify) as response:
+            if response.status_code != 200:
+                raise Exception(f"API请求失败，状态码: {response.status_code}, 响应: {response.text}")
+
+            if 'text/event-stream' not in response.headers.get('Content-Type', ''):
+                # 服务端忽略了 stream 参数时按普通响应整体返回
+                content = response.json()["choices"][0]["message"]["content"]
+                first_token_at = time.monotonic()
+                parts.append(content)
+                pending.append(content)
+            else:
+                # chunk_size=None 按到达的数据块读取，避免默认 512 字节缓冲推迟首字
+                for line in response.iter_lines(chunk_size=None):
+                    if not line.startswith(b'data:'):
+                        continue
+                    line = line[5:].strip()
+                    if line == b'[DONE]':
+                        break
+                    delta = _extract_delta(line)
+                    if not delta:
+                        continue
+                    if first_token_at is None:
+                        first_token_at = time.monotonic()
+                    parts.append(delta)
+                    pending.append(delta)
+                    now = time.monotonic()
+                    if now - last_flush >= STREAM_FLUSH_INTERVAL:
+                        _emit('llm_token', dict(context, delta=''.join(pending)))
+                        pending.clear()
+                        last_flush = now
+
+        if pending:
+            _emit('llm_token', dict(context, delta=''.join(pending)))
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        finished = time.monotonic()
+        stats = {
+            'stream_id': stream_id,
+            'label': label,
+            'ttft_ms': round((first_token_at - started) * 1000) if first_token_at else None,
+            'total_ms': round((finished - started) * 1000),
+            'chars': sum(len(part) for part in parts),
+            'error': error,
+            'finished_at': time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        _recent_stats.append(stats)
+        _emit('llm_stream_end', dict(context, **stats))
+        if error:
+            logger.warning(f"⚠️ LLM流式输出 [{label}] 失败: {error}")
+        else:
+            logger.info(f"⚡ LLM流式输出 [{label}] 首字延迟 {stats['ttft_ms']} ms，"
+                        f"总耗时 {stats['total_ms']} ms，共 {stats['chars']} 字")
+
+    return ''.join(parts)
+
+
+def get_stream_stats() -> Dict[str, Any]:
+    """最近若干次流式调用的首字延迟统计"""
+    recent = list(_recent_stats)
+    ttfts = sorted(item['ttft_ms'] for item in recent if item['ttft_ms'] is not None)
+
+    def percentile(ratio: float) -> Optional[int]:
+        if not ttfts:
+            return None
+        return ttfts[min(len(ttfts) - 1, int(len(ttfts) * ratio))]
+
+    return {
+        'count': len(recent),
+        'errors': sum(1 for item in recent if item['error']),
+        'ttft_p50_ms': percentile(0.5),
+        'ttft_p95_ms': percentile(0.95),
+        'recent': recent[-20:]
+    }
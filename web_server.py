@@ -2,24 +2,36 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
+import gzip
 import json
+import mimetypes
+import zlib
 import os
 import sys
-import subprocess
 import time
 import logging
 import glob
-from datetime import datetime, timedelta
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from collections import OrderedDict
 from typing import Dict, Any, Optional
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import threading
-import queue
+import itertools
+from collections import deque
 import signal
 
 import io
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 if sys.platform == "win32":
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
@@ -30,7 +42,16 @@ sys.path.insert(0, project_root)
 
 try:
     from utils.logger import setup_logger
-    from chat_agent import ChatAgent
+    from utils.cron import CronSpec
+    from utils.llm_stream import add_token_sink, stream_context, get_stream_stats
+    from utils.database import get_connection
+    from utils.downsample import lttb, minmax_downsample
+    from services.base.platform_monitoring_service import METRICS_ROLLUP_TABLE
+    from chat_agent import ChatAgent, ChatSession
+    from services.base.log_analysis_service import (detect_file_encoding, is_line_splittable, make_line_decoder,
+                                                    find_rotated_predecessor, read_head_fingerprint,
+                                                    TAIL_HEAD_BYTES)
+    from config.config import SCHEDULED_SERVICES, SCHEDULER_STATE_FILE
 except ImportError as e:
     print(f"导入模块失败: {e}")
 
@@ -45,6 +66,912 @@ app.add_middleware(
 )
 
 
+WS_CLIENT_QUEUE_SIZE = 500
+# 看板数据源（AI报告、调度状态文件）的变更检查间隔，与连接数无关
+DASHBOARD_WATCH_INTERVAL = 2
+
+FILE_SERVE_DIRS = ('services/data', 'data', '.')
+# 小于该大小的文件整体缓存在内存（含压缩版本），更大的文件分块流式发送
+FILE_CACHE_MAX_BYTES = 1024 * 1024
+FILE_CACHE_MAX_ENTRIES = 32
+FILE_STREAM_CHUNK_SIZE = 64 * 1024
+FILE_COMPRESS_MIN_BYTES = 1024
+
+
+class FileCache:
+    """按 (mtime_ns, size) 校验的 LRU 文件缓存，压缩结果按编码惰性生成"""
+
+    def __init__(self, max_entries: int = FILE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path: str, file_stat: os.stat_result) -> Dict[str, Any]:
+        version = (file_stat.st_mtime_ns, file_stat.st_size)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry and entry['version'] == version:
+                self.entries.move_to_end(path)
+                return entry
+
+        with open(path, 'rb') as f:
+            content = f.read()
+        entry = {'version': version, 'content': content, 'encoded': {}}
+        with self.lock:
+            self.entries[path] = entry
+            self.entries.move_to_end(path)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def encode(entry: Dict[str, Any], encoding: str) -> bytes:
+        if encoding not in entry['encoded']:
+            if encoding == 'br':
+                entry['encoded'][encoding] = brotli.compress(entry['content'])
+            else:
+                entry['encoded'][encoding] = gzip.compress(entry['content'], compresslevel=6, mtime=0)
+        return entry['encoded'][encoding]
+
+
+file_cache = FileCache()
+
+
+def resolve_served_file(filename: str) -> Optional[str]:
+    # 只允许纯文件名，避免 ../ 之类的路径穿越
+    if not filename or os.path.basename(filename) != filename or filename in ('.', '..'):
+        return None
+    for directory in FILE_SERVE_DIRS:
+        file_path = os.path.join(project_root, directory, filename)
+        if os.path.isfile(file_path):
+            return file_path
+    return None
+
+
+def file_validators(file_stat: os.stat_result) -> Dict[str, str]:
+    return {
+        'ETag': f'"{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}"',
+        'Last-Modified': formatdate(file_stat.st_mtime, usegmt=True),
+        'Cache-Control': 'no-cache',
+        'Accept-Ranges': 'bytes',
+        'Vary': 'Accept-Encoding'
+    }
+
+
+def is_not_modified(request: Request, headers: Dict[str, str], file_stat: os.stat_result) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or headers['ETag'] in tags
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return int(file_stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def parse_byte_range(range_header: str, file_size: int) -> Optional[tuple]:
+    """解析单个 bytes=start-end 区间，返回 (start, end) 闭区间；无法满足时返回 None"""
+    if not range_header.startswith('bytes=') or ',' in range_header:
+        return None
+    start_text, _, end_text = range_header[6:].strip().partition('-')
+    try:
+        if not start_text:
+            length = int(end_text)
+            if length <= 0:
+                return None
+            start, end = max(0, file_size - length), file_size - 1
+        else:
+            start = int(start_text)
+            end = min(int(end_text), file_size - 1) if end_text else file_size - 1
+    except ValueError:
+        return None
+    if start >= file_size or start > end:
+        return None
+    return start, end
+
+
+def choose_content_encoding(request: Request, allow_brotli: bool = True) -> Optional[str]:
+    accepted = {part.split(';')[0].strip().lower() for part in request.headers.get('accept-encoding', '').split(',')}
+    if allow_brotli and brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def guess_media_type(file_path: str) -> str:
+    media_type = mimetypes.guess_type(file_path)[0] or 'text/plain'
+    if media_type.startswith('text/') or media_type == 'application/json':
+        media_type += '; charset=utf-8'
+    return media_type
+
+
+def iter_file_range(file_path: str, start: int, end: int, chunk_size: int = FILE_STREAM_CHUNK_SIZE):
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def iter_gzip_file(file_path: str, chunk_size: int = FILE_STREAM_CHUNK_SIZE):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in iter_file_range(file_path, 0, os.path.getsize(file_path) - 1, chunk_size):
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+SERVICE_LOG_DIRS = ('logs', 'services/logs', '.')
+SERVICE_LOG_SUFFIX = '.log'
+LOG_WINDOW_DEFAULT_LINES = 200
+LOG_WINDOW_MAX_LINES = 10000
+LOG_READ_BLOCK_SIZE = 256 * 1024
+# 稀疏行号索引的步长：每隔多少行记录一次起始偏移
+LOG_INDEX_STRIDE = 1000
+LOG_FOLLOW_INTERVAL = 1
+
+
+def resolve_service_log(filename: str) -> Optional[str]:
+    if not filename.endswith(SERVICE_LOG_SUFFIX) or os.path.basename(filename) != filename:
+        return None
+    for directory in SERVICE_LOG_DIRS:
+        file_path = os.path.join(project_root, directory, filename)
+        if os.path.isfile(file_path):
+            return file_path
+    return None
+
+
+def get_log_decoder(file_path: str):
+    encoding = detect_file_encoding(file_path)
+    return make_line_decoder(encoding if is_line_splittable(encoding) else 'utf-8')
+
+
+def read_log_lines(file_path: str, offset: int, limit: int, decode) -> tuple:
+    """从字节偏移 offset 起读取至多 limit 个完整行，返回 (行列表, 下一个游标)；末尾未写完的行留到下次"""
+    lines = []
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        carry = b''
+        while len(lines) < limit:
+            block = f.read(LOG_READ_BLOCK_SIZE)
+            if not block:
+                break
+            parts = (carry + block).split(b'\n')
+            carry = parts.pop()
+            for raw_line in parts:
+                lines.append({'offset': offset, 'message': decode(raw_line.rstrip(b'\r'))})
+                offset += len(raw_line) + 1
+                if len(lines) >= limit:
+                    break
+    return lines, offset
+
+
+def read_log_tail(file_path: str, count: int, decode) -> tuple:
+    """从文件末尾反向按块读取最后 count 个完整行，返回 (行列表, 下一个游标)"""
+    with open(file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        buffer = b''
+        end = None
+        while position > 0:
+            read_size = min(LOG_READ_BLOCK_SIZE, position)
+            position -= read_size
+            f.seek(position)
+            buffer = f.read(read_size) + buffer
+            if end is None:
+                last_newline = buffer.rfind(b'\n')
+                if last_newline == -1:
+                    continue
+                end = position + last_newline + 1
+                buffer = buffer[:last_newline + 1]
+            if buffer.count(b'\n') > count:
+                break
+
+    if end is None:
+        return [], 0
+    raw_lines = buffer.split(b'\n')[:-1][-count:]
+    offset = end - sum(len(raw_line) + 1 for raw_line in raw_lines)
+    lines = []
+    for raw_line in raw_lines:
+        lines.append({'offset': offset, 'message': decode(raw_line.rstrip(b'\r'))})
+        offset += len(raw_line) + 1
+    return lines, end
+
+
+class LogLineIndex:
+    """稀疏行号索引：每 LOG_INDEX_STRIDE 行记录一个起始偏移，文件增长时只扫描新增部分"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, identity):
+        self.identity = identity
+        self.checkpoints = [0]
+        self.line_count = 0
+        self.indexed_to = 0
+
+    def update(self, file_stat: os.stat_result):
+        with self.lock:
+            identity = (file_stat.st_dev, file_stat.st_ino)
+            if identity != self.identity or file_stat.st_size < self.indexed_to:
+                self._reset(identity)
+            if file_stat.st_size == self.indexed_to:
+                return
+
+            with open(self.file_path, 'rb') as f:
+                f.seek(self.indexed_to)
+                position = self.indexed_to
+                while True:
+                    block = f.read(LOG_READ_BLOCK_SIZE)
+                    if not block:
+                        break
+                    newlines = block.count(b'\n')
+                    if newlines:
+                        # 只对跨越检查点的块定位具体换行位置，其余块只计数
+                        start = 0
+                        while self.line_count + newlines >= len(self.checkpoints) * LOG_INDEX_STRIDE:
+                            needed = len(self.checkpoints) * LOG_INDEX_STRIDE - self.line_count
+                            newline = self._find_nth_newline(block, start, needed, newlines)
+                            self.checkpoints.append(position + newline + 1)
+                            self.line_count += needed
+                            newlines -= needed
+                            start = newline + 1
+                        self.line_count += newlines
+                        self.indexed_to = position + block.rindex(b'\n') + 1
+                    position += len(block)
+
+    @staticmethod
+    def _find_nth_newline(block: bytes, start: int, nth: int, remaining: int) -> int:
+        # 按块内平均行长估算位置，再用 count 校正并向前/向后逐行微调
+        guess = start + (len(block) - start) * nth // remaining
+        count = block.count(b'\n', start, guess)
+        position = guess
+        if count >= nth:
+            for _ in range(count - nth + 1):
+                position = block.rfind(b'\n', start, position)
+            return position
+        position = guess - 1
+        for _ in range(nth - count):
+            position = block.find(b'\n', position + 1)
+        return position
+
+    def locate(self, line_number: int) -> tuple:
+        """返回 (检查点字节偏移, 还需跳过的行数)"""
+        with self.lock:
+            checkpoint = min(line_number // LOG_INDEX_STRIDE, len(self.checkpoints) - 1)
+            return self.checkpoints[checkpoint], line_number - checkpoint * LOG_INDEX_STRIDE
+
+
+log_line_indexes = {}
+
+
+def get_log_window(file_path: str, since: Optional[int] = None, line: Optional[int] = None,
+                   tail: Optional[int] = None, limit: int = LOG_WINDOW_DEFAULT_LINES,
+                   inode: Optional[int] = None) -> Dict[str, Any]:
+    file_stat = os.stat(file_path)
+    decode = get_log_decoder(file_path)
+    limit = max(1, min(limit, LOG_WINDOW_MAX_LINES))
+    rotated = False
+    result = {}
+
+    if since is not None:
+        # 客户端游标属于旧文件（轮转）或文件被截断时从头读取
+        if (inode is not None and inode != file_stat.st_ino) or since > file_stat.st_size:
+            since, rotated = 0, True
+        lines, cursor = read_log_lines(file_path, since, limit, decode)
+    elif line is not None:
+        index = log_line_indexes.setdefault(file_path, LogLineIndex(file_path))
+        index.update(file_stat)
+        offset, skip = index.locate(max(0, line))
+        skipped, offset = read_log_lines(file_path, offset, skip, decode) if skip else ([], offset)
+        lines, cursor = read_log_lines(file_path, offset, limit, decode)
+        for number, entry in enumerate(lines, start=max(0, line)):
+            entry['line'] = number
+        result['line_count'] = index.line_count
+    else:
+        lines, cursor = read_log_tail(file_path, min(tail or limit, LOG_WINDOW_MAX_LINES), decode)
+
+    result.update({
+        'logs': lines,
+        'cursor': cursor,
+        'inode': file_stat.st_ino,
+        'size': file_stat.st_size,
+        'rotated': rotated,
+        'has_more': cursor < file_stat.st_size and len(lines) >= limit
+    })
+    return result
+
+
+def parse_log_since(value) -> Optional[int]:
+    """客户端传入的字节游标：None 表示从文件末尾开始跟随，其余必须是非负整数"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError("since 必须是整数")
+    since = int(value)
+    if since < 0:
+        raise ValueError("since 不能为负数")
+    return since
+
+
+async def send_log_lines(websocket: WebSocket, filename: str, path: str, cursor: int, size: int,
+                         inode: int, decode, rotated: bool = False) -> int:
+    """把 path 中 cursor 到 size 之间的完整行分批推送给客户端，返回新的游标"""
+    while size > cursor:
+        lines, next_cursor = await asyncio.to_thread(read_log_lines, path, cursor, LOG_WINDOW_MAX_LINES, decode)
+        if next_cursor == cursor:
+            break
+        cursor = next_cursor
+        state.hub.send(websocket, 'service_log', {
+            'file': filename,
+            'logs': lines,
+            'cursor': cursor,
+            'inode': inode,
+            'rotated': rotated
+        })
+        rotated = False
+    return cursor
+
+
+async def follow_service_log(websocket: WebSocket, filename: str, file_path: str, since: Optional[int]):
+    """单个连接对单个日志文件的跟随：按字节游标只读取新增的完整行并推送；
+    轮转时先按 inode 或文件头指纹找回旧文件，补发游标之后的剩余行再切换到新文件"""
+    file_stat = os.stat(file_path)
+    identity = (file_stat.st_dev, file_stat.st_ino)
+    cursor = file_stat.st_size if since is None else min(since, file_stat.st_size)
+    decode = get_log_decoder(file_path)
+    head_hash, head_size = read_head_fingerprint(file_path, min(TAIL_HEAD_BYTES, file_stat.st_size))
+
+    while True:
+        try:
+            file_stat = os.stat(file_path)
+        except FileNotFoundError:
+            await asyncio.sleep(LOG_FOLLOW_INTERVAL)
+            continue
+
+        rotated = (file_stat.st_dev, file_stat.st_ino) != identity or file_stat.st_size < cursor
+        if not rotated and head_size:
+            # copytruncate 后新内容可能已写回到原游标之后，只比较大小会漏判，再核对文件头
+            rotated = read_head_fingerprint(file_path, head_size) != (head_hash, head_size)
+        if rotated:
+            predecessor, rotation = await asyncio.to_thread(find_rotated_predecessor, file_path, {
+                'device': identity[0], 'inode': identity[1], 'offset': cursor,
+                'head_hash': head_hash, 'head_size': head_size
+            })
+            if predecessor:
+                logger.info(f"日志 {filename} 轮转({rotation})，补发旧文件剩余内容: {predecessor}")
+                predecessor_stat = os.stat(predecessor)
+                await send_log_lines(websocket, filename, predecessor, cursor, predecessor_stat.st_size,
+                                     predecessor_stat.st_ino, decode)
+            identity, cursor = (file_stat.st_dev, file_stat.st_ino), 0
+            decode = get_log_decoder(file_path)
+            head_hash, head_size = None, 0
+
+        # 文件头不足指纹长度时随写入补齐，copytruncate 后才能按指纹认出副本
+        if head_size < TAIL_HEAD_BYTES and file_stat.st_size > head_size:
+            head_hash, head_size = read_head_fingerprint(file_path, min(TAIL_HEAD_BYTES, file_stat.st_size))
+
+        cursor = await send_log_lines(websocket, filename, file_path, cursor, file_stat.st_size,
+                                      file_stat.st_ino, decode, rotated)
+        await asyncio.sleep(LOG_FOLLOW_INTERVAL)
+
+
+METRICS_TABLE = 'howso_server_performance_metrics'
+METRICS_COLUMNS = {'cpu': 'cpu_usage', 'memory': 'memory_usage', 'disk': 'disk_usage'}
+METRICS_DEFAULT_SPAN = '24h'
+METRICS_DEFAULT_POINTS = 300
+METRICS_MAX_POINTS = 2000
+METRICS_MAX_IPS = 500
+# SQL 侧先按 points * 该倍数 分桶聚合，传输量只与点数有关，与时间跨度无关
+METRICS_PREAGG_FACTOR = 4
+METRICS_ROLLUP_BUCKET_SECONDS = 3600
+METRICS_CACHE_TTL = 60
+METRICS_CACHE_MAX_ENTRIES = 64
+METRICS_SPAN_UNITS = {'m': 60, 'h': 3600, 'd': 86400}
+
+
+class MetricsCache:
+    """降采样结果的 LRU + TTL 缓存；结束时间按桶宽对齐，反复查看同一时段时命中"""
+
+    def __init__(self, max_entries: int = METRICS_CACHE_MAX_ENTRIES, ttl: float = METRICS_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry or time.monotonic() - entry[0] > self.ttl:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value: Dict[str, Any]):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+metrics_cache = MetricsCache()
+metrics_rollup_start = {'checked_at': 0.0, 'value': None}
+
+
+def parse_metric_range(start: Optional[str], end: Optional[str], span: Optional[str]):
+    """返回 (开始, 结束) 的 epoch 秒；未指定 end 表示截至当前"""
+    end_ts = datetime.strptime(end, "%Y-%m-%d %H:%M:%S").timestamp() if end else time.time()
+    if start:
+        start_ts = datetime.strptime(start, "%Y-%m-%d %H:%M:%S").timestamp()
+    else:
+        span = (span or METRICS_DEFAULT_SPAN).strip().lower()
+        if span[-1:] not in METRICS_SPAN_UNITS or not span[:-1].isdigit():
+            raise ValueError(f"无效的时间跨度: {span}，示例: 30m、24h、7d")
+        start_ts = end_ts - int(span[:-1]) * METRICS_SPAN_UNITS[span[-1]]
+    if start_ts >= end_ts:
+        raise ValueError("开始时间必须早于结束时间")
+    return start_ts, end_ts
+
+
+def get_rollup_start(cursor) -> Optional[float]:
+    """小时聚合表最早的桶时间，表不存在返回 None；结果缓存一段时间避免每次查询"""
+    if time.monotonic() - metrics_rollup_start['checked_at'] < METRICS_CACHE_TTL:
+        return metrics_rollup_start['value']
+    value = None
+    cursor.execute(f"SHOW TABLES LIKE '{METRICS_ROLLUP_TABLE}'")
+    if cursor.fetchone():
+        cursor.execute(f"SELECT UNIX_TIMESTAMP(MIN(bucket_time)) AS first_bucket FROM {METRICS_ROLLUP_TABLE}")
+        row = cursor.fetchone()
+        value = float(row['first_bucket']) if row and row['first_bucket'] is not None else None
+    metrics_rollup_start.update(checked_at=time.monotonic(), value=value)
+    return value
+
+
+def query_metric_buckets(metric: str, ips: Optional[list], start_ts: float, end_ts: float, bucket_seconds: int):
+    """在数据库侧按桶聚合，返回 ({ip: [(ts, avg, min, max), ...]}, 数据来源, 实际桶宽)"""
+    column = METRICS_COLUMNS[metric]
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            rollup_start = get_rollup_start(cursor)
+            # 每个输出点覆盖1小时以上且聚合表覆盖了整个区间时读小时聚合表
+            use_rollup = bucket_seconds * METRICS_PREAGG_FACTOR >= METRICS_ROLLUP_BUCKET_SECONDS
+            if use_rollup and rollup_start is not None and rollup_start <= start_ts:
+                bucket_seconds = max(bucket_seconds, METRICS_ROLLUP_BUCKET_SECONDS)
+                source, table, time_column = 'rollup', METRICS_ROLLUP_TABLE, 'bucket_time'
+                aggregates = (f"SUM({metric}_sum) / SUM({metric}_count) AS avg_value, "
+                              f"MIN({metric}_min) AS min_value, MAX({metric}_max) AS max_value")
+                condition = f"{metric}_count > 0"
+            else:
+                source, table, time_column = 'raw', METRICS_TABLE, 'collect_time'
+                aggregates = f"AVG({column}) AS avg_value, MIN({column}) AS min_value, MAX({column}) AS max_value"
+                condition = f"{column} IS NOT NULL"
+
+            params = [bucket_seconds, datetime.fromtimestamp(start_ts), datetime.fromtimestamp(end_ts)]
+            ip_filter = ""
+            if ips:
+                ip_filter = f"AND ip IN ({', '.join(['%s'] * len(ips))})"
+                params.extend(ips)
+            cursor.execute(f"""
+                SELECT ip,
+                       FLOOR(UNIX_TIMESTAMP({time_column}) / %s) AS bucket,
+                       MIN(UNIX_TIMESTAMP({time_column})) AS bucket_ts,
+                       {aggregates}
+                FROM {table}
+                WHERE {time_column} BETWEEN %s AND %s AND {condition} {ip_filter}
+                GROUP BY ip, bucket
+                ORDER BY ip, bucket
+                """, params)
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    series = {}
+    for row in rows:
+        series.setdefault(row['ip'], []).append(
+            (float(row['bucket_ts']), float(row['avg_value']), float(row['min_value']), float(row['max_value'])))
+    return series, source, bucket_seconds
+
+
+def get_metric_series(metric: str, ips: Optional[list], start: Optional[str], end: Optional[str],
+                      span: Optional[str], points: int, method: str) -> Dict[str, Any]:
+    start_ts, end_ts = parse_metric_range(start, end, span)
+    bucket_seconds = max(1, int((end_ts - start_ts) / (points * METRICS_PREAGG_FACTOR)))
+    if not end:
+        # 截至当前的查询把起止对齐到桶边界，同一桶内的重复请求命中缓存
+        end_ts = (int(end_ts) // bucket_seconds + 1) * bucket_seconds
+        start_ts = (int(start_ts) // bucket_seconds + 1) * bucket_seconds
+
+    cache_key = (metric, tuple(ips or ()), int(start_ts), int(end_ts), points, method)
+    cached = metrics_cache.get(cache_key)
+    if cached:
+        return dict(cached, cached=True)
+
+    buckets, source, bucket_seconds = query_metric_buckets(metric, ips, start_ts, end_ts, bucket_seconds)
+    if len(buckets) > METRICS_MAX_IPS:
+        buckets = dict(sorted(buckets.items())[:METRICS_MAX_IPS])
+
+    series = {}
+    for ip, rows in buckets.items():
+        if method == 'minmax':
+            sampled = minmax_downsample([(ts, low, high) for ts, _, low, high in rows], points)
+        else:
+            sampled = lttb([(ts, avg) for ts, avg, _, _ in rows], points)
+        # [毫秒时间戳, 值] 的紧凑数组，减小载荷
+        series[ip] = [[int(ts * 1000), round(value, 2)] for ts, value in sampled]
+
+    result = {
+        'metric': metric,
+        'method': method,
+        'source': source,
+        'start': datetime.fromtimestamp(start_ts).strftime("%Y-%m-%d %H:%M:%S"),
+        'end': datetime.fromtimestamp(end_ts).strftime("%Y-%m-%d %H:%M:%S"),
+        'bucket_seconds': bucket_seconds,
+        'points': points,
+        'series': series
+    }
+    metrics_cache.put(cache_key, result)
+    return dict(result, cached=False)
+
+
+SUPERVISOR_RESTART_BACKOFF = (1, 2, 5, 10, 30, 60)
+# 子进程连续运行超过该时长视为稳定，重启退避从头计算
+SUPERVISOR_STABLE_SECONDS = 60
+SUPERVISOR_STOP_TIMEOUT = 5
+SUPERVISOR_SAMPLE_INTERVAL = 5
+SUPERVISOR_READ_LIMIT = 1024 * 1024
+PROC_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PROC_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def read_proc_usage(pid: int) -> Optional[Dict[str, float]]:
+    """从 /proc 读取进程累计CPU时间（秒）和常驻内存（字节），非 Linux 返回 None"""
+    try:
+        with open(f"/proc/{pid}/stat", 'r') as f:
+            # comm 字段可能包含空格，从最后一个右括号之后开始切分
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f"/proc/{pid}/statm", 'r') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return {
+        'cpu_seconds': (int(fields[11]) + int(fields[12])) / PROC_CLOCK_TICKS,
+        'rss_bytes': resident_pages * PROC_PAGE_SIZE
+    }
+
+
+class ProcessSupervisor:
+    """asyncio 子进程守护：非阻塞读取输出、异常退出按退避重启、周期采样CPU和内存"""
+
+    def __init__(self, name: str, script: str):
+        self.name = name
+        self.script = script
+        self.process = None
+        self.task = None
+        self.stopping = False
+        self.restarts = 0
+        self.started_at = None
+        self.last_exit_code = None
+        self.next_restart_at = None
+        self.usage = {}
+
+    @property
+    def service(self) -> Dict[str, Any]:
+        return state.services[self.name]
+
+    async def start(self):
+        if self.task and not self.task.done():
+            return
+        self.stopping = False
+        self.restarts = 0
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self.stopping = True
+        process = self.process
+        if process and process.returncode is None:
+            logger.info(f"终止进程: {self.name}")
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), timeout=SUPERVISOR_STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"强制杀死进程: {self.name}")
+                process.kill()
+                await process.wait()
+        if self.task:
+            # 处于重启退避等待中的任务直接取消
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        self._set_stopped('stopped')
+
+    def terminate_now(self):
+        """供信号处理等同步场景使用，只发送终止信号"""
+        self.stopping = True
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+
+    async def _run(self):
+        backoff_index = 0
+        while not self.stopping:
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable, self.script,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+                cwd=project_root, limit=SUPERVISOR_READ_LIMIT
+            )
+            self.started_at = time.time()
+            self.next_restart_at = None
+            self.service['process'] = self.process
+            self.service['running'] = True
+            logger.info(f"{self.name} 子进程已启动，PID {self.process.pid}")
+            state.hub.publish('service_status', {'service': self.name, 'status': 'started', 'running': True,
+                                                 'pid': self.process.pid, 'restarts': self.restarts})
+
+            sampler = asyncio.create_task(self._sample_usage(self.process))
+            try:
+                await self._pump_output(self.process)
+                self.last_exit_code = await self.process.wait()
+            finally:
+                sampler.cancel()
+
+            if self.stopping:
+                break
+
+            uptime = time.time() - self.started_at
+            if self.last_exit_code == 0:
+                # 正常退出不是崩溃，不进入重启退避
+                logger.info(f"服务 {self.name} 进程正常退出，运行 {uptime:.0f}s，不再重启")
+                self._set_stopped('exited')
+                break
+
+            if uptime >= SUPERVISOR_STABLE_SECONDS:
+                backoff_index = 0
+            delay = SUPERVISOR_RESTART_BACKOFF[min(backoff_index, len(SUPERVISOR_RESTART_BACKOFF) - 1)]
+            backoff_index += 1
+            self.restarts += 1
+            self.next_restart_at = time.time() + delay
+
+            logger.warning(f"服务 {self.name} 进程异常退出，返回码 {self.last_exit_code}，"
+                           f"运行 {uptime:.0f}s，{delay}s 后第 {self.restarts} 次重启")
+            self._set_stopped('exited', restart_in=delay)
+            await asyncio.sleep(delay)
+
+    async def _pump_output(self, process):
+        while True:
+            try:
+                raw_line = await process.stdout.readline()
+            except ValueError:
+                # 单行超过读取上限时按块读出，避免阻塞管道
+                raw_line = await process.stdout.read(SUPERVISOR_READ_LIMIT)
+            if not raw_line:
+                break
+            line = raw_line.decode('utf-8', errors='replace').strip()
+            if line:
+                state.hub.publish('log', service=self.name, message=line)
+                state.add_chat_log('log', f"[{self.name}] {line}")
+
+    async def _sample_usage(self, process):
+        previous = None
+        while process.returncode is None:
+            sample = read_proc_usage(process.pid)
+            if sample is None:
+                return
+            now = time.monotonic()
+            if previous:
+                elapsed = now - previous[0]
+                cpu_percent = (sample['cpu_seconds'] - previous[1]['cpu_seconds']) / elapsed * 100 if elapsed > 0 else 0.0
+                self.usage = {
+                    'cpu_percent': round(cpu_percent, 1),
+                    'rss_mb': round(sample['rss_bytes'] / 1024 / 1024, 1),
+                    'cpu_seconds': round(sample['cpu_seconds'], 2),
+                    'sampled_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                }
+            previous = (now, sample)
+            await asyncio.sleep(SUPERVISOR_SAMPLE_INTERVAL)
+
+    def _set_stopped(self, status: str, **extra):
+        self.process = None
+        self.usage = {}
+        self.service['process'] = None
+        was_running = self.service['running']
+        self.service['running'] = False
+        if was_running or extra:
+            state.hub.publish('service_status', dict({'service': self.name, 'status': status, 'running': False,
+                                                      'exit_code': self.last_exit_code}, **extra))
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'running': self.service['running'],
+            'pid': self.process.pid if self.process else None,
+            'uptime_seconds': round(time.time() - self.started_at, 1) if self.process and self.started_at else None,
+            'restarts': self.restarts,
+            'last_exit_code': self.last_exit_code,
+            'next_restart_in': round(max(0.0, self.next_restart_at - time.time()), 1) if self.next_restart_at else None,
+            'usage': self.usage
+        }
+
+
+CHAT_LOG_CAPACITY = 200
+CHAT_LOG_PAGE_LIMIT = 500
+# 设为 None 则只保留内存环形缓冲；落盘文件超过上限时轮转为 .1
+CHAT_LOG_SPILL_FILE = 'data/chat_logs.jsonl'
+CHAT_LOG_SPILL_MAX_BYTES = 5 * 1024 * 1024
+
+
+class ChatLogBuffer:
+    """固定容量的聊天日志环形缓冲，每条记录带单调递增的 seq，客户端按游标增量拉取"""
+
+    def __init__(self, capacity: int = CHAT_LOG_CAPACITY, spill_file: Optional[str] = None,
+                 spill_max_bytes: int = CHAT_LOG_SPILL_MAX_BYTES):
+        self.entries = deque(maxlen=capacity)
+        self.last_seq = 0
+        self.lock = threading.Lock()
+        self.spill_file = spill_file
+        self.spill_max_bytes = spill_max_bytes
+        self.spill_handle = None
+        if spill_file:
+            self._restore()
+
+    def _restore(self):
+        try:
+            os.makedirs(os.path.dirname(self.spill_file), exist_ok=True)
+            if os.path.exists(self.spill_file):
+                with open(self.spill_file, 'r', encoding='utf-8') as f:
+                    for line in deque(f, maxlen=self.entries.maxlen):
+                        try:
+                            self.entries.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            continue
+                if self.entries:
+                    self.last_seq = self.entries[-1]['seq']
+            self.spill_handle = open(self.spill_file, 'a', encoding='utf-8')
+        except Exception as e:
+            print(f"[警告] 聊天日志落盘不可用: {e}")
+            self.spill_handle = None
+
+    def _spill(self, entry: Dict[str, Any]):
+        if not self.spill_handle:
+            return
+        try:
+            self.spill_handle.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.spill_handle.flush()
+            if self.spill_handle.tell() > self.spill_max_bytes:
+                self.spill_handle.close()
+                os.replace(self.spill_file, f"{self.spill_file}.1")
+                self.spill_handle = open(self.spill_file, 'a', encoding='utf-8')
+                # 新文件先写入当前缓冲，保证重启后仍能恢复完整窗口
+                for buffered in self.entries:
+                    self.spill_handle.write(json.dumps(buffered, ensure_ascii=False) + '\n')
+                self.spill_handle.flush()
+        except Exception:
+            self.spill_handle = None
+
+    def append(self, message_type: str, content: str) -> Dict[str, Any]:
+        with self.lock:
+            self.last_seq += 1
+            entry = {
+                'seq': self.last_seq,
+                'type': message_type,
+                'content': content,
+                'timestamp': datetime.now().strftime("%H:%M:%S")
+            }
+            self.entries.append(entry)
+            self._spill(entry)
+        return entry
+
+    def since(self, cursor: int = 0, limit: int = CHAT_LOG_PAGE_LIMIT) -> Dict[str, Any]:
+        with self.lock:
+            # 游标超过当前序号说明服务端已重启且未落盘，从头返回
+            reset = cursor > self.last_seq
+            if reset:
+                cursor = 0
+            first_seq = self.entries[0]['seq'] if self.entries else self.last_seq + 1
+            # seq 连续递增，可直接按偏移定位而无需扫描
+            start = max(0, cursor - first_seq + 1)
+            logs = list(itertools.islice(self.entries, start, start + limit))
+            last_seq = self.last_seq
+        return {
+            'logs': logs,
+            'cursor': logs[-1]['seq'] if logs else cursor,
+            'last_seq': last_seq,
+            'truncated': cursor + 1 < first_seq,
+            'reset': reset,
+            'has_more': bool(logs) and logs[-1]['seq'] < last_seq
+        }
+
+    def close(self):
+        if self.spill_handle:
+            self.spill_handle.close()
+            self.spill_handle = None
+
+
+class EventHub:
+    """WebSocket 事件扇出：每个客户端一个有界 asyncio.Queue，慢客户端丢弃最旧事件"""
+
+    def __init__(self, queue_size: int = WS_CLIENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers = {}
+        self.loop = None
+
+    def subscribe(self, websocket: WebSocket) -> Dict[str, Any]:
+        self.loop = asyncio.get_running_loop()
+        subscriber = {'queue': asyncio.Queue(maxsize=self.queue_size), 'dropped': 0}
+        self.subscribers[websocket] = subscriber
+        return subscriber
+
+    def unsubscribe(self, websocket: WebSocket):
+        self.subscribers.pop(websocket, None)
+
+    def publish(self, message_type: str, data: Any = None, **fields):
+        """可在任意线程调用；消息只序列化一次，在事件循环线程中扇出"""
+        if not self.subscribers or self.loop is None:
+            return
+        event = {'type': message_type, 'timestamp': datetime.now().isoformat()}
+        if data is not None:
+            event['data'] = data
+        event.update(fields)
+        message = json.dumps(event, ensure_ascii=False)
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self.loop:
+            self._fan_out(message)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._fan_out, message)
+
+    def send(self, websocket: WebSocket, message_type: str, data: Any):
+        """只投递给单个订阅者（须在事件循环线程调用），同样遵循丢弃最旧的背压策略"""
+        subscriber = self.subscribers.get(websocket)
+        if subscriber:
+            self._enqueue(subscriber, json.dumps({
+                'type': message_type,
+                'data': data,
+                'timestamp': datetime.now().isoformat()
+            }, ensure_ascii=False))
+
+    def _fan_out(self, message: str):
+        for subscriber in list(self.subscribers.values()):
+            self._enqueue(subscriber, message)
+
+    @staticmethod
+    def _enqueue(subscriber: Dict[str, Any], message: str):
+        client_queue = subscriber['queue']
+        if client_queue.full():
+            client_queue.get_nowait()
+            subscriber['dropped'] += 1
+        client_queue.put_nowait(message)
+
+    async def pump(self, websocket: WebSocket, subscriber: Dict[str, Any]):
+        client_queue = subscriber['queue']
+        try:
+            while True:
+                message = await client_queue.get()
+                if subscriber['dropped']:
+                    dropped, subscriber['dropped'] = subscriber['dropped'], 0
+                    await websocket.send_text(json.dumps({'type': 'dropped', 'count': dropped}))
+                await websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # 发送失败说明连接已断开，由接收循环负责清理订阅
+            pass
+
+
 class ChatLogHandler(logging.Handler):
     def __init__(self, state):
         super().__init__()
@@ -53,17 +980,282 @@ class ChatLogHandler(logging.Handler):
     def emit(self, record):
         try:
             log_message = self.format(record)
-            self.state.add_chat_log('log', f"[{record.name}] {log_message}")
-            if self.state.websocket_connections:
-                asyncio.create_task(self.state.broadcast_message('chat_message', {
-                    'type': 'log',
-                    'content': f"[{record.name}] {log_message}",
-                    'timestamp': datetime.now().strftime("%H:%M:%S")
-                }))
+            entry = self.state.add_chat_log('log', f"[{record.name}] {log_message}")
+            self.state.hub.publish('chat_message', entry)
         except Exception:
             pass
 
 
+# 跨会话的并发上限；写同一批巡检文件的服务由 TaskExecutor 的工具锁串行化
+CHAT_WORKER_COUNT = 4
+CHAT_MAX_PENDING_JOBS = 50
+CHAT_JOB_RETENTION = 200
+CHAT_MAX_SESSIONS = 200
+CHAT_SESSION_IDLE_SECONDS = 1800
+CHAT_DEFAULT_SESSION = 'default'
+
+
+class ChatJobManager:
+    """聊天请求在独立工作线程中执行（每个任务有自己的事件循环），
+    SSH、数据库和LLM等阻塞调用不会卡住Web事件循环；进度和结果通过事件中心推送。
+    每个客户端会话有自己的对话上下文，同一会话内的请求按提交顺序依次执行"""
+
+    def __init__(self, state, max_workers: int = CHAT_WORKER_COUNT, max_pending: int = CHAT_MAX_PENDING_JOBS):
+        self.state = state
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chat-worker')
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.jobs = OrderedDict()
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        self.agent_lock = threading.Lock()
+
+    def submit(self, user_input: str, session_id: str = CHAT_DEFAULT_SESSION) -> Optional[Dict[str, Any]]:
+        """提交任务并立即返回任务信息，排队任务过多时返回 None"""
+        with self.lock:
+            pending = sum(1 for job in self.jobs.values() if job['status'] in ('queued', 'running'))
+            if pending >= self.max_pending:
+                return None
+            entry = self._get_session(session_id)
+            job = {
+                'job_id': uuid.uuid4().hex[:12],
+                'session_id': session_id,
+                'status': 'queued',
+                'stage': 'queued',
+                'message': "等待本会话上一条请求完成" if entry['active'] else "排队中",
+                'input': user_input,
+                'submitted_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'started_at': None,
+                'finished_at': None,
+                'response': None,
+                'error': None
+            }
+            self.jobs[job['job_id']] = job
+            self._trim()
+            snapshot = dict(job)
+            dispatch = entry['active'] is None
+            if dispatch:
+                entry['active'] = job['job_id']
+            else:
+                entry['pending'].append(job['job_id'])
+
+        self._publish(snapshot)
+        if dispatch:
+            self.executor.submit(self._run, job['job_id'], user_input, entry)
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def get_status(self) -> Dict[str, Any]:
+        with self.lock:
+            statuses = [job['status'] for job in self.jobs.values()]
+            return {
+                'max_workers': self.max_workers,
+                'running': statuses.count('running'),
+                'queued': statuses.count('queued'),
+                'sessions': [{
+                    'session_id': session_id,
+                    'turns': len(entry['session'].history),
+                    'active_job': entry['active'],
+                    'pending_jobs': len(entry['pending']),
+                    'idle_seconds': round(time.time() - entry['session'].last_active, 1)
+                } for session_id, entry in self.sessions.items()]
+            }
+
+    def get_agent(self):
+        with self.agent_lock:
+            if not self.state.chat_agent:
+                logger.info("初始化Chat代理")
+                self.state.chat_agent = ChatAgent()
+            return self.state.chat_agent
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_session(self, session_id: str) -> Dict[str, Any]:
+        entry = self.sessions.get(session_id)
+        if entry:
+            entry['session'].last_active = time.time()
+            self.sessions.move_to_end(session_id)
+            return entry
+
+        self._evict_sessions()
+        entry = {'session': ChatSession(session_id), 'active': None, 'pending': deque()}
+        self.sessions[session_id] = entry
+        return entry
+
+    def _evict_sessions(self):
+        # 按最近活跃排序，淘汰空闲超时或超出上限的会话，有任务在跑的会话保留
+        now = time.time()
+        overflow = len(self.sessions) - CHAT_MAX_SESSIONS + 1
+        for session_id, entry in list(self.sessions.items()):
+            busy = entry['active'] or entry['pending']
+            if not busy and (overflow > 0 or now - entry['session'].last_active > CHAT_SESSION_IDLE_SECONDS):
+                del self.sessions[session_id]
+                overflow -= 1
+
+    def _run(self, job_id: str, user_input: str, entry: Dict[str, Any]):
+        try:
+            self._execute(job_id, user_input, entry['session'])
+        finally:
+            self._dispatch_next(entry)
+
+    def _dispatch_next(self, entry: Dict[str, Any]):
+        with self.lock:
+            entry['active'] = entry['pending'].popleft() if entry['pending'] else None
+            next_job = self.jobs.get(entry['active']) if entry['active'] else None
+            next_input = next_job['input'] if next_job else None
+        if next_job:
+            self.executor.submit(self._run, entry['active'], next_input, entry)
+
+    def _execute(self, job_id: str, user_input: str, session):
+        self._update(job_id, status='running', stage='starting', message="开始处理",
+                     started_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        try:
+            agent = self.get_agent()
+            logger.info(f"开始处理用户请求 [{session.session_id}/{job_id}]")
+            with stream_context(job_id=job_id, session_id=session.session_id):
+                response = asyncio.run(agent.process_user_input(
+                    user_input, progress=lambda stage, message: self._update(job_id, stage=stage, message=message),
+                    session=session))
+            logger.info(f"用户请求处理完成 [{session.session_id}/{job_id}]")
+        except Exception as e:
+            error_msg = f"Chat处理失败: {str(e)}"
+            logger.error(error_msg)
+            self.state.hub.publish('chat_message', self.state.add_chat_log('error', error_msg))
+            self._update(job_id, status='failed', stage='failed', message=error_msg, error=str(e),
+                         finished_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            return
+
+        self.state.hub.publish('chat_message', self.state.add_chat_log('assistant', response))
+        self._update(job_id, status='done', stage='done', message="处理完成", response=response,
+                     finished_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+    def _update(self, job_id: str, **changes):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return
+            job.update(changes)
+            snapshot = dict(job)
+        self._publish(snapshot)
+
+    def _publish(self, job: Dict[str, Any]):
+        # 回复正文已经作为 chat_message 推送，进度事件只带状态字段
+        self.state.hub.publish('chat_job', {key: value for key, value in job.items() if key not in ('input', 'response')})
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job['status'] in ('done', 'failed')]
+        for job_id in finished[:max(0, len(self.jobs) - CHAT_JOB_RETENTION)]:
+            del self.jobs[job_id]
+
+
+def benchmark_chat_sessions(session_count: int = 40, turns: int = 3, llm_delay: float = 0.3,
+                            tool_delay: float = 0.1, max_loop_lag_ms: float = 100) -> Dict[str, Any]:
+    """多会话并发压测：替换 LLM 流式调用和 MCP 请求为定时桩，校验同一会话内按顺序执行、
+    硬件类工具（同一把锁）不会并发，以及 Web 事件循环在满载时的响应延迟"""
+    import re
+    import types
+    import contextlib
+    import statistics
+    import chat_agent as chat_agent_module
+
+    events = {}
+    hardware = {'active': 0, 'max': 0}
+    guard = threading.Lock()
+
+    def fake_stream(url, payload, headers=None, timeout=60, label='llm', verify=True):
+        prompt = payload['messages'][-1]['content']
+        session_id, turn = re.search(r'用户需求: "会话(\d+) 第(\d+)轮', prompt).groups()
+        with guard:
+            events.setdefault(session_id, []).append(('llm', int(turn)))
+        time.sleep(llm_delay)
+        tool = 'service_002_memory_inspection' if int(session_id) % 3 == 0 else 'service_006_log_analysis'
+        return json.dumps({'final_decision': {
+            'intent': '压测', 'matched_service': tool, 'confidence': 0.9,
+            'execution_plan': [{'tool': tool, 'params': {'session': session_id, 'turn': int(turn)}, 'order': 1}]
+        }}, ensure_ascii=False)
+
+    async def fake_handle_request(request_data: str) -> str:
+        params = json.loads(request_data)['params']
+        locked = chat_agent_module.TOOL_LOCK_GROUPS.get(params['name']) == 'hardware'
+        with guard:
+            events[params['arguments']['session']].append(('tool', params['arguments']['turn']))
+            if locked:
+                hardware['active'] += 1
+                hardware['max'] = max(hardware['max'], hardware['active'])
+        time.sleep(tool_delay)
+        if locked:
+            with guard:
+                hardware['active'] -= 1
+        return json.dumps({'success': True, 'data': {'message': 'ok'}, 'error': None, 'id': None})
+
+    original_stream = chat_agent_module.stream_chat_completion
+    chat_agent_module.stream_chat_completion = fake_stream
+    logging.disable(logging.CRITICAL)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent = ChatAgent()
+            agent.executor.mcp_server.handle_request = fake_handle_request
+            bench_state = types.SimpleNamespace(chat_agent=agent, hub=EventHub(),
+                                                add_chat_log=lambda message_type, content: None)
+            manager = ChatJobManager(bench_state, max_pending=session_count * turns)
+
+            async def run():
+                lags = []
+                start = time.time()
+                job_ids = []
+                for turn in range(turns):
+                    for session in range(session_count):
+                        job = manager.submit(f"会话{session} 第{turn}轮", f"bench-{session}")
+                        job_ids.append(job['job_id'])
+
+                deadline = start + (llm_delay + tool_delay) * len(job_ids) + 60
+                while time.time() < deadline:
+                    tick = time.perf_counter()
+                    await asyncio.sleep(0.01)
+                    lags.append((time.perf_counter() - tick - 0.01) * 1000)
+                    if all(manager.get(job_id)['status'] in ('done', 'failed') for job_id in job_ids):
+                        break
+                return job_ids, lags, time.time() - start
+
+            job_ids, lags, elapsed = asyncio.run(run())
+            status = manager.get_status()
+            manager.shutdown()
+    finally:
+        chat_agent_module.stream_chat_completion = original_stream
+        logging.disable(logging.NOTSET)
+
+    jobs = [manager.get(job_id) for job_id in job_ids]
+    expected = [(stage, turn) for turn in range(turns) for stage in ('llm', 'tool')]
+    out_of_order = [session_id for session_id, sequence in events.items() if sequence != expected]
+    result = {
+        'jobs': len(jobs),
+        'done': sum(1 for job in jobs if job['status'] == 'done'),
+        'seconds': round(elapsed, 2),
+        'serial_seconds': round((llm_delay + tool_delay) * len(jobs), 2),
+        'loop_lag_p50_ms': round(statistics.median(lags), 1),
+        'loop_lag_max_ms': round(max(lags), 1),
+        'hardware_max_concurrent': hardware['max'],
+        'out_of_order_sessions': out_of_order,
+        'session_turns': sorted({entry['turns'] for entry in status['sessions']})
+    }
+
+    print(f"    📊 {result['done']}/{result['jobs']} 个任务完成，耗时 {result['seconds']}s（串行约 {result['serial_seconds']}s）")
+    print(f"    ⏱️ 事件循环延迟 p50 {result['loop_lag_p50_ms']} ms，最大 {result['loop_lag_max_ms']} ms")
+    print(f"    🔒 硬件类工具最大并发 {result['hardware_max_concurrent']}，乱序会话 {len(out_of_order)} 个")
+
+    assert result['done'] == result['jobs'], f"有任务未完成: {result['jobs'] - result['done']}"
+    assert not out_of_order, f"会话内执行顺序错乱: {out_of_order}"
+    assert hardware['max'] <= 1, f"硬件类工具出现并发: {hardware['max']}"
+    assert result['session_turns'] == [turns], f"会话历史轮数异常: {result['session_turns']}"
+    assert result['loop_lag_max_ms'] <= max_loop_lag_ms, f"事件循环延迟过高: {result['loop_lag_max_ms']} ms"
+    return result
+
+
 class SystemState:
     def __init__(self):
         self.services = {
@@ -71,14 +1263,19 @@ class SystemState:
             'scheduler': {'running': False, 'process': None},
             'chat': {'running': False, 'agent': None}
         }
-        self.websocket_connections = []
-        self.log_queues = {
-            'mcp': queue.Queue(),
-            'scheduler': queue.Queue(),
-            'chat': queue.Queue()
+        self.hub = EventHub()
+        self.supervisors = {
+            'mcp': ProcessSupervisor('mcp', 'run_server.py'),
+            'scheduler': ProcessSupervisor('scheduler', 'chat_scheduler.py')
         }
+        self.dashboard_watcher = None
         self.chat_agent = None
-        self.chat_logs = []
+        self.chat_jobs = ChatJobManager(self)
+        # 本进程内的LLM流式输出（聊天任务触发的服务）逐段推送到前端
+        add_token_sink(self.hub.publish)
+        self.chat_logs = ChatLogBuffer(
+            spill_file=os.path.join(project_root, CHAT_LOG_SPILL_FILE) if CHAT_LOG_SPILL_FILE else None
+        )
         self.setup_global_logging()
 
     def setup_global_logging(self):
@@ -93,30 +1290,10 @@ class SystemState:
             logger.addHandler(chat_handler)
 
     async def broadcast_message(self, message_type: str, data: Any):
-        if self.websocket_connections:
-            message = json.dumps({
-                'type': message_type,
-                'data': data,
-                'timestamp': datetime.now().isoformat()
-            })
-            active_connections = []
-            for websocket in self.websocket_connections:
-                try:
-                    await websocket.send_text(message)
-                    active_connections.append(websocket)
-                except:
-                    pass
-            self.websocket_connections = active_connections
-
-    def add_chat_log(self, message_type: str, content: str):
-        log_entry = {
-            'type': message_type,
-            'content': content,
-            'timestamp': datetime.now().strftime("%H:%M:%S")
-        }
-        self.chat_logs.append(log_entry)
-        if len(self.chat_logs) > 200:
-            self.chat_logs = self.chat_logs[-150:]
+        self.hub.publish(message_type, data)
+
+    def add_chat_log(self, message_type: str, content: str) -> Dict[str, Any]:
+        return self.chat_logs.append(message_type, content)
 
 
 state = SystemState()
@@ -126,37 +1303,63 @@ static_dir = os.path.join(project_root, "static")
 if not os.path.exists(static_dir):
     os.makedirs(static_dir)
 
-SCHEDULED_TASKS = {
-    '005': {'times': ['10:15', '15:15'], 'name': '完整巡检流程'},
-    '007': {'times': ['10:10', '15:10'], 'name': '日报生成'},
-    '008': {'times': ['monday-08:00'], 'name': '周报生成'},
-    '009': {'times': ['09:55', '14:55'], 'name': '服务监控检查'},
-    '010': {'times': ['09:58', '14:58'], 'name': '平台性能监控'}
+SCHEDULED_SPECS = {
+    service_id: [CronSpec(expression) for expression in config.get('cron', [])]
+    for service_id, config in SCHEDULED_SERVICES.items()
 }
+# 事件触发的服务没有自己的cron，按上游的下一次触发时间估算
+for service_id, config in SCHEDULED_SERVICES.items():
+    if 'after' in config:
+        SCHEDULED_SPECS[service_id] = SCHEDULED_SPECS.get(config['after']['service'], [])
 
 
-def calculate_next_execution(time_str: str) -> datetime:
-    now = datetime.now()
+def get_schedule_snapshot() -> Dict[str, Any]:
+    """调度器运行时读取其定时器堆快照，否则按配置的cron表达式计算"""
+    state_file = os.path.join(project_root, SCHEDULER_STATE_FILE)
+    if state.services['scheduler']['running'] and os.path.exists(state_file):
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            now = datetime.now()
+            for job in snapshot['jobs']:
+                next_time = datetime.strptime(job['next_execution'], "%Y-%m-%d %H:%M:%S")
+                job['seconds_until'] = max(0, int((next_time - now).total_seconds()))
+            if all(job['seconds_until'] > 0 for job in snapshot['jobs']):
+                snapshot['source'] = 'scheduler'
+                return snapshot
+        except Exception as e:
+            logger.warning(f"读取调度状态失败: {e}")
 
-    if time_str.startswith('monday-'):
-        time_part = time_str.split('-')[1]
-        hour, minute = map(int, time_part.split(':'))
-        days_ahead = 0 - now.weekday()
-        if days_ahead <= 0:
-            days_ahead += 7
-        next_monday = now + timedelta(days=days_ahead)
-        next_time = next_monday.replace(hour=hour, minute=minute, second=0, microsecond=0)
-        if now.weekday() == 0:
-            today_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-            if today_time > now:
-                next_time = today_time
-        return next_time
-    else:
-        hour, minute = map(int, time_str.split(':'))
-        next_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-        if next_time <= now:
-            next_time = next_time + timedelta(days=1)
-        return next_time
+    now = datetime.now()
+    jobs = []
+    for service_id, specs in SCHEDULED_SPECS.items():
+        after = SCHEDULED_SERVICES[service_id].get('after')
+        if after and specs:
+            next_time = min(spec.next_after(now) for spec in specs)
+            jobs.append({
+                'job_id': f"{service_id}@after:{after['service']}",
+                'service_id': service_id,
+                'service_name': SCHEDULED_SERVICES[service_id]['name'],
+                'cron': None,
+                'trigger': f"after {after['service']}",
+                'scheduled_time': f"{after['service']}完成后",
+                'next_execution': next_time.strftime("%Y-%m-%d %H:%M:%S"),
+                'seconds_until': max(0, int((next_time - now).total_seconds()))
+            })
+            continue
+        for spec in specs:
+            next_time = spec.next_after(now)
+            jobs.append({
+                'job_id': f"{service_id}@{spec.expression}",
+                'service_id': service_id,
+                'service_name': SCHEDULED_SERVICES[service_id]['name'],
+                'cron': spec.expression,
+                'scheduled_time': spec.describe(),
+                'next_execution': next_time.strftime("%Y-%m-%d %H:%M:%S"),
+                'seconds_until': max(0, int((next_time - now).total_seconds()))
+            })
+    jobs.sort(key=lambda job: job['next_execution'])
+    return {'source': 'config', 'updated_at': now.strftime("%Y-%m-%d %H:%M:%S"), 'jobs': jobs}
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -205,62 +1408,111 @@ def create_setup_page():
     """
 
 
-@app.get("/api/countdown")
-async def get_countdown():
-    now = datetime.now()
+def get_countdowns() -> Dict[str, Any]:
     countdowns = {}
 
-    for service_id, config in SCHEDULED_TASKS.items():
-        min_seconds = float('inf')
-        for time_str in config['times']:
-            next_time = calculate_next_execution(time_str)
-            seconds = int((next_time - now).total_seconds())
-            if seconds < min_seconds:
-                min_seconds = seconds
-
-        countdowns[service_id] = {
-            'seconds': max(0, min_seconds),
-            'name': config['name']
-        }
+    for job in get_schedule_snapshot()['jobs']:
+        service_key = job['service_id'].replace('service_', '')
+        if service_key not in countdowns or job['seconds_until'] < countdowns[service_key]['seconds']:
+            countdowns[service_key] = {
+                'seconds': job['seconds_until'],
+                'name': job['service_name'],
+                'next_execution': job['next_execution']
+            }
 
     return countdowns
 
 
-@app.get("/api/chat/logs")
-async def get_chat_logs():
-    return {'logs': state.chat_logs}
+def read_ai_report() -> Dict[str, Any]:
+    report_file = os.path.join(project_root, "services", "data", "hardware_summary.txt")
+    if not os.path.exists(report_file):
+        return {'success': True, 'content': None, 'timestamp': None}
 
+    with open(report_file, 'r', encoding='utf-8') as f:
+        content = f.read().strip()
+    if not content:
+        return {'success': True, 'content': None, 'timestamp': None}
 
-@app.get("/api/ai-report")
-async def get_ai_report():
+    mtime = os.path.getmtime(report_file)
+    return {
+        'success': True,
+        'content': content,
+        'timestamp': datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def get_service_states() -> Dict[str, Any]:
+    return {
+        service_name: {'running': service['running']}
+        for service_name, service in state.services.items()
+    }
+
+
+def get_dashboard_snapshot() -> Dict[str, Any]:
     try:
-        report_file = os.path.join(project_root, "services", "data", "hardware_summary.txt")
+        ai_report = read_ai_report()
+    except Exception as e:
+        logger.error(f"读取AI报告失败: {e}")
+        ai_report = {'success': False, 'error': str(e)}
+    return {
+        'services': get_service_states(),
+        'countdown': get_countdowns(),
+        'ai_report': ai_report,
+        'chat_cursor': state.chat_logs.last_seq
+    }
 
-        if os.path.exists(report_file):
-            with open(report_file, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
 
-            if content:
-                mtime = os.path.getmtime(report_file)
-                timestamp = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
+def dashboard_source_mtimes() -> Dict[str, float]:
+    sources = {
+        'ai_report': os.path.join(project_root, "services", "data", "hardware_summary.txt"),
+        'schedule': os.path.join(project_root, SCHEDULER_STATE_FILE)
+    }
+    return {name: os.path.getmtime(path) if os.path.exists(path) else 0.0 for name, path in sources.items()}
 
-                return {
-                    'success': True,
-                    'content': content,
-                    'timestamp': timestamp
-                }
-            else:
-                return {
-                    'success': True,
-                    'content': None,
-                    'timestamp': None
-                }
-        else:
-            return {
-                'success': True,
-                'content': None,
-                'timestamp': None
-            }
+
+async def watch_dashboard_sources():
+    """所有看板连接共用一个监视协程：只在报告/调度状态文件变化或倒计时到点时推送，无连接时退出"""
+    mtimes = dashboard_source_mtimes()
+    countdown_due = min((info['seconds'] for info in get_countdowns().values()), default=None)
+    next_countdown = time.time() + countdown_due + 1 if countdown_due is not None else None
+
+    while state.hub.subscribers:
+        await asyncio.sleep(DASHBOARD_WATCH_INTERVAL)
+        try:
+            current = dashboard_source_mtimes()
+            if current['ai_report'] != mtimes['ai_report']:
+                state.hub.publish('ai_report', read_ai_report())
+            if current['schedule'] != mtimes['schedule'] or (next_countdown and time.time() >= next_countdown):
+                countdowns = get_countdowns()
+                state.hub.publish('countdown', countdowns)
+                countdown_due = min((info['seconds'] for info in countdowns.values()), default=None)
+                next_countdown = time.time() + countdown_due + 1 if countdown_due is not None else None
+            mtimes = current
+        except Exception as e:
+            logger.error(f"看板数据监视失败: {e}")
+
+    state.dashboard_watcher = None
+
+
+@app.get("/api/countdown")
+async def get_countdown():
+    return get_countdowns()
+
+
+@app.get("/api/schedule")
+async def get_schedule():
+    return get_schedule_snapshot()
+
+
+@app.get("/api/chat/logs")
+async def get_chat_logs(since: int = 0, limit: int = CHAT_LOG_PAGE_LIMIT):
+    return state.chat_logs.since(max(0, since), max(1, min(limit, CHAT_LOG_PAGE_LIMIT)))
+
+
+@app.get("/api/ai-report")
+async def get_ai_report():
+    try:
+        return read_ai_report()
 
     except Exception as e:
         logger.error(f"读取AI报告失败: {e}")
@@ -271,30 +1523,66 @@ async def get_ai_report():
 
 
 @app.get("/api/file/{filename}")
-async def get_file(filename: str):
+async def get_file(filename: str, request: Request):
     try:
-        file_paths = [
-            os.path.join(project_root, "services", "data", filename),
-            os.path.join(project_root, "data", filename),
-            os.path.join(project_root, filename)
-        ]
-
-        for file_path in file_paths:
-            if os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                return PlainTextResponse(content=content)
-
-        return PlainTextResponse(content="", status_code=200)
+        file_path = resolve_served_file(filename)
+        if not file_path:
+            return PlainTextResponse(content="", status_code=200)
+
+        file_stat = os.stat(file_path)
+        file_size = file_stat.st_size
+        headers = file_validators(file_stat)
+        media_type = guess_media_type(file_path)
+
+        if is_not_modified(request, headers, file_stat):
+            return Response(status_code=304, headers=headers)
+
+        range_header = request.headers.get('range')
+        if range_header and file_size > 0:
+            if_range = request.headers.get('if-range')
+            if not if_range or if_range == headers['ETag']:
+                byte_range = parse_byte_range(range_header, file_size)
+                if byte_range is None:
+                    headers['Content-Range'] = f"bytes */{file_size}"
+                    return Response(status_code=416, headers=headers)
+                start, end = byte_range
+                headers['Content-Range'] = f"bytes {start}-{end}/{file_size}"
+                headers['Content-Length'] = str(end - start + 1)
+                return StreamingResponse(iter_file_range(file_path, start, end), status_code=206,
+                                         media_type=media_type, headers=headers)
+
+        compressible = file_size >= FILE_COMPRESS_MIN_BYTES
+
+        if file_size <= FILE_CACHE_MAX_BYTES:
+            encoding = choose_content_encoding(request) if compressible else None
+            entry = file_cache.get(file_path, file_stat)
+            content = entry['content']
+            if encoding:
+                content = file_cache.encode(entry, encoding)
+                headers['Content-Encoding'] = encoding
+            return Response(content=content, media_type=media_type, headers=headers)
+
+        # 大文件流式发送时只做 gzip（zlib 支持增量压缩）
+        if compressible and choose_content_encoding(request, allow_brotli=False) == 'gzip':
+            headers['Content-Encoding'] = 'gzip'
+            return StreamingResponse(iter_gzip_file(file_path), media_type=media_type, headers=headers)
+        headers['Content-Length'] = str(file_size)
+        return StreamingResponse(iter_file_range(file_path, 0, file_size - 1), media_type=media_type,
+                                 headers=headers)
     except Exception as e:
         logger.error(f"读取文件 {filename} 失败: {e}")
         return PlainTextResponse(content="", status_code=200)
 
 
 @app.get("/api/service/logs/{filename}")
-async def get_service_logs(filename: str, since: int = 0):
+async def get_service_logs(filename: str, since: Optional[int] = None, line: Optional[int] = None,
+                           tail: Optional[int] = None, limit: int = LOG_WINDOW_DEFAULT_LINES,
+                           inode: Optional[int] = None):
     try:
-        return {'logs': []}
+        file_path = resolve_service_log(filename)
+        if not file_path:
+            return {'logs': [], 'error': f'日志文件不存在: {filename}'}
+        return await asyncio.to_thread(get_log_window, file_path, since, line, tail, limit, inode)
     except Exception as e:
         logger.error(f"获取服务日志失败: {e}")
         return {'logs': []}
@@ -309,50 +1597,85 @@ async def chat_endpoint(request: dict):
 
         logger.info(f"收到用户输入: {user_input}")
 
-        state.add_chat_log('user', user_input)
-
-        await state.broadcast_message('chat_message', {
-            'type': 'user',
-            'content': user_input,
-            'timestamp': datetime.now().strftime("%H:%M:%S")
-        })
-
-        if not state.chat_agent:
-            logger.info("初始化Chat代理")
-            state.chat_agent = ChatAgent()
+        await state.broadcast_message('chat_message', state.add_chat_log('user', user_input))
 
-        logger.info("开始处理用户请求")
-        response = await state.chat_agent.process_user_input(user_input)
-        logger.info("用户请求处理完成")
-
-        state.add_chat_log('assistant', response)
-
-        await state.broadcast_message('chat_message', {
-            'type': 'assistant',
-            'content': response,
-            'timestamp': datetime.now().strftime("%H:%M:%S")
-        })
+        session_id = str(request.get('session_id') or CHAT_DEFAULT_SESSION)[:64]
+        job = state.chat_jobs.submit(user_input, session_id)
+        if not job:
+            return {'success': False, 'error': f'排队任务已达上限 {CHAT_MAX_PENDING_JOBS}，请稍后重试'}
 
         return {
             'success': True,
-            'response': response
+            'job_id': job['job_id'],
+            'status': job['status']
         }
 
     except Exception as e:
         error_msg = f"Chat处理失败: {str(e)}"
         logger.error(error_msg)
 
-        state.add_chat_log('error', error_msg)
+        await state.broadcast_message('chat_message', state.add_chat_log('error', error_msg))
+
+        return {'success': False, 'error': str(e)}
 
-        await state.broadcast_message('chat_message', {
-            'type': 'error',
-            'content': error_msg,
-            'timestamp': datetime.now().strftime("%H:%M:%S")
-        })
 
+def encode_json_body(data: Dict[str, Any], encoding: Optional[str]) -> tuple:
+    """返回 (响应体, 实际使用的压缩编码)，体积过小时不压缩"""
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if not encoding or len(body) < FILE_COMPRESS_MIN_BYTES:
+        return body, None
+    if encoding == 'br':
+        return brotli.compress(body), encoding
+    return gzip.compress(body, compresslevel=6, mtime=0), encoding
+
+
+@app.get("/api/metrics/series")
+async def get_metrics_series(request: Request, metric: str = 'cpu', ips: Optional[str] = None, start: Optional[str] = None,
+                             end: Optional[str] = None, span: Optional[str] = None,
+                             points: int = METRICS_DEFAULT_POINTS, method: str = 'lttb'):
+    if metric not in METRICS_COLUMNS:
+        return {'success': False, 'error': f"不支持的指标: {metric}，可选: {', '.join(METRICS_COLUMNS)}"}
+    if method not in ('lttb', 'minmax'):
+        return {'success': False, 'error': f"不支持的降采样方法: {method}，可选: lttb、minmax"}
+    ip_list = [ip.strip() for ip in ips.split(',') if ip.strip()] if ips else None
+    if ip_list and len(ip_list) > METRICS_MAX_IPS:
+        return {'success': False, 'error': f'一次最多查询 {METRICS_MAX_IPS} 个IP'}
+
+    try:
+        result = await asyncio.to_thread(get_metric_series, metric, ip_list, start, end, span,
+                                         max(10, min(points, METRICS_MAX_POINTS)), method)
+        # 数百个IP的序列体积可观，按客户端支持压缩后返回
+        body, encoding = await asyncio.to_thread(encode_json_body, dict(result, success=True),
+                                                 choose_content_encoding(request))
+        headers = {'Vary': 'Accept-Encoding'}
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return Response(content=body, media_type='application/json', headers=headers)
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+    except Exception as e:
+        logger.error(f"查询指标时序失败: {e}")
         return {'success': False, 'error': str(e)}
 
 
+@app.get("/api/llm/stats")
+async def get_llm_stats():
+    return get_stream_stats()
+
+
+@app.get("/api/chat/sessions")
+async def get_chat_sessions():
+    return state.chat_jobs.get_status()
+
+
+@app.get("/api/chat/jobs/{job_id}")
+async def get_chat_job(job_id: str):
+    job = state.chat_jobs.get(job_id)
+    if not job:
+        return {'success': False, 'error': f'任务不存在: {job_id}'}
+    return {'success': True, 'job': job}
+
+
 @app.post("/api/service/{service_name}/toggle")
 async def toggle_service(service_name: str):
     try:
@@ -377,10 +1700,12 @@ async def toggle_service(service_name: str):
 
 @app.get("/api/service/status")
 async def get_service_status():
-    return {
-        service_name: {'running': service['running']}
-        for service_name, service in state.services.items()
-    }
+    return get_service_states()
+
+
+@app.get("/api/service/processes")
+async def get_service_processes():
+    return {name: supervisor.get_status() for name, supervisor in state.supervisors.items()}
 
 
 async def start_service(service_name: str):
@@ -390,42 +1715,20 @@ async def start_service(service_name: str):
         return
 
     try:
-        if service_name == 'mcp':
-            logger.info("启动MCP服务器进程")
-            process = subprocess.Popen([
-                sys.executable, 'run_server.py'
-            ], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                universal_newlines=True, cwd=project_root)
-
-            service['process'] = process
-            service['running'] = True
-
-            threading.Thread(target=monitor_process_output,
-                             args=(process, 'mcp'), daemon=True).start()
-
-        elif service_name == 'scheduler':
-            logger.info("启动调度器进程")
-            process = subprocess.Popen([
-                sys.executable, 'chat_scheduler.py'
-            ], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                universal_newlines=True, cwd=project_root)
-
-            service['process'] = process
-            service['running'] = True
-
-            threading.Thread(target=monitor_process_output,
-                             args=(process, 'scheduler'), daemon=True).start()
+        if service_name in state.supervisors:
+            await state.supervisors[service_name].start()
 
         elif service_name == 'chat':
             logger.info("初始化Chat代理服务")
-            state.chat_agent = ChatAgent()
+            state.chat_agent = await asyncio.to_thread(ChatAgent)
             service['running'] = True
+            await state.broadcast_message('service_status', {
+                'service': service_name,
+                'status': 'started',
+                'running': True
+            })
 
         logger.info(f"服务 {service_name} 启动成功")
-        await state.broadcast_message('service_status', {
-            'service': service_name,
-            'status': 'started'
-        })
 
     except Exception as e:
         logger.error(f"启动服务 {service_name} 失败: {e}")
@@ -435,81 +1738,48 @@ async def start_service(service_name: str):
 
 async def stop_service(service_name: str):
     service = state.services[service_name]
+    supervisor = state.supervisors.get(service_name)
 
-    if not service['running']:
+    if not service['running'] and not (supervisor and supervisor.task):
         return
 
     try:
-        if service_name in ['mcp', 'scheduler'] and service['process']:
-            logger.info(f"终止进程: {service_name}")
-            service['process'].terminate()
-            try:
-                service['process'].wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                logger.warning(f"强制杀死进程: {service_name}")
-                service['process'].kill()
-            service['process'] = None
+        if supervisor:
+            await supervisor.stop()
         elif service_name == 'chat':
             logger.info("停止Chat代理服务")
             state.chat_agent = None
+            service['running'] = False
+            await state.broadcast_message('service_status', {
+                'service': service_name,
+                'status': 'stopped',
+                'running': False
+            })
 
-        service['running'] = False
         logger.info(f"服务 {service_name} 停止成功")
 
-        await state.broadcast_message('service_status', {
-            'service': service_name,
-            'status': 'stopped'
-        })
-
     except Exception as e:
         logger.error(f"停止服务 {service_name} 失败: {e}")
         raise
 
 
-def monitor_process_output(process, service_name):
-    try:
-        logger.info(f"开始监控进程输出: {service_name}")
-        for line in iter(process.stdout.readline, ''):
-            if line:
-                state.log_queues[service_name].put(line.strip())
-                state.add_chat_log('log', f"[{service_name}] {line.strip()}")
-
-    except Exception as e:
-        logger.error(f"监控 {service_name} 输出失败: {e}")
-
-
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    state.websocket_connections.append(websocket)
-    logger.info("新的WebSocket连接已建立")
-
+    subscriber = state.hub.subscribe(websocket)
+    logger.info(f"新的WebSocket连接已建立，当前连接数 {len(state.hub.subscribers)}")
+
+    await websocket.send_text(json.dumps({
+        'type': 'snapshot',
+        'data': get_dashboard_snapshot(),
+        'timestamp': datetime.now().isoformat()
+    }, ensure_ascii=False))
+    if state.dashboard_watcher is None or state.dashboard_watcher.done():
+        state.dashboard_watcher = asyncio.create_task(watch_dashboard_sources())
+
+    send_task = asyncio.create_task(state.hub.pump(websocket, subscriber))
+    log_followers = {}
     try:
-        async def send_logs():
-            while True:
-                try:
-                    for service_name, log_queue in state.log_queues.items():
-                        try:
-                            while not log_queue.empty():
-                                log_message = log_queue.get_nowait()
-                                await websocket.send_text(json.dumps({
-                                    'type': 'log',
-                                    'service': service_name,
-                                    'message': log_message,
-                                    'timestamp': datetime.now().isoformat()
-                                }))
-                        except queue.Empty:
-                            pass
-
-                    await asyncio.sleep(0.1)
-                except WebSocketDisconnect:
-                    break
-                except Exception as e:
-                    logger.error(f"发送日志失败: {e}")
-                    break
-
-        log_task = asyncio.create_task(send_logs())
-
         while True:
             try:
                 data = await websocket.receive_text()
@@ -518,30 +1788,49 @@ async def websocket_endpoint(websocket: WebSocket):
                 if message.get('type') == 'ping':
                     await websocket.send_text(json.dumps({'type': 'pong'}))
 
+                elif message.get('type') == 'follow_log':
+                    filename = message.get('file', '')
+                    file_path = resolve_service_log(filename)
+                    if not file_path:
+                        state.hub.send(websocket, 'service_log', {'file': filename, 'error': '日志文件不存在'})
+                    elif filename not in log_followers:
+                        try:
+                            since = parse_log_since(message.get('since'))
+                        except (TypeError, ValueError):
+                            state.hub.send(websocket, 'service_log', {'file': filename, 'error': '无效的 since 参数'})
+                            continue
+                        log_followers[filename] = asyncio.create_task(
+                            follow_service_log(websocket, filename, file_path, since))
+
+                elif message.get('type') == 'unfollow_log':
+                    follower = log_followers.pop(message.get('file', ''), None)
+                    if follower:
+                        follower.cancel()
+
             except WebSocketDisconnect:
                 break
             except Exception as e:
                 logger.error(f"WebSocket消息处理错误: {e}")
                 break
 
-    except WebSocketDisconnect:
-        pass
     finally:
-        if websocket in state.websocket_connections:
-            state.websocket_connections.remove(websocket)
+        state.hub.unsubscribe(websocket)
+        send_task.cancel()
+        for follower in log_followers.values():
+            follower.cancel()
         logger.info("WebSocket连接已断开")
 
 
 def cleanup():
     logger.info("开始清理所有服务")
-    for service_name, service in state.services.items():
-        if service['running'] and service.get('process'):
-            try:
-                service['process'].terminate()
-                service['process'].wait(timeout=5)
-                logger.info(f"服务 {service_name} 已清理")
-            except:
-                pass
+    state.chat_jobs.shutdown()
+    state.chat_logs.close()
+    for service_name, supervisor in state.supervisors.items():
+        try:
+            supervisor.terminate_now()
+            logger.info(f"服务 {service_name} 已清理")
+        except Exception:
+            pass
 
 
 def signal_handler(signum, frame):
@@ -553,7 +1842,11 @@ def signal_handler(signum, frame):
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
-if __name__ == "__main__":
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+    session_count = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    result = benchmark_chat_sessions(session_count)
+    print(f"测试结果: {json.dumps(result, ensure_ascii=False, indent=2)}")
+elif __name__ == "__main__":
     print("[启动] 智能运维监控系统Web服务器")
     print("=" * 50)
     print(f"[目录] 项目根目录: {project_root}")